@@ -1,34 +1,40 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
+import sys
 from sys import exit, stderr
-from web3.middleware import geth_poa_middleware
+from time import monotonic, sleep
 from web3 import Web3
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.provider import connect_to_node
+from common.rpc_batch import BatchClient, RPCError
 w3 = Web3
+client = None
 
 DEFAULT_WEB3_URI = "~/blockchain-iua/devnet/node/geth.ipc"
+BATCH_SIZE = 200 # pedidos por lote JSON-RPC
+RECEIPT_TIMEOUT = 120 # segundos máximos de espera de los recibos
 
-def connect_to_node(uri):
-    if (uri.startswith("http://")):
-        w3 = Web3(Web3.HTTPProvider(uri))
-    else:
-        w3 = Web3(Web3.IPCProvider(uri))
-    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-    if w3.is_connected():
-        return w3
-    else:
-        print("Falla al contactar el nodo", file=stderr)
-        exit(1) 
-
-def balance(account, unit):
-    """Imprime el balance de una cuenta
-
-    :param account: La dirección de la cuenta
+def batches(items, size=BATCH_SIZE):
+    """Divide una lista en tramos de a lo sumo `size` elementos"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def balance(accounts, unit):
+    """Imprime el balance de una o más cuentas, pedidos al nodo en lotes JSON-RPC
+
+    :param accounts: Las direcciones de las cuentas
     :param unit: Las unidades en las que se desea el resultado. (wei, Kwei, Mwei, Gwei, microether, milliether, ether)
     """
-    balance_wei = w3.eth.get_balance(account)
-    balance = w3.from_wei(balance_wei, str(unit))
-    print(f"balance: {balance} {unit}")
+    for chunk in batches(accounts):
+        results = client.batch([('eth_getBalance', [account, 'latest']) for account in chunk])
+        for account, balance_wei in zip(chunk, results):
+            balance = w3.from_wei(int(balance_wei, 16), str(unit))
+            if len(accounts) == 1:
+                print(f"balance: {balance} {unit}")
+            else:
+                print(f"{account} balance: {balance} {unit}")
 
 def transfer(src, dst, amount, unit):
     """Transfiere ether de una cuenta a otra.
@@ -47,13 +53,71 @@ def transfer(src, dst, amount, unit):
         'value': amount_wei
     }
 
-    # Enviar la transacción
+    # Enviar la transacción y esperar su recibo
     try:
         txn_hash = w3.eth.send_transaction(txn)
-        print(f'Transferencia exitosa. Hash: {txn_hash.hex()}')
+        receipt = w3.eth.wait_for_transaction_receipt(txn_hash, timeout=RECEIPT_TIMEOUT)
     except Exception as e:
         print(f'Error al enviar la transacción: {e}')
         exit(1)
+    if receipt.status != 1:
+        print(f'La transacción falló. Hash: {txn_hash.hex()}')
+        exit(1)
+    print(f'Transferencia exitosa. Hash: {txn_hash.hex()} (bloque {receipt.blockNumber})')
+
+def fan_out(src, destinations, amount, unit):
+    """Transfiere el mismo monto desde una cuenta a muchas otras.
+
+    Los nonces se asignan localmente en forma consecutiva, de modo que todas
+    las transacciones se envían en lotes JSON-RPC sin esperar entre ellas, y
+    luego se esperan todos los recibos a la vez.
+    Imprime el resultado de cada transferencia; termina con error si alguna falla.
+    """
+    amount_wei = w3.to_wei(amount, unit)
+    nonce = w3.eth.get_transaction_count(src, 'pending')
+    gas_price = w3.eth.gas_price
+    pending = {}    # hash -> destino
+    failed = 0
+    for chunk in batches(destinations):
+        calls = [('eth_sendTransaction', [{
+            'from': src,
+            'to': dst,
+            'value': hex(amount_wei),
+            'gas': hex(21000),
+            'gasPrice': hex(gas_price),
+            'nonce': hex(nonce + i)}]) for i, dst in enumerate(chunk)]
+        nonce += len(chunk)
+        rejected = 0
+        for dst, result in zip(chunk, client.batch(calls, raise_errors=False)):
+            if isinstance(result, RPCError):
+                print(f'{dst}: error al enviar la transacción: {result}', file=stderr)
+                rejected += 1
+            else:
+                pending[result] = dst
+        if rejected:
+            # un nonce sin usar deja en espera a todas las transacciones posteriores
+            failed += rejected
+            break
+
+    deadline = monotonic() + RECEIPT_TIMEOUT
+    while pending and monotonic() < deadline:
+        sleep(1)
+        hashes = list(pending)
+        for chunk in batches(hashes):
+            receipts = client.batch([('eth_getTransactionReceipt', [h]) for h in chunk])
+            for txn_hash, receipt in zip(chunk, receipts):
+                if receipt is None:
+                    continue
+                dst = pending.pop(txn_hash)
+                if int(receipt['status'], 16) == 1:
+                    print(f'{dst}: transferencia exitosa. Hash: {txn_hash} (bloque {int(receipt["blockNumber"], 16)})')
+                else:
+                    print(f'{dst}: la transacción falló. Hash: {txn_hash}', file=stderr)
+                    failed += 1
+    for txn_hash, dst in pending.items():
+        print(f'{dst}: sin recibo luego de {RECEIPT_TIMEOUT} s. Hash: {txn_hash}', file=stderr)
+    if failed or pending:
+        exit(1)
 
 def accounts():
     """Lista las cuentas asociadas con un nodo"""
@@ -70,7 +134,13 @@ def address(x):
                 return x
         except ValueError:
             pass
-    raise argparse.ArgumentTypeError(f"Invalid address: '{x}'")                                                                                                                                               
+    raise argparse.ArgumentTypeError(f"Invalid address: '{x}'")
+
+def read_addresses(path):
+    """Lee un archivo con una dirección por línea, ignorando líneas vacías y comentarios (#)"""
+    with open(path) as f:
+        lines = [line.split('#')[0].strip() for line in f]
+    return [address(line) for line in lines if line]                                                                                                                                               
 
 
 
@@ -83,12 +153,19 @@ if __name__ == "__main__":
     subparsers.required=True
     parser_balance = subparsers.add_parser("balance", help="Obtiene el balance de una cuenta")
     parser_balance.add_argument("--unit", help="Unidades en las que está expresado el monto", choices=['wei', 'Kwei', 'Mwei', 'Gwei', 'microether', 'milliether','ether'], default='wei')
-    parser_balance.add_argument("--account", "-a", help="Cuenta de la que se quiere obtener el balance", type=address, required=True)
+    parser_balance.add_argument("--account", "-a", help="Cuentas de las que se quiere obtener el balance", type=address, nargs='+', action='extend', default=[])
+    parser_balance.add_argument("--file", help="Archivo con una cuenta por línea")
     parser_transfer = subparsers.add_parser("transfer", help="Transfiere fondos de una cuenta a otra")
     parser_transfer.add_argument("--from", help="Cuenta de origen", type=address, required=True, dest='src')
     parser_transfer.add_argument("--to", help="Cuenta de destino", type=address, required=True, dest='dst')
     parser_transfer.add_argument("--amount", help="Monto a transferir", type=int, required=True)
     parser_transfer.add_argument("--unit", help="Unidades en las que está expresado el monto", choices=['wei', 'Kwei', 'Mwei', 'Gwei', 'microether', 'milliether','ether'], default='wei')
+    parser_fan_out = subparsers.add_parser("fan-out", help="Transfiere el mismo monto desde una cuenta a muchas otras")
+    parser_fan_out.add_argument("--from", help="Cuenta de origen", type=address, required=True, dest='src')
+    parser_fan_out.add_argument("--to", help="Cuentas de destino", type=address, nargs='+', action='extend', default=[], dest='dst')
+    parser_fan_out.add_argument("--file", help="Archivo con una cuenta de destino por línea")
+    parser_fan_out.add_argument("--amount", help="Monto a transferir a cada cuenta", type=int, required=True)
+    parser_fan_out.add_argument("--unit", help="Unidades en las que está expresado el monto", choices=['wei', 'Kwei', 'Mwei', 'Gwei', 'microether', 'milliether','ether'], default='wei')
     parser_accounts = subparsers.add_parser("accounts", help="Lista las cuentas de un nodo")
     args = parser.parse_args()
     # La URI elegida por el usuario está disponible como args.uri
@@ -96,11 +173,20 @@ if __name__ == "__main__":
 
     try:
         w3 = connect_to_node(args.uri)
+        client = BatchClient(args.uri)
 
         if args.command == "balance":
-            balance(args.account, args.unit)
+            cuentas = args.account + (read_addresses(args.file) if args.file else [])
+            if not cuentas:
+                parser_balance.error("Debe indicar al menos una cuenta con --account o --file")
+            balance(cuentas, args.unit)
         elif args.command == "transfer":
             transfer(args.src, args.dst, args.amount, args.unit)
+        elif args.command == "fan-out":
+            destinations = args.dst + (read_addresses(args.file) if args.file else [])
+            if not destinations:
+                parser_fan_out.error("Debe indicar al menos una cuenta de destino con --to o --file")
+            fan_out(args.src, destinations, args.amount, args.unit)
         elif args.command == "accounts":
             accounts()
         else:
@@ -130,5 +216,7 @@ python3 bfa_funds.py --uri ~/bc/devnet/node/geth.ipc accounts
 python3 bfa_funds.py --uri ~/bc/devnet/node/geth.ipc balance -a 0xe5f621F9c328BB2A05556d0d33AA94D172f3174C --unit ether
 python3 bfa_funds.py --uri ~/bc/devnet/node/geth.ipc balance -a 0x79485Ef5627167779eaB2343f559cd7E2B5daF91 --unit ether
 python3 bfa_funds.py --uri ~/bc/devnet/node/geth.ipc transfer --from 0xe5f621F9c328BB2A05556d0d33AA94D172f3174C --to 0x79485Ef5627167779eaB2343f559cd7E2B5daF91 --amount 1
+python3 bfa_funds.py --uri ~/bc/devnet/node/geth.ipc balance -a 0xe5f621F9c328BB2A05556d0d33AA94D172f3174C 0x79485Ef5627167779eaB2343f559cd7E2B5daF91 --unit ether
+python3 bfa_funds.py --uri ~/bc/devnet/node/geth.ipc fan-out --from 0xe5f621F9c328BB2A05556d0d33AA94D172f3174C --file cuentas.txt --amount 1 --unit ether
 
 """
\ No newline at end of file
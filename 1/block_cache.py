@@ -0,0 +1,94 @@
+"""Caché en disco de bloques ya obtenidos, para no volver a pedirlos al nodo."""
+import sqlite3
+import struct
+import threading
+
+from common.block_scanner import checksum
+
+# Cada bloque se guarda en una fila; sus transacciones se empaquetan por columnas:
+# cantidad, hashes (32 bytes c/u), orígenes (20), destinos (20), valores (32)
+# y un byte por transacción que indica si es una creación de contrato.
+COUNT = struct.Struct(">I")
+
+
+def _address(raw):
+    return None if raw is None else bytes.fromhex(raw[2:])
+
+
+def pack_transactions(transactions):
+    """Empaqueta las transacciones de un bloque en un único blob por columnas."""
+    return b"".join([
+        COUNT.pack(len(transactions)),
+        b"".join(bytes.fromhex(tx['hash'][2:]) for tx in transactions),
+        b"".join(_address(tx['from']) for tx in transactions),
+        b"".join(_address(tx['to']) or bytes(20) for tx in transactions),
+        b"".join(tx['value'].to_bytes(32, "big") for tx in transactions),
+        bytes(tx['to'] is None for tx in transactions),
+    ])
+
+
+def unpack_transactions(blob):
+    """Inversa de `pack_transactions`."""
+    n, = COUNT.unpack_from(blob)
+    hashes = 4
+    froms = hashes + 32 * n
+    tos = froms + 20 * n
+    values = tos + 20 * n
+    creations = values + 32 * n
+    return [{
+        'hash': f"0x{blob[hashes + 32 * i:hashes + 32 * (i + 1)].hex()}",
+        'from': checksum(f"0x{blob[froms + 20 * i:froms + 20 * (i + 1)].hex()}"),
+        'to': None if blob[creations + i] else checksum(f"0x{blob[tos + 20 * i:tos + 20 * (i + 1)].hex()}"),
+        'value': int.from_bytes(blob[values + 32 * i:values + 32 * (i + 1)], "big"),
+    } for i in range(n)]
+
+
+class BlockCache:
+    """Guarda bloques por número y hash en un archivo SQLite.
+
+    Sólo deben guardarse bloques con suficientes confirmaciones (ver
+    `BlockScanner`). Al guardar un bloque se verifica que su `parentHash`
+    coincida con el hash del bloque anterior en la caché; si no coincide,
+    hubo una reorganización y se descartan los bloques cacheados desde allí.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "number INTEGER PRIMARY KEY, hash BLOB NOT NULL, parent BLOB NOT NULL, txs BLOB NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get_range(self, first, last):
+        """Devuelve {número: bloque} con los bloques cacheados entre first y last (incluidos)."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT number, hash, parent, txs FROM blocks WHERE number BETWEEN ? AND ?",
+                (first, last)).fetchall()
+        return {number: {
+            'number': number,
+            'hash': f"0x{block_hash.hex()}",
+            'parentHash': f"0x{parent.hex()}",
+            'transactions': unpack_transactions(txs),
+        } for number, block_hash, parent, txs in rows}
+
+    def put(self, blocks):
+        """Guarda una lista de bloques ordenada por número."""
+        if not blocks:
+            return
+        rows = [(b['number'], bytes.fromhex(b['hash'][2:]), bytes.fromhex(b['parentHash'][2:]),
+                 pack_transactions(b['transactions'])) for b in blocks]
+        with self._lock, self.conn:
+            # detección de reorganizaciones: el primer bloque debe continuar al anterior cacheado
+            previous = self.conn.execute(
+                "SELECT hash FROM blocks WHERE number = ?", (rows[0][0] - 1,)).fetchone()
+            if previous is not None and previous[0] != rows[0][2]:
+                self.conn.execute("DELETE FROM blocks WHERE number >= ?", (rows[0][0] - 1,))
+            # ...y el bloque cacheado siguiente al último debe continuarlo a él
+            following = self.conn.execute(
+                "SELECT parent FROM blocks WHERE number = ?", (rows[-1][0] + 1,)).fetchone()
+            if following is not None and following[0] != rows[-1][1]:
+                self.conn.execute("DELETE FROM blocks WHERE number > ?", (rows[-1][0],))
+            self.conn.executemany("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?)", rows)
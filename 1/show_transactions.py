@@ -6,11 +6,23 @@ Los bloques analizados son todos aquellos comprendidos entre los argumentos firs
 y last-block, ambos incluidos.
 Si se omite first-block, se comienza en el bloque 0.
 Si se omite last-block, se continúa hasta el último bloque.
+Con la opción "--follow", al llegar al último bloque se siguen procesando los bloques
+nuevos a medida que se producen.
+Con la opción "--checkpoint ARCHIVO" se guarda en el archivo el último bloque procesado,
+y al volver a lanzar el programa se retoma a partir del bloque siguiente. Con "--add" o
+"--aggregate", cuya salida se escribe al final, el checkpoint sólo avanza una vez escrita.
+Con la opción "--cache ARCHIVO" los bloques obtenidos se guardan en disco, de modo que
+volver a recorrer un rango ya cacheado no requiere pedir bloques al nodo. Sólo se cachean
+los bloques con al menos "--confirmations" bloques encima.
 Se pueden especificar una o más direcciones para restringir la búsqueda a las transacciones
 en las que dichas direcciones son origen o destino.
 Si se especifica la opción add, cada vez que se encuentra una transacción que responde a
 los criterios de búsqueda, se agregan las cuentas intervinientes a la lista de direcciones
-a reportar.
+a reportar. Para que el resultado no dependa del orden de las transacciones, se indexan
+todas las transferencias del rango y al terminar el recorrido se muestran todas las
+alcanzables desde las direcciones dadas (su clausura transitiva), en orden de bloque.
+En modo "--follow", las transferencias nuevas que conectan otras cuentas con la clausura
+se muestran junto con las anteriores de esas cuentas.
 La opción "--short" trunca las direcciones a los 8 primeros caracteres.
 La salida debe producirse en al menos los dos formatos siguientes:
 'plain': <origen> -> <destino>: <monto> (bloque)
@@ -25,26 +37,28 @@ digraph Transfers {
 "8ffD013B" -> "55C37a7E" [label="1000 ether (1195623)"]
 "8ffD013B" -> "fD52f36a" [label="1000 ether (1195644)"]
 }
+También se provee el formato 'jsonl', con un objeto JSON por transacción.
+Con la opción "--aggregate", las transferencias de un mismo origen a un mismo destino se
+reúnen en una sola, con la cantidad de transacciones y el monto total.
 """
 import argparse
-from sys import exit, stderr
-from web3.middleware import geth_poa_middleware
+import json
+import os
+import sys
+from sys import stderr, stdout
+from time import monotonic, sleep
 from web3 import Web3
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.provider import connect_to_node, stats
+from common.rpc_batch import BatchClient
+from common.block_scanner import BlockScanner, checksum
+from block_cache import BlockCache
+from transfer_graph import TransferGraph
+from writers import WRITERS
 w3 = Web3
 
 DEFAULT_WEB3_URI = "~/blockchain-iua/devnet/node/geth.ipc"
-
-def connect_to_node(uri):
-    if (uri.startswith("http://")):
-        w3 = Web3(Web3.HTTPProvider(uri))
-    else:
-        w3 = Web3(Web3.IPCProvider(uri))
-    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-    if w3.is_connected():
-        return w3
-    else:
-        print("Falla al contactar el nodo", file=stderr)
-        exit(1) 
+CHECKPOINT_INTERVAL = 5 # segundos entre escrituras del checkpoint durante un recorrido
 
 def address(x):
     """Verifica si su argumento tiene forma de dirección ethereum válida"""
@@ -58,24 +72,35 @@ def address(x):
             pass
     raise argparse.ArgumentTypeError(f"Invalid address: '{x}'")
 
-def imprimir(tx, block_number, short=True):
-    """Imprime la transaccion"""
-
-    if short:
-        print(f"{tx['from'][2:10]} -> {tx['to'][2:10]} : {tx['value']} ({block_number})")
-    else:
-        print(f"{tx['from']} -> {tx['to']} : {tx['value']} ({block_number})")
-
-def grafico(tx, block_number, short=True):
-    """Dibuja el grafico Graphviz""" 
-    #    "8ffD013B" -> "9F4BA634" [label="1 Gwei (1194114)"]
-
-    ether = w3.from_wei(tx.value, 'ether')
-    if short:
-        print(f"\"{tx['from'][2:10]}\" -> \"{tx['to'][2:10]}\" [label=\"{ether} ether ({block_number})\"]")
-    else:
-        print(f"\"{tx['from']}\" -> \"{tx['to']}\" [label=\"{ether} ether ({block_number})\"]")
-    
+def procesar(tx, block_number, conjunto, graph, writer):
+    """Muestra una transacción si responde a los criterios de búsqueda.
+
+    Con --add, la transacción se agrega al grafo de transferencias, que
+    devuelve las que pasan a ser alcanzables desde las direcciones buscadas
+    (vacío mientras no se haya calculado la clausura)."""
+    if tx['to'] is None:
+        return # creación de contrato, no es una transferencia
+
+    if graph is not None:
+        for index in graph.add(tx, block_number):
+            writer.write(*graph.transfer(index))
+    elif len(conjunto) == 0 or tx['from'] in conjunto or tx['to'] in conjunto:
+        writer.write(tx, block_number)
+
+def leer_checkpoint(path):
+    """Devuelve el último bloque procesado guardado en el archivo, o None si no existe"""
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except FileNotFoundError:
+        return None
+
+def guardar_checkpoint(path, block_number):
+    """Guarda el último bloque procesado, reemplazando el archivo de forma atómica"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(f"{block_number}\n")
+    os.replace(tmp, path)
 
 
 if __name__ == '__main__':
@@ -85,9 +110,18 @@ if __name__ == '__main__':
     parser.add_argument("--add", help="Agrega las direcciones encontradas a la búsqueda",action="store_true", default=False)
     parser.add_argument("--first-block", "-f",help="Primer bloque del rango en el cual buscar", type=int, default=0)
     parser.add_argument("--last-block", "-l", help="Último bloque del rango en el cual buscar",type=int, default=0)
-    parser.add_argument("--format", help="Formato de salida",choices=["plain", "graphviz"], default="plain")
+    parser.add_argument("--format", help="Formato de salida",choices=list(WRITERS), default="plain")
+    parser.add_argument("--aggregate", help="Reúne las transferencias de un mismo origen a un mismo destino en una sola, con la cantidad y el monto total", action="store_true")
     parser.add_argument("--short", help="Trunca las direcciones a los 8 primeros caracteres", action="store_true")
     parser.add_argument("--uri", help=f"URI para la conexión con geth", default=DEFAULT_WEB3_URI)
+    parser.add_argument("--workers", "-w", help="Cantidad de lotes de bloques que se piden en paralelo", type=int, default=8)
+    parser.add_argument("--batch-size", "-b", help="Cantidad de bloques por pedido JSON-RPC", type=int, default=50)
+    parser.add_argument("--follow", help="Al llegar al último bloque, sigue procesando los bloques nuevos", action="store_true")
+    parser.add_argument("--interval", help="Segundos entre consultas de bloques nuevos en modo --follow", type=float, default=2)
+    parser.add_argument("--checkpoint", "-c", help="Archivo donde se guarda el último bloque procesado; si existe, se retoma desde allí")
+    parser.add_argument("--cache", help="Archivo de caché de bloques; los bloques cacheados no se vuelven a pedir al nodo")
+    parser.add_argument("--timing", help="Al terminar, muestra por stderr la cantidad y duración de las llamadas al nodo", action="store_true")
+    parser.add_argument("--confirmations", help="Confirmaciones que debe tener un bloque para guardarse en la caché", type=int, default=12)
     args = parser.parse_args()
 
     w3 = connect_to_node(args.uri)
@@ -98,42 +132,72 @@ if __name__ == '__main__':
     conjunto = set() #para las direcciones a reportar
 
     if (len(args.addresses) > 0):
-        conjunto |= set(args.addresses) #agrego los argumentos al set
-
-    for block_number in range(args.first_block, args.last_block):
-        block = w3.eth.get_block(block_number)
-        transactions = block.transactions
-        if len(transactions) == 0:
-            """No transactions"""
-            #print(f"No transactions in block {block_number}")
-        else:
-            #print(f"Block {block_number} has {len(transactions)} transactions")
-            i = 0
-            for tx_hash in transactions:
-                tx = w3.eth.get_transaction_by_block(block_number, i)
-                
-                if (args.format == "plain"):
-                    if ((len(conjunto) > 0) and (tx['from'] in conjunto or tx['to'] in conjunto)):
-                        imprimir(tx, block_number, args.short)
-                        if (args.add):
-                            conjunto.add(tx['from'])
-                            conjunto.add(tx['to'])
-                    else:
-                        imprimir(tx, block_number, args.short)
-
-                elif (args.format == "graphviz"):
-                    if ((len(conjunto) > 0) and (tx['from'] in conjunto or tx['to'] in conjunto)):
-                        grafico(tx, block_number, args.short)
-                        if (args.add):
-                            conjunto.add(tx['from'])
-                            conjunto.add(tx['to'])
-                        
-                    else:
-                        grafico(tx, block_number, args.short)
-                
-                i += 1
-    
-    
+        conjunto |= set(map(checksum, args.addresses)) #agrego los argumentos al set (con checksum, como los devuelve el nodo)
+
+    writer = WRITERS[args.format](stdout, short=args.short, aggregate=args.aggregate)
+
+    # con --add se indexan todas las transferencias y al final se calcula la clausura
+    graph = TransferGraph() if args.add and len(conjunto) > 0 else None
+
+    # los bloques llegan en orden, con sus transacciones completas, y sin los bloques vacíos
+    cache = BlockCache(args.cache) if args.cache is not None else None
+    scanner = BlockScanner(BatchClient(args.uri), workers=args.workers, batch_size=args.batch_size,
+                           cache=cache, confirmations=args.confirmations)
+
+    first_block = args.first_block
+    if args.checkpoint is not None:
+        checkpoint = leer_checkpoint(args.checkpoint)
+        if checkpoint is not None:
+            first_block = checkpoint + 1 # se retoma a continuación del último bloque procesado
+
+    def pendiente():
+        """Si hay salida que todavía no se escribió: la clausura de --add o las aristas de --aggregate"""
+        return args.aggregate or (graph is not None and graph.closure is None)
+
+    processed = None # último bloque procesado por completo
+    try:
+        while True:
+            saved = monotonic()
+            for block in scanner.blocks(first_block, args.last_block):
+                for tx in block['transactions']:
+                    procesar(tx, block['number'], conjunto, graph, writer)
+                processed = block['number']
+                # el checkpoint sólo avanza sobre salida ya escrita
+                if args.checkpoint is not None and not pendiente() and monotonic() - saved > CHECKPOINT_INTERVAL:
+                    writer.flush()
+                    guardar_checkpoint(args.checkpoint, processed)
+                    saved = monotonic()
+            if graph is not None and graph.closure is None:
+                # fin del primer recorrido: clausura transitiva exacta de las direcciones buscadas
+                for index in graph.reach(conjunto):
+                    writer.write(*graph.transfer(index))
+            writer.flush()
+            if args.last_block >= first_block:
+                processed = args.last_block
+                if args.checkpoint is not None and not pendiente():
+                    guardar_checkpoint(args.checkpoint, processed)
+            if not args.follow:
+                break
+            # modo seguimiento: se esperan bloques nuevos y se procesan sólo esos
+            first_block = max(first_block, args.last_block + 1)
+            while True:
+                args.last_block = w3.eth.block_number
+                if args.last_block >= first_block:
+                    break
+                sleep(args.interval)
+    except KeyboardInterrupt:
+        if graph is not None and graph.closure is None:
+            # interrumpido en el primer recorrido: se escribe la clausura de lo recorrido hasta acá
+            for index in graph.reach(conjunto):
+                writer.write(*graph.transfer(index))
+    writer.close()
+    # al cerrar ya se escribió todo (también las aristas agregadas), así que el checkpoint puede avanzar
+    if args.checkpoint is not None and processed is not None:
+        guardar_checkpoint(args.checkpoint, processed)
+
+    if args.timing:
+        print(json.dumps(stats.summary(), indent=2), file=stderr)
+
     #print(f"Las direcciones a reportar son: {conjunto}")
 
     # print(w3.eth.get_block(337))
@@ -0,0 +1,64 @@
+"""Casos de prueba de la caché de bloques en disco."""
+import os
+import sys
+from os import urandom
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.block_scanner import checksum
+from block_cache import BlockCache, pack_transactions, unpack_transactions
+
+
+def random_hash():
+    return f"0x{urandom(32).hex()}"
+
+
+def random_address():
+    return checksum(f"0x{urandom(20).hex()}")
+
+
+def transaction(to=True, value=None):
+    return {'hash': random_hash(), 'from': random_address(), 'to': random_address() if to else None,
+            'value': urandom(8)[0] * 10 ** 18 if value is None else value}
+
+
+def chain(first, last, parent=None):
+    """Bloques first..last encadenados por su parentHash."""
+    blocks = []
+    for number in range(first, last + 1):
+        parent = parent if not blocks else blocks[-1]['hash']
+        blocks.append({'number': number, 'hash': random_hash(), 'parentHash': parent or random_hash(),
+                       'transactions': [transaction() for _ in range(number % 3)]})
+    return blocks
+
+
+def test_pack_roundtrip() -> None:
+    """Prueba que las transacciones empaquetadas se recuperen iguales, incluidas las creaciones de contrato."""
+    transactions = [transaction(), transaction(to=False), transaction(value=2 ** 256 - 1), transaction(value=0)]
+    assert unpack_transactions(pack_transactions(transactions)) == transactions
+    assert unpack_transactions(pack_transactions([])) == []
+
+
+def test_get_range(tmp_path) -> None:
+    cache = BlockCache(str(tmp_path / "blocks.db"))
+    blocks = chain(10, 19)
+    cache.put(blocks)
+    cached = cache.get_range(12, 30)
+    assert sorted(cached) == list(range(12, 20))
+    assert cached[15] == blocks[5]
+
+
+def test_reorg_discards_following(tmp_path) -> None:
+    """Prueba que al guardar un bloque que no continúa al anterior se descarten el anterior y los siguientes."""
+    cache = BlockCache(str(tmp_path / "blocks.db"))
+    cache.put(chain(10, 19))
+    replaced = chain(15, 16) # otra rama a partir del bloque 15
+    cache.put(replaced)
+    assert sorted(cache.get_range(0, 100)) == [10, 11, 12, 13, 15, 16]
+
+
+def test_extends_chain(tmp_path) -> None:
+    """Prueba que un tramo que continúa al último bloque cacheado se agregue sin descartar nada."""
+    cache = BlockCache(str(tmp_path / "blocks.db"))
+    blocks = chain(10, 14)
+    cache.put(blocks)
+    cache.put(chain(15, 19, parent=blocks[-1]['hash']))
+    assert sorted(cache.get_range(0, 100)) == list(range(10, 20))
@@ -0,0 +1,55 @@
+"""Casos de prueba del grafo de transferencias que usa la opción --add."""
+from transfer_graph import TransferGraph
+
+A, B, C, D, E = (f"0x{n:040x}" for n in range(1, 6))
+
+
+def tx(source, target, value=1):
+    return {'from': source, 'to': target, 'value': value}
+
+
+def transfers(graph, indexes):
+    return [(t['from'], t['to'], block) for t, block in map(graph.transfer, indexes)]
+
+
+def test_closure_does_not_depend_on_order() -> None:
+    """Prueba que se alcance una cuenta aunque la transferencia que la conecta aparezca antes."""
+    graph = TransferGraph()
+    graph.add(tx(C, D), 1) # C todavía no está conectada con A
+    graph.add(tx(B, C), 2)
+    graph.add(tx(A, B), 3)
+    graph.add(tx(D, E), 4)
+    assert transfers(graph, graph.reach([A])) == [(C, D, 1), (B, C, 2), (A, B, 3), (D, E, 4)]
+
+
+def test_closure_ignores_other_components() -> None:
+    """Prueba que las transferencias de cuentas no alcanzables no se muestren."""
+    graph = TransferGraph()
+    graph.add(tx(A, B), 1)
+    graph.add(tx(C, D), 2)
+    assert transfers(graph, graph.reach([A])) == [(A, B, 1)]
+    assert transfers(graph, TransferGraph().reach([A])) == []
+
+
+def test_follow_connects_components() -> None:
+    """Prueba que una transferencia nueva que conecta otro componente muestre también sus anteriores."""
+    graph = TransferGraph()
+    graph.add(tx(A, B), 1)
+    graph.add(tx(C, D), 2)
+    graph.add(tx(D, E), 3)
+    graph.reach([A])
+    assert graph.add(tx(E, D), 4) == [] # sigue sin conectarse
+    assert transfers(graph, graph.add(tx(B, C), 5)) == [(C, D, 2), (D, E, 3), (E, D, 4), (B, C, 5)]
+    assert transfers(graph, graph.add(tx(A, E), 6)) == [(A, E, 6)]
+
+
+def test_self_transfer() -> None:
+    graph = TransferGraph()
+    graph.add(tx(A, A), 1)
+    assert transfers(graph, graph.reach([A])) == [(A, A, 1)]
+    assert graph.adjacency[graph.ids[A]] == [0]
+
+
+def test_add_before_reach_returns_nothing() -> None:
+    graph = TransferGraph()
+    assert graph.add(tx(A, B), 1) == []
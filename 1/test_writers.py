@@ -0,0 +1,86 @@
+"""Casos de prueba de los escritores de la salida de show_transactions."""
+import io
+import json
+
+import pytest
+
+import writers
+from writers import DotWriter, JsonLinesWriter, PlainWriter, format_ether
+
+A = "0x8ffD013B0000000000000000000000000000000a"
+B = "0x9F4BA6340000000000000000000000000000000b"
+GWEI = 10 ** 9
+ETHER = 10 ** 18
+
+
+def tx(source, target, value):
+    return {'from': source, 'to': target, 'value': value}
+
+
+def output(writer_class, txs, **kwargs):
+    out = io.StringIO()
+    writer = writer_class(out, **kwargs)
+    for t, block in txs:
+        writer.write(t, block)
+    writer.close()
+    return out.getvalue()
+
+
+def test_format_ether() -> None:
+    assert format_ether(0) == "0"
+    assert format_ether(ETHER) == "1"
+    assert format_ether(2000 * ETHER) == "2000"
+    assert format_ether(GWEI) == "0.000000001"
+    assert format_ether(1) == "0.000000000000000001"
+    assert format_ether(3 * ETHER // 2) == "1.5"
+
+
+def test_dot() -> None:
+    """Prueba el formato graphviz del enunciado, con direcciones cortas."""
+    txs = [(tx(A, B, GWEI), 1194114), (tx(B, A, ETHER), 1194216)]
+    assert output(DotWriter, txs, short=True) == (
+        "digraph Transfers {\n"
+        "\"8ffD013B\" -> \"9F4BA634\" [label=\"0.000000001 ether (1194114)\"]\n"
+        "\"9F4BA634\" -> \"8ffD013B\" [label=\"1 ether (1194216)\"]\n"
+        "}\n")
+
+
+def test_dot_empty() -> None:
+    assert output(DotWriter, []) == "digraph Transfers {\n}\n"
+
+
+def test_aggregate() -> None:
+    """Prueba que con --aggregate se reúnan las transferencias de cada par en una arista."""
+    txs = [(tx(A, B, ETHER), 1), (tx(B, A, 5), 2), (tx(A, B, 2 * ETHER), 3)]
+    assert output(DotWriter, txs, short=True, aggregate=True) == (
+        "digraph Transfers {\n"
+        "\"8ffD013B\" -> \"9F4BA634\" [label=\"3 ether (2 tx)\"]\n"
+        "\"9F4BA634\" -> \"8ffD013B\" [label=\"0.000000000000000005 ether (1 tx)\"]\n"
+        "}\n")
+    assert output(PlainWriter, txs, aggregate=True) == f"{A} -> {B} : {3 * ETHER} (2 tx)\n{B} -> {A} : 5 (1 tx)\n"
+
+
+def test_plain_and_jsonl() -> None:
+    txs = [(tx(A, B, 7), 10)]
+    assert output(PlainWriter, txs) == f"{A} -> {B} : 7 (10)\n"
+    assert json.loads(output(JsonLinesWriter, txs)) == {'from': A, 'to': B, 'value': "7", 'block': 10}
+
+
+@pytest.mark.parametrize("writer_class", [PlainWriter, DotWriter, JsonLinesWriter])
+def test_buffered(writer_class, monkeypatch) -> None:
+    """Prueba que las líneas se escriban por bloques y que `flush` no escriba las aristas agregadas."""
+    monkeypatch.setattr(writers, "BUFFERED_LINES", 4)
+    out = io.StringIO()
+    writer = writer_class(out)
+    for block in range(2):
+        writer.write(tx(A, B, 1), block)
+    assert out.getvalue() == ""
+    for block in range(2, 4):
+        writer.write(tx(A, B, 1), block)
+    assert out.getvalue().endswith("\n")
+    writer.flush()
+    assert out.getvalue().count(B) == 4
+    aggregated = writer_class(io.StringIO(), aggregate=True)
+    aggregated.write(tx(A, B, 1), 1)
+    aggregated.flush()
+    assert A not in aggregated.out.getvalue()
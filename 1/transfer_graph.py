@@ -0,0 +1,80 @@
+"""Índice en memoria de las transferencias, para calcular la clausura transitiva de un conjunto de direcciones."""
+from collections import deque
+
+
+class TransferGraph:
+    """Grafo de transferencias con listas de adyacencia por dirección.
+
+    Las direcciones se identifican con enteros y cada transferencia se guarda
+    una sola vez, en orden de llegada; la adyacencia de una dirección guarda
+    los índices de las transferencias en las que participa, sin importar el
+    sentido. Así, las direcciones alcanzables desde un conjunto inicial
+    (la opción --add) se obtienen con un BFS, sin depender del orden en que
+    aparecieron las transferencias.
+    """
+
+    def __init__(self):
+        self.ids = {}           # dirección -> id
+        self.addresses = []     # id -> dirección
+        self.adjacency = []     # id -> [índice de transferencia, ...]
+        self.edges = []         # (id origen, id destino, valor, bloque)
+        self.closure = None     # ids alcanzables, una vez llamado reach()
+
+    def _id(self, address):
+        node = self.ids.get(address)
+        if node is None:
+            node = self.ids[address] = len(self.addresses)
+            self.addresses.append(address)
+            self.adjacency.append([])
+        return node
+
+    def add(self, tx, block_number):
+        """Agrega una transferencia al índice.
+
+        Si ya se calculó la clausura, devuelve los índices de las
+        transferencias que pasan a ser alcanzables: la nueva, y las
+        anteriores de los componentes que ella conecta con la clausura.
+        """
+        a, b = self._id(tx['from']), self._id(tx['to'])
+        index = len(self.edges)
+        self.edges.append((a, b, tx['value'], block_number))
+        self.adjacency[a].append(index)
+        if b != a:
+            self.adjacency[b].append(index)
+        if self.closure is None:
+            return []
+        in_a, in_b = a in self.closure, b in self.closure
+        if in_a and in_b:
+            return [index]
+        if not (in_a or in_b):
+            return []
+        return self._edges_of(self._expand([b if in_a else a]))
+
+    def reach(self, seeds):
+        """Calcula la clausura de `seeds` y devuelve, en orden, los índices de sus transferencias."""
+        self.closure = set()
+        return self._edges_of(self._expand([self._id(address) for address in seeds]))
+
+    def _expand(self, start):
+        """BFS desde `start` agregando a la clausura los nodos nuevos; devuelve esos nodos."""
+        new = [node for node in set(start) if node not in self.closure]
+        self.closure.update(new)
+        pending = deque(new)
+        while pending:
+            node = pending.popleft()
+            for index in self.adjacency[node]:
+                a, b, _, _ = self.edges[index]
+                other = b if a == node else a
+                if other not in self.closure:
+                    self.closure.add(other)
+                    new.append(other)
+                    pending.append(other)
+        return new
+
+    def _edges_of(self, nodes):
+        return sorted({index for node in nodes for index in self.adjacency[node]})
+
+    def transfer(self, index):
+        """Devuelve la transferencia `index` como (transacción, número de bloque)."""
+        a, b, value, block_number = self.edges[index]
+        return {'from': self.addresses[a], 'to': self.addresses[b], 'value': value}, block_number
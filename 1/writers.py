@@ -0,0 +1,113 @@
+"""Escritores de la salida de show_transactions: texto plano, graphviz (DOT) y JSON lines."""
+import json
+
+BUFFERED_LINES = 4096 # líneas que se acumulan antes de escribirlas juntas
+WEI_PER_ETHER = 10 ** 18
+
+
+def format_ether(wei):
+    """Expresa un monto en wei como ether, con aritmética entera (sin Decimal ni from_wei)."""
+    ether, rest = divmod(wei, WEI_PER_ETHER)
+    if rest == 0:
+        return str(ether)
+    return f"{ether}.{rest:018d}".rstrip("0")
+
+
+class Writer:
+    """Base de los escritores: acumula líneas y las escribe por bloques.
+
+    Con `aggregate`, las transferencias entre un mismo par origen -> destino
+    se reúnen en una sola arista con la cantidad y el monto total, y se
+    escriben al cerrar; el tamaño de la salida depende de los pares
+    distintos y no de la cantidad de transacciones.
+    """
+
+    def __init__(self, out, short=False, aggregate=False):
+        self.out = out
+        self.short = short
+        self.aggregate = aggregate
+        self.pairs = {}     # (origen, destino) -> [cantidad, total en wei]
+        self.lines = []
+        self.begin()
+
+    def name(self, address):
+        return address[2:10] if self.short else address
+
+    def write(self, tx, block_number):
+        if self.aggregate:
+            pair = self.pairs.get((tx['from'], tx['to']))
+            if pair is None:
+                self.pairs[(tx['from'], tx['to'])] = [1, tx['value']]
+            else:
+                pair[0] += 1
+                pair[1] += tx['value']
+            return
+        self.lines.append(self.edge(self.name(tx['from']), self.name(tx['to']), tx['value'], block_number))
+        if len(self.lines) >= BUFFERED_LINES:
+            self._drain()
+
+    def _drain(self):
+        if self.lines:
+            self.out.write("".join(self.lines))
+            self.lines.clear()
+
+    def flush(self):
+        """Escribe lo acumulado (salvo las aristas agregadas, que se escriben al cerrar)."""
+        self._drain()
+        self.out.flush()
+
+    def close(self):
+        for (source, target), (count, total) in self.pairs.items():
+            self.lines.append(self.aggregated(self.name(source), self.name(target), count, total))
+        self.pairs.clear()
+        self.end()
+        self.flush()
+
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+
+class PlainWriter(Writer):
+    """'plain': <origen> -> <destino> : <monto en wei> (bloque)"""
+
+    def edge(self, source, target, value, block_number):
+        return f"{source} -> {target} : {value} ({block_number})\n"
+
+    def aggregated(self, source, target, count, total):
+        return f"{source} -> {target} : {total} ({count} tx)\n"
+
+
+class DotWriter(Writer):
+    """'graphviz': un digraph completo, con su encabezado y su llave de cierre."""
+
+    def begin(self):
+        self.lines.append("digraph Transfers {\n")
+
+    def end(self):
+        self.lines.append("}\n")
+
+    def edge(self, source, target, value, block_number):
+        return f"\"{source}\" -> \"{target}\" [label=\"{format_ether(value)} ether ({block_number})\"]\n"
+
+    def aggregated(self, source, target, count, total):
+        return f"\"{source}\" -> \"{target}\" [label=\"{format_ether(total)} ether ({count} tx)\"]\n"
+
+
+class JsonLinesWriter(Writer):
+    """'jsonl': un objeto JSON por línea, con los montos en wei."""
+
+    def edge(self, source, target, value, block_number):
+        return json.dumps({'from': source, 'to': target, 'value': str(value), 'block': block_number}) + "\n"
+
+    def aggregated(self, source, target, count, total):
+        return json.dumps({'from': source, 'to': target, 'value': str(total), 'count': count}) + "\n"
+
+
+WRITERS = {
+    "plain": PlainWriter,
+    "graphviz": DotWriter,
+    "jsonl": JsonLinesWriter,
+}
@@ -1,21 +1,30 @@
 #!/usr/bin/env python3
-from flask import Flask, request, make_response, json, jsonify
-import re
+from flask import Flask, Response, request, make_response, json, jsonify, stream_with_context
 import io
 import json
 from os import urandom, listdir
 import os
+import sys
 from sys import argv, stderr, exit
-from web3 import Web3, IPCProvider
-from web3.middleware import geth_poa_middleware
 from getpass import getpass
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from common import provider, validators
+from common.rpc_batch import BatchClient
+from common.recover import SignatureRecovery
+from receipt_watcher import ReceiptWatcher
+from stamp_cache import StampCache, DEFAULT_MAX_ENTRIES, DEFAULT_NEGATIVE_TTL
+from bloom import StampedFilter, DEFAULT_BITS, DEFAULT_HASHES
+from signer import Signer, DEFAULT_GAS_PRICE_TTL
+from merkle import MerkleAnchor, DEFAULT_WINDOW, DEFAULT_MAX_LEAVES
+from time import monotonic, sleep
 app = Flask(__name__)
 
-hash_pattern = re.compile(r"0x[0-9a-fA-F]{64}")
 blockNumber = 1
-
-def is_valid_hash(h):
-    return re.match(hash_pattern, h)
+MAX_BATCH = 10000 # hashes por pedido a /stamp/batch
+RPC_BATCH = 500 # pedidos por lote JSON-RPC
+RECEIPT_TIMEOUT = 300 # segundos de espera de los recibos de un lote
+NOT_STAMPED = ("0x0000000000000000000000000000000000000000", 0)
+merkle = None # MerkleAnchor, sólo en el modo de agregación (--merkle-window)
 
 def get_private_key_from_file(filename):
     try:
@@ -29,32 +38,18 @@ def get_private_key_from_file(filename):
         print(e, file = stderr)
         exit(1)
 
-from eth_account.messages import encode_defunct
-from eth_account import Account
-
-def is_valid_signature(hash_value, signature):
-    message = encode_defunct(hexstr=hash_value) # el mensaje que es el hash encodeado
-    #print(signature)
-    #signature_bytes = bytes.fromhex(signature[2:])
-    #v_bytes = signature_bytes[-2:]
-    #v = int.from_bytes(v_bytes, byteorder='little')
-    #print(v)
-    signature_ = signature[2:]
+def is_valid_signature(hash_bytes, signature):
+    """Si la firma es de 65 bytes y de ella se recupera un firmante del hash (la recuperación se hace en el pool de procesos)."""
+    signature_ = validators.signature(signature)
+    return signature_ is not None and recovery.recover(hash_bytes, signature_) is not None
 
-    try:
-        signing_address = Account.recover_message(message, signature=signature_) #vrs=(v, r, s)
-        #print(f"==============signing_address'{str(signing_address).lower()}'")
-        return True
-    except Exception:
-        return False
-     
 
 @app.get("/stamped/<hash_value>")
 def stamped(hash_value):
     response = None
 
-    if is_valid_hash(hash_value):
-        s = contract.functions.stamped(hash_value).call()
+    if validators.bytes32(hash_value) is not None:
+        s = lookup_stamped([hash_value])[0]
         if s:
             if(s[1] != 0): # blockNumber != 0
                 j={'signer':str(s[0]),'blockNumber':s[1]}
@@ -74,6 +69,80 @@ def stamped(hash_value):
     return response
 
 
+@app.get("/stamped/<hash_value>/proof")
+def stamped_proof(hash_value):
+    """Prueba de inclusión de un hash anclado en un árbol de Merkle: raíz, camino y bloque del sellado de la raíz."""
+    if validators.bytes32(hash_value) is None:
+        response = jsonify(message="Invalid hash format")
+        response.status_code = 400
+        return response
+    found = merkle.locate([hash_value])[0] if merkle is not None else None
+    if found is None:
+        response = jsonify(message="Hash not found")
+        response.status_code = 404
+        return response
+    if found == "queued":
+        response = jsonify({'hash': hash_value, 'status': "queued"})
+        response.status_code = 202 # todavía no forma parte de ningún árbol
+        return response
+    j = {'hash': hash_value, 'algorithm': "sha256", **merkle.proof(hash_value)}
+    tree_status = j.pop('treeStatus')
+    signer_, block_number = lookup_stamped([j['root']])[0]
+    status = "anchored" if block_number != 0 else "failed" if tree_status == "failed" else "pending"
+    j.update(status=status,
+             signer=signer_ if block_number != 0 else None, blockNumber=block_number or None)
+    response = jsonify(j)
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    return response
+
+
+def send_stamp(fn, hash_value, **info):
+    """Firma y transmite un sellado de `hash_value`; devuelve el hash de la transacción o lanza la excepción del envío."""
+    txh = None
+    try:
+        signed_transaction = signer.sign(fn, signer.next_nonce())
+        txh = signed_transaction.hash.hex()
+        # se sigue antes de transmitirla; el recibo lo confirma el hilo que sigue los bloques nuevos
+        watcher.track(txh, hash=hash_value, **info)
+        stamp_cache.invalidate(hash_value) # deja de valer el "no sellado"
+        stamped_filter.add(hash_value)
+        w3.eth.send_raw_transaction(signed_transaction.rawTransaction)
+    except Exception as e:
+        if txh is not None:
+            watcher.fail(txh, str(e))
+        signer.resync() # el nonce reservado quedó sin usar
+        raise
+    return txh
+
+
+def anchor_root(root):
+    """Sella la raíz de un árbol de Merkle (la llama el hilo de `merkle`)."""
+    return send_stamp(contract.functions.stamp(root), root, root=True)
+
+
+def root_is_stamped(root):
+    """Si la raíz ya está sellada; se consulta al nodo, sin pasar por la caché."""
+    return stamped_many([root])[0][1] != 0
+
+
+def on_mined(tx):
+    stamp_cache.invalidate(tx['hash'])
+    if tx.get('root') and merkle is not None:
+        merkle.mined(tx['hash'], tx['transaction'])
+
+
+def on_failed(tx):
+    if tx.get('root') and merkle is not None:
+        merkle.retry(tx['hash'], tx['transaction'])
+
+
+def on_expired(tx):
+    # el nodo descartó la transacción (o quedó trabada): su nonce dejaría un hueco que
+    # retiene todas las siguientes, así que el contador local se vuelve a pedir al nodo
+    signer.resync()
+
+
 @app.post("/stamp")
 def stamp():
     global blockNumber
@@ -83,16 +152,26 @@ def stamp():
         response = jsonify(message=f"Invalid message mimetype: '{request.mimetype}'")
         response.status_code = 400
         response.headers["Content-Type"] = "application/json; charset=utf-8"
+        return response
         
     req = request.json
     hash_value = req.get("hash")
+    hash_bytes = validators.bytes32(hash_value)
 
-    if is_valid_hash(hash_value) is False:
+    if hash_bytes is None:
         response = jsonify(message="Invalid hash format")
         response.status_code = 400 # Bad Request
         response.headers["Content-Type"] = "application/json; charset=utf-8"
+        return response
 
-    s = contract.functions.stamped(hash_value).call()   #Me fijo si ese hash fue stamped
+    in_flight = watcher.pending_for(hash_value) # ya se envió una transacción para ese hash
+    if in_flight is not None:
+        response = jsonify({'message': "The hash is being stamped", 'transaction': in_flight})
+        response.status_code = 409
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
+        return response
+
+    s = lookup_stamped([hash_value])[0]   #Me fijo si ese hash fue stamped
 
     if(s[1] != 0): #Ese hash ya esta siendo usado por alguien 
         j={'message': "Forbidden",'signer':str(s[0]),'blockNumber':s[1]}
@@ -102,10 +181,23 @@ def stamp():
         return response 
 
     signature = req.get("signature")
-    account = w3.eth.account.from_key(private_key).address  #Registro cuenta
+
+    if signature is None and merkle is not None: # modo de agregación: se sella sólo la raíz del árbol
+        found = merkle.locate([hash_value])[0]
+        if found is not None:
+            response = jsonify({'message': "The hash is already queued for anchoring" if found == "queued" else "Forbidden",
+                                'root': None if found == "queued" else found})
+            response.status_code = 409 if found == "queued" else 403
+            return response
+        merkle.add([hash_value])
+        response = jsonify({'hash': hash_value, 'status': "queued"})
+        response.status_code = 202
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
+        response.headers["Location"] = f"/stamped/{hash_value}/proof"
+        return response
 
     if signature is not None:
-        if is_valid_signature(hash_value, signature) is False:#signature no valido
+        if is_valid_signature(hash_bytes, signature) is False:#signature no valido
             j={'message': "Bad Request"}
             response = jsonify(j)   
             response.status_code = 400
@@ -113,26 +205,189 @@ def stamp():
             return response
 
     if signature is not None:  #stamSigned() 
-        s = contract.functions.stampSigned(hash_value, signature).build_transaction({'gas': 100000,'gasPrice': w3.eth.gas_price,'nonce': w3.eth.get_transaction_count(account)})
+        fn = contract.functions.stampSigned(hash_value, signature)
     else: #stamp()
-        s = contract.functions.stamp(hash_value).build_transaction({'gas': 100000,'gasPrice': w3.eth.gas_price,'nonce': w3.eth.get_transaction_count(account)})
-   
-    signed_transaction = w3.eth.account.sign_transaction(s, private_key = private_key)
-    txh = w3.eth.send_raw_transaction(signed_transaction.rawTransaction)
-    receipt = w3.eth.wait_for_transaction_receipt(txh)
-
-    if receipt.status == 1: # no fracaso
-        j={'transaction':str(txh.hex()),'blockNumber':receipt.get("blockNumber")}
-        response = jsonify(j)
-        response.status_code = 201
-        response.headers["Content-Type"] = "application/json; charset=utf-8"
+        fn = contract.functions.stamp(hash_value)
+
+    try:
+        txh = send_stamp(fn, hash_value)
+    except Exception as e:
+        response = jsonify(message=f"Transaction rejected: {e}")
+        response.status_code = 500
         return response
-    else:# fracaso
-        response = jsonify({"message": "The hash is already stamped", "blockNumber": receipt.get("blockNumber"), "signer": receipt.get("signer")})
-        response.status_code = 403
-        response.headers["Content-Type"] = "application/json; charset=utf-8"
+
+    response = jsonify({'transaction': txh, 'status': "pending"})
+    response.status_code = 202 # Accepted: el estado se consulta en /stamp/status/<tx>
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    response.headers["Location"] = f"/stamp/status/{txh}"
+    return response
+
+
+@app.get("/stamp/status/<tx_hash>")
+def stamp_status(tx_hash):
+    """Estado de una transacción de sellado: pending, mined o failed, y su número de bloque."""
+    tx = watcher.status(tx_hash)
+    if tx is None:
+        response = jsonify(message="Transaction not found")
+        response.status_code = 404
+        return response
+    response = jsonify(tx)
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    return response
+
+
+def chunks(items, size=RPC_BATCH):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def stamped_many(hashes):
+    """Consulta `stamped` para muchos hashes con lotes de eth_call; devuelve [(signer, blockNumber)]."""
+    result = []
+    for chunk in chunks(hashes):
+        calls = [('eth_call', [{'to': contract.address, 'data': contract.encodeABI(fn_name='stamped', args=[h])}, 'latest'])
+                 for h in chunk]
+        for data in rpc.batch(calls):
+            result.append(tuple(w3.codec.decode(['address', 'uint256'], bytes.fromhex(data[2:]))))
+    return result
+
+
+def lookup_stamped(hashes):
+    """Devuelve [(signer, blockNumber)]; sólo consulta la caché (y el nodo) si el filtro de Bloom no descarta el hash."""
+    result = [NOT_STAMPED] * len(hashes)
+    maybe = [i for i, h in enumerate(hashes) if stamped_filter.might_be_stamped(h)]
+    for i, value in zip(maybe, stamp_cache.get_many([hashes[i] for i in maybe])):
+        result[i] = value
+    return result
+
+
+@app.post("/stamp/batch")
+def stamp_batch():
+    """Sella muchos hashes en un solo pedido.
+
+    El cuerpo es {"hashes": [...]}, donde cada elemento es un hash o un objeto
+    {"hash", "signature"}. Se descartan en una sola consulta por lotes los
+    hashes ya sellados, se firman todas las transacciones con nonces
+    consecutivos asignados localmente y se envían juntas. La respuesta es un
+    JSON por línea y por hash, que se emite a medida que llegan los recibos.
+    En el modo de agregación, los hashes sin firma se encolan para el
+    próximo árbol de Merkle en lugar de sellarse uno por uno.
+    """
+    if request.mimetype != "application/json":
+        response = jsonify(message=f"Invalid message mimetype: '{request.mimetype}'")
+        response.status_code = 400
+        return response
+    items = (request.get_json(silent=True) or {}).get("hashes")
+    if not isinstance(items, list) or len(items) == 0 or len(items) > MAX_BATCH:
+        response = jsonify(message=f"'hashes' must be a list of 1 to {MAX_BATCH} elements")
+        response.status_code = 400
         return response
 
+    results = [] # resultados que se conocen antes de enviar las transacciones
+    todo = [] # (hash, signature) a sellar
+    seen = set()
+    pairs = [(item.get("hash"), item.get("signature")) if isinstance(item, dict) else (item, None) for item in items]
+    # todos los hashes se validan y decodifican de una vez, y las firmas se recuperan en paralelo
+    decoded = validators.bytes32_many([h for h, _ in pairs])
+    signatures = [validators.signature(signature) if signature is not None else None for _, signature in pairs]
+    signed = [i for i, (hash_bytes, signature) in enumerate(zip(decoded, signatures))
+              if hash_bytes is not None and signature is not None]
+    signers = dict(zip(signed, recovery.recover_many([(decoded[i], signatures[i]) for i in signed])))
+    for i, ((hash_value, signature), hash_bytes) in enumerate(zip(pairs, decoded)):
+        if hash_bytes is None:
+            results.append({'hash': hash_value, 'status': "invalid", 'message': "Invalid hash format"})
+        elif signature is not None and signers.get(i) is None:
+            results.append({'hash': hash_value, 'status': "invalid", 'message': "Invalid signature"})
+        elif hash_bytes in seen:
+            results.append({'hash': hash_value, 'status': "duplicate", 'message': "Repeated in this batch"})
+        else:
+            seen.add(hash_bytes)
+            todo.append((hash_value, signature))
+
+    to_send = []
+    for (hash_value, signature), (stamped_by, block_number) in zip(todo, lookup_stamped([h for h, _ in todo])):
+        if block_number != 0:
+            results.append({'hash': hash_value, 'status': "forbidden", 'message': "Forbidden",
+                            'signer': stamped_by, 'blockNumber': block_number})
+        else:
+            to_send.append((hash_value, signature))
+
+    if merkle is not None:
+        unsigned = [hash_value for hash_value, signature in to_send if signature is None]
+        to_send = [(hash_value, signature) for hash_value, signature in to_send if signature is not None]
+        fresh = []
+        for hash_value, found in zip(unsigned, merkle.locate(unsigned)):
+            if found is None:
+                fresh.append(hash_value)
+                results.append({'hash': hash_value, 'status': "queued"})
+            else:
+                results.append({'hash': hash_value, 'status': "duplicate" if found == "queued" else "forbidden",
+                                'message': "Already anchored" if found != "queued" else "Already queued", 'root': found})
+        merkle.add(fresh)
+
+    raw = []
+    try:
+        nonce = signer.next_nonce(len(to_send)) # nonces consecutivos, reservados localmente
+        for i, (hash_value, signature) in enumerate(to_send):
+            fn = contract.functions.stampSigned(hash_value, signature) if signature is not None else contract.functions.stamp(hash_value)
+            signed = signer.sign(fn, nonce + i)
+            watcher.track(signed.hash.hex(), hash=hash_value)
+            stamp_cache.invalidate(hash_value)
+            stamped_filter.add(hash_value)
+            raw.append((signed.hash.hex(), signed.rawTransaction.hex()))
+    except Exception as e:
+        # no se transmitió ninguna: los nonces reservados quedan sin usar
+        for txh, _ in raw:
+            watcher.fail(txh, str(e))
+        signer.resync()
+        raise
+
+    pending = {} # tx hash -> hash sellado
+    for chunk, raw_chunk in zip(chunks(to_send), chunks(raw)):
+        try:
+            sent = rpc.batch([('eth_sendRawTransaction', [r]) for _, r in raw_chunk], raise_errors=False)
+        except Exception as e:
+            sent = [e] * len(raw_chunk) # el lote no llegó al nodo (o no se sabe): se dan por fallidas
+        for (hash_value, _), (txh, _), result in zip(chunk, raw_chunk, sent):
+            if isinstance(result, Exception):
+                watcher.fail(txh, str(result))
+                results.append({'hash': hash_value, 'status': "failed", 'message': str(result)})
+            else:
+                pending[txh] = hash_value
+    if len(pending) < len(to_send):
+        signer.resync() # quedaron nonces sin usar
+
+    def generate():
+        for r in results:
+            yield json.dumps(r) + "\n"
+        # los recibos los confirma el hilo que sigue los bloques nuevos
+        deadline = monotonic() + RECEIPT_TIMEOUT
+        while pending and monotonic() < deadline:
+            sleep(0.5)
+            for txh in list(pending):
+                tx = watcher.status(txh)
+                if tx is None or tx['status'] == "pending":
+                    continue
+                hash_value = pending.pop(txh)
+                status = "stamped" if tx['status'] == "mined" else "failed"
+                yield json.dumps({'hash': hash_value, 'transaction': txh, 'status': status,
+                                  'blockNumber': tx['blockNumber']}) + "\n"
+        for txh, hash_value in pending.items():
+            yield json.dumps({'hash': hash_value, 'transaction': txh, 'status': "pending"}) + "\n"
+
+    return Response(stream_with_context(generate()), status=200, mimetype="application/x-ndjson")
+
+
+@app.get("/stats")
+def stats():
+    """Contadores de la caché de `stamped`, estado del filtro de Bloom, de la agregación y tiempos de las llamadas al nodo."""
+    response = jsonify({'cache': stamp_cache.summary(), 'bloom': stamped_filter.summary(),
+                        'recovery': recovery.summary(), 'node': provider.stats.summary(),
+                        'merkle': merkle.summary() if merkle is not None else None})
+    response.status_code = 200
+    return response
+
 
 if __name__ == '__main__':
     import argparse
@@ -145,6 +400,19 @@ if __name__ == '__main__':
     parser.add_argument("--uri", "-u", help=f"URI para la conexión con geth",default=ipc_path)
     parser.add_argument("--stamper", "-s", help=f"URI del archivo Stamper.json",default=file_path)
     parser.add_argument("--keystore", "-k", help=f"URI del directorio keystore",default=keystore_dir)
+    parser.add_argument("--pool-size", help="Conexiones HTTP simultáneas con el nodo", type=int, default=provider.DEFAULT_POOL_SIZE)
+    parser.add_argument("--timeout", help="Segundos de espera de cada llamada al nodo", type=float, default=provider.DEFAULT_TIMEOUT)
+    parser.add_argument("--cache-size", help="Hashes guardados en la caché de stamped", type=int, default=DEFAULT_MAX_ENTRIES)
+    parser.add_argument("--bloom-bits", help="Tamaño en bits del filtro de Bloom de hashes sellados", type=int, default=DEFAULT_BITS)
+    parser.add_argument("--bloom-hashes", help="Funciones de hash del filtro de Bloom", type=int, default=DEFAULT_HASHES)
+    parser.add_argument("--bloom-file", help="Archivo donde se guarda el filtro de Bloom entre ejecuciones", default="stamped.bloom")
+    parser.add_argument("--negative-ttl", help="Segundos que se recuerda un hash no sellado", type=float, default=DEFAULT_NEGATIVE_TTL)
+    parser.add_argument("--recover-workers", help="Procesos para recuperar los firmantes (por omisión, uno por núcleo)", type=int, default=None)
+    parser.add_argument("--gas-price-ttl", help="Segundos que se reutiliza el precio del gas", type=float, default=DEFAULT_GAS_PRICE_TTL)
+    parser.add_argument("--merkle-window", help="Segundos que se juntan hashes sin firma para sellar sólo la raíz de su árbol de Merkle (0 los sella uno por uno)", type=float, default=DEFAULT_WINDOW)
+    parser.add_argument("--merkle-size", help="Hashes por árbol de Merkle; al llegar a esa cantidad se sella sin esperar", type=int, default=DEFAULT_MAX_LEAVES)
+    parser.add_argument("--merkle-db", help="Archivo SQLite con la cola y los árboles de Merkle", default="merkle.db")
+    parser.add_argument("--debug", help="Modo de depuración de Flask (sin recarga automática)", action="store_true")
     args = parser.parse_args()
 
     if(args.uri is not None):
@@ -153,16 +421,37 @@ if __name__ == '__main__':
         file_path = args.stamper
     if(args.keystore is not None):
         keystore_dir = args.keystore
+    if provider.is_websocket(ipc_path):
+        # los lotes JSON-RPC (/stamp/batch, recibos, filtro de Bloom) sólo van por IPC o HTTP
+        print("La URI del nodo debe ser IPC o HTTP; WebSocket no admite los pedidos por lotes", file=stderr)
+        exit(1)
+
+    # la recuperación de firmas usa CPU: se hace en otros procesos, no en los hilos de Flask
+    recovery = SignatureRecovery(args.recover_workers).start()
 
     try:
-        w3 = Web3(IPCProvider(ipc_path))
-        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        # la URI puede ser IPC o HTTP; la conexión se mantiene abierta entre pedidos
+        w3 = provider.connect(ipc_path, pool_size=args.pool_size, timeout=args.timeout)
+        rpc = BatchClient(ipc_path) # pedidos JSON-RPC por lotes
+        # confirma en segundo plano las transacciones enviadas; al minarse se olvida el "no sellado" guardado
+        # y si falla el sellado de una raíz de Merkle, se vuelve a enviar
+        watcher = ReceiptWatcher(rpc, timeout=RECEIPT_TIMEOUT, on_mined=on_mined, on_failed=on_failed,
+                                 on_expired=on_expired).start()
     except:
         print("Ocurrió un error conectandose con el archivo geth.ipc")
 
     with open(file_path) as f:
         config = json.load(f)
-        contract = w3.eth.contract(abi = config['abi'], address = config["networks"]["55555000000"]["address"])
+        network = config["networks"]["55555000000"]
+        contract = w3.eth.contract(abi = config['abi'], address = network["address"])
+
+    # el filtro se construye en segundo plano recorriendo las transacciones al contrato desde su despliegue
+    deployed = w3.eth.get_transaction(network["transactionHash"])["blockNumber"]
+    stamped_filter = StampedFilter(rpc, contract.address, deployed, bits=args.bloom_bits,
+                                   hashes=args.bloom_hashes, path=args.bloom_file).start()
+
+    stamp_cache = StampCache(stamped_many, lambda: watcher.last_block or w3.eth.block_number,
+                             max_entries=args.cache_size, negative_ttl=args.negative_ttl)
 
     keystore = list(map(lambda f: os.path.join(
         keystore_dir, f), sorted(listdir(keystore_dir))))
@@ -175,5 +464,12 @@ if __name__ == '__main__':
     except FileNotFoundError:
         print("No se pudo encontrar el archivo")
         exit(1)
+    signer = Signer(w3, private_key, gas_price_ttl=args.gas_price_ttl) # deriva la dirección una sola vez
+
+    if args.merkle_window > 0:
+        merkle = MerkleAnchor(args.merkle_db, anchor_root, root_is_stamped, window=args.merkle_window,
+                              max_leaves=args.merkle_size).start()
         
-    app.run(debug=True)
+    # sin el recargador de Werkzeug: volvería a ejecutar este bloque en otro proceso, con otra
+    # copia de los hilos (recibos, filtro, anclaje) y otro contador de nonces para la misma cuenta
+    app.run(debug=args.debug, use_reloader=False, threaded=True)
@@ -0,0 +1,173 @@
+"""Filtro de Bloom de los hashes sellados, construido a partir de las transacciones al Stamper."""
+import hashlib
+import math
+import os
+import struct
+import threading
+from time import monotonic, sleep
+
+from web3 import Web3
+
+from common.block_scanner import BlockScanner
+
+DEFAULT_BITS = 1 << 24 # 2 MiB
+DEFAULT_HASHES = 7
+# stamp(bytes32) y stampSigned(bytes32,bytes): en ambos el hash es el primer argumento
+SELECTORS = {Web3.keccak(text="stamp(bytes32)")[:4].hex()[-8:],
+             Web3.keccak(text="stampSigned(bytes32,bytes)")[:4].hex()[-8:]}
+HEADER = struct.Struct(">QIQQ") # bits, funciones de hash, bits en 1, próximo bloque a recorrer
+SAVE_INTERVAL = 30 # segundos entre escrituras del filtro durante el recorrido inicial
+
+
+class BloomFilter:
+    """Filtro de Bloom de `bits` bits con `hashes` posiciones por elemento.
+
+    Las posiciones se derivan de un único blake2b por elemento (doble hashing).
+    Se lleva la cuenta de bits en 1 para estimar la tasa de falsos positivos
+    con la ocupación real, que no cambia si un elemento se agrega dos veces.
+    """
+
+    def __init__(self, bits=DEFAULT_BITS, hashes=DEFAULT_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+        self.ones = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, item):
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not self.array[p >> 3] & mask:
+                self.array[p >> 3] |= mask
+                self.ones += 1
+
+    def __contains__(self, item):
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def false_positive_rate(self):
+        return (self.ones / self.bits) ** self.hashes
+
+    def estimated_items(self):
+        """Cantidad de elementos distintos estimada a partir de la ocupación."""
+        if self.ones >= self.bits:
+            return None
+        return round(-self.bits / self.hashes * math.log(1 - self.ones / self.bits))
+
+
+def hash_bytes(hash_value):
+    return bytes.fromhex(hash_value[2:] if hash_value.startswith(("0x", "0X")) else hash_value)
+
+
+class StampedFilter:
+    """Filtro de Bloom de todos los hashes enviados a `stamp`/`stampSigned`.
+
+    Un hilo recorre los bloques desde el del despliegue del contrato y luego
+    sigue los nuevos; los últimos `confirmations` bloques se vuelven a
+    recorrer en cada vuelta, por si se reorganizaron. Hasta alcanzar la
+    cabeza de la cadena el filtro no está listo y no descarta nada. Si se da
+    `path`, el filtro se guarda ahí al terminar cada vuelta y se retoma desde
+    ese punto al reiniciar. Los bloques vueltos a recorrer no agregan
+    elementos nuevos al filtro, así que no empeoran su precisión.
+    """
+
+    def __init__(self, rpc, address, from_block, bits=DEFAULT_BITS, hashes=DEFAULT_HASHES,
+                 path=None, poll_interval=2, confirmations=12, workers=4):
+        self.address = address.lower()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.confirmations = confirmations
+        self.rpc = rpc
+        self.scanner = BlockScanner(rpc, workers=workers, confirmations=confirmations, normalize=self._normalize)
+        self.filter = BloomFilter(bits, hashes)
+        self.next_block = from_block # primer bloque todavía no confirmado
+        self.ready = False
+        self.queries = self.definite_misses = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def start(self):
+        threading.Thread(target=self._loop, daemon=True).start()
+        return self
+
+    def _normalize(self, raw):
+        """Se queda sólo con los hashes de las llamadas a stamp/stampSigned del bloque."""
+        stamped = []
+        for tx in raw['transactions']:
+            data = tx['input']
+            if tx['to'] is not None and tx['to'].lower() == self.address and data[2:10] in SELECTORS:
+                stamped.append(data[10:74])
+        return {'number': int(raw['number'], 16), 'transactions': stamped}
+
+    def add(self, hash_value):
+        """Agrega un hash (por ejemplo, uno que la propia API acaba de sellar)."""
+        with self._lock:
+            self.filter.add(hash_bytes(hash_value))
+
+    def might_be_stamped(self, hash_value):
+        """Falso sólo si es seguro que el hash no fue sellado hasta el último bloque recorrido."""
+        with self._lock:
+            self.queries += 1
+            if not self.ready or hash_bytes(hash_value) in self.filter:
+                return True
+            self.definite_misses += 1
+            return False
+
+    def _loop(self):
+        while True:
+            try:
+                self._scan()
+            except Exception:
+                pass # el nodo no respondió: se reintenta en la vuelta siguiente
+            sleep(self.poll_interval)
+
+    def _scan(self):
+        head = int(self.rpc.batch([('eth_blockNumber', [])])[0], 16)
+        confirmed = head - self.confirmations
+        saved = monotonic()
+        for block in self.scanner.blocks(self.next_block, head):
+            with self._lock:
+                for h in block['transactions']:
+                    self.filter.add(bytes.fromhex(h))
+                if block['number'] <= confirmed:
+                    self.next_block = block['number'] + 1
+            if monotonic() - saved > SAVE_INTERVAL:
+                self._save()
+                saved = monotonic()
+        with self._lock:
+            self.next_block = max(self.next_block, head - self.confirmations + 1)
+            self.ready = True
+        self._save()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            bits, hashes, ones, next_block = HEADER.unpack(f.read(HEADER.size))
+            if (bits, hashes) != (self.filter.bits, self.filter.hashes):
+                return # cambió la configuración: se reconstruye
+            self.filter.array = bytearray(f.read())
+            self.filter.ones = ones
+            self.next_block = max(self.next_block, next_block)
+
+    def _save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            data = HEADER.pack(self.filter.bits, self.filter.hashes, self.filter.ones, self.next_block) + bytes(self.filter.array)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        with self._lock:
+            return {'ready': self.ready, 'bits': self.filter.bits, 'hashes': self.filter.hashes,
+                    'bytes': len(self.filter.array), 'estimatedItems': self.filter.estimated_items(),
+                    'fill': round(self.filter.ones / self.filter.bits, 6),
+                    'falsePositiveRate': self.filter.false_positive_rate(),
+                    'nextBlock': self.next_block, 'queries': self.queries,
+                    'definiteMisses': self.definite_misses}
@@ -0,0 +1,261 @@
+"""Anclaje de muchos hashes con un único sellado: árboles de Merkle SHA-256.
+
+Las hojas son sha256(0x00 || hash) y cada nodo interno es
+sha256(0x01 || izquierdo || derecho); si un nivel tiene una cantidad impar
+de nodos, el último pasa sin cambios al nivel siguiente. El prefijo
+distingue hojas de nodos internos, así que no se puede presentar un nodo
+interno como si fuera un documento.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+DEFAULT_WINDOW = 0 # segundos; 0 desactiva la agregación
+DEFAULT_MAX_LEAVES = 10000
+DEFAULT_MAX_ATTEMPTS = 3 # envíos de una raíz antes de darla por fallida
+BUSY_TIMEOUT = 30
+TREE_CACHE = 8 # árboles recientes que se mantienen armados en memoria
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    hash TEXT PRIMARY KEY,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trees (
+    root TEXT PRIMARY KEY,
+    leaves BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    tx_hash TEXT,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending, anchored o failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leaves (
+    hash TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    idx INTEGER NOT NULL
+);
+"""
+
+
+def leaf_hash(value):
+    return sha256(b"\x00" + value).digest()
+
+
+def node_hash(left, right):
+    return sha256(b"\x01" + left + right).digest()
+
+
+class MerkleTree:
+    """Árbol de Merkle sobre una lista de hashes de 32 bytes, con todos sus niveles."""
+
+    def __init__(self, values):
+        if not values:
+            raise ValueError("empty tree")
+        self.levels = [[leaf_hash(v) for v in values]]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self):
+        return self.levels[-1][0]
+
+    def proof(self, index):
+        """Camino de la hoja `index` a la raíz: [(posición del hermano, hash del hermano)]."""
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                path.append(("left" if sibling < index else "right", level[sibling]))
+            index //= 2
+        return path
+
+
+def verify(value, proof, root):
+    """Si `proof` (como lo devuelve `MerkleTree.proof`) lleva del hash `value` a `root`."""
+    node = leaf_hash(value)
+    for position, sibling in proof:
+        node = node_hash(sibling, node) if position == "left" else node_hash(node, sibling)
+    return node == root
+
+
+class MerkleAnchor:
+    """Junta hashes y sella sólo la raíz del árbol que forman.
+
+    Los hashes recibidos se guardan en una cola (en SQLite, así que no se
+    pierden si el servidor se reinicia). Cuando el más antiguo esperó
+    `window` segundos, o la cola llega a `max_leaves`, se arma el árbol, se
+    guardan sus hojas y se llama a `anchor(raíz)`, que envía la transacción
+    y devuelve su hash. Si el envío falla, o la transacción se mina con
+    error (ver `retry`), la raíz se vuelve a sellar en la vuelta siguiente,
+    salvo que `is_anchored(raíz)` indique que ya está sellada en la cadena.
+    Después de `max_attempts` envíos la raíz queda como fallida.
+    """
+
+    def __init__(self, path, anchor, is_anchored, window=DEFAULT_WINDOW, max_leaves=DEFAULT_MAX_LEAVES,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, poll_interval=1):
+        self.anchor = anchor
+        self.is_anchored = is_anchored
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_leaves = max_leaves
+        self.poll_interval = poll_interval
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.trees = OrderedDict() # raíz -> MerkleTree, los últimos consultados
+        self.anchored = self.failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, daemon=True).start()
+        return self
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def add(self, hashes):
+        """Encola los hashes (cadenas "0x..."); los que ya están en la cola o en un árbol se ignoran."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO queue SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM leaves WHERE hash = ?) "
+                "ON CONFLICT (hash) DO NOTHING",
+                [(h.lower(), now, h.lower()) for h in hashes])
+            queued = self.conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+        if queued >= self.max_leaves:
+            self._wake.set()
+
+    def locate(self, hashes):
+        """Devuelve, para cada hash, None, "queued" o la raíz del árbol que lo incluye."""
+        keys = [h.lower() for h in hashes]
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(self._query(f"SELECT hash, 'queued' FROM queue WHERE hash IN ({marks})", chunk))
+            found.update(self._query(f"SELECT hash, root FROM leaves WHERE hash IN ({marks})", chunk))
+        return [found.get(k) for k in keys]
+
+    def proof(self, hash_value):
+        """Devuelve la raíz, la posición, el camino, la transacción y el estado del árbol de un hash anclado, o None."""
+        rows = self._query(
+            "SELECT l.root, l.idx, t.size, t.tx_hash, t.status FROM leaves l JOIN trees t ON t.root = l.root "
+            "WHERE l.hash = ?",
+            (hash_value.lower(),))
+        if not rows:
+            return None
+        root, index, size, tx_hash, status = rows[0]
+        path = self._tree(root).proof(index)
+        return {'root': root, 'index': index, 'size': size, 'transaction': tx_hash, 'treeStatus': status,
+                'proof': [{'position': p, 'hash': f"0x{h.hex()}"} for p, h in path]}
+
+    def _tree(self, root):
+        with self._lock:
+            tree = self.trees.get(root)
+            if tree is not None:
+                self.trees.move_to_end(root)
+                return tree
+            data = self.conn.execute("SELECT leaves FROM trees WHERE root = ?", (root,)).fetchone()[0]
+        tree = MerkleTree([data[i:i + 32] for i in range(0, len(data), 32)])
+        with self._lock:
+            self.trees[root] = tree
+            while len(self.trees) > TREE_CACHE:
+                self.trees.popitem(last=False)
+        return tree
+
+    def retry(self, root, tx_hash):
+        """Vuelve a sellar una raíz cuya transacción `tx_hash` falló.
+
+        Si la raíz ya tiene otra transacción (p.ej. la que la selló), no se
+        toca; antes de reenviarla, `_send` verifica que no esté sellada.
+        """
+        with self._lock, self.conn:
+            changed = self.conn.execute(
+                "UPDATE trees SET tx_hash = NULL WHERE root = ? AND tx_hash = ? AND status = 'pending'",
+                (root.lower(), tx_hash.lower())).rowcount
+        if changed:
+            self.failures += 1
+            self._wake.set()
+
+    def mined(self, root, tx_hash):
+        """Registra que la transacción `tx_hash` selló la raíz."""
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE trees SET status = 'anchored' WHERE root = ? AND tx_hash = ?",
+                              (root.lower(), tx_hash.lower()))
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                while self._flush():
+                    pass
+                self._send()
+            except Exception:
+                pass # se reintenta en la vuelta siguiente
+
+    def _flush(self):
+        """Arma y guarda un árbol con los hashes más antiguos de la cola, si corresponde."""
+        with self._lock:
+            count, oldest = self.conn.execute("SELECT COUNT(*), MIN(added) FROM queue").fetchone()
+            if count == 0 or (count < self.max_leaves and time.time() - oldest < self.window):
+                return False
+            hashes = [h for h, in self.conn.execute(
+                "SELECT hash FROM queue ORDER BY added, rowid LIMIT ?", (self.max_leaves,))]
+        values = [bytes.fromhex(h[2:]) for h in hashes]
+        root = f"0x{MerkleTree(values).root.hex()}"
+        with self._lock, self.conn:
+            self.conn.execute("INSERT INTO trees (root, leaves, size, created) VALUES (?, ?, ?, ?)",
+                              (root, b"".join(values), len(values), time.time()))
+            self.conn.executemany("INSERT INTO leaves VALUES (?, ?, ?)",
+                                  [(h, root, i) for i, h in enumerate(hashes)])
+            self.conn.executemany("DELETE FROM queue WHERE hash = ?", [(h,) for h in hashes])
+        return True
+
+    def _send(self):
+        """Sella las raíces guardadas que todavía no tienen transacción.
+
+        Una raíz ya sellada (por un envío anterior cuyo recibo no se vio, o
+        por otro proceso) se marca como anclada sin reenviarla, porque
+        `stamp` revierte con un hash existente; una raíz que agotó sus
+        intentos se marca como fallida.
+        """
+        rows = self._query("SELECT root, attempts FROM trees WHERE tx_hash IS NULL AND status = 'pending' "
+                           "ORDER BY created")
+        for root, attempts in rows:
+            if self.is_anchored(root):
+                self._set_status(root, 'anchored')
+                continue
+            if attempts >= self.max_attempts:
+                self._set_status(root, 'failed')
+                continue
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE trees SET attempts = attempts + 1 WHERE root = ?", (root,))
+            tx_hash = self.anchor(root)
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE trees SET tx_hash = ? WHERE root = ? AND tx_hash IS NULL",
+                                  (tx_hash.lower(), root))
+            self.anchored += 1
+
+    def _set_status(self, root, status):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE trees SET status = ? WHERE root = ?", (status, root))
+
+    def summary(self):
+        with self._lock:
+            queued = self.conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+            trees, leaves = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM trees").fetchone()
+            failed = self.conn.execute("SELECT COUNT(*) FROM trees WHERE status = 'failed'").fetchone()[0]
+        return {'window': self.window, 'maxLeaves': self.max_leaves, 'queued': queued,
+                'trees': trees, 'leaves': leaves, 'anchored': self.anchored, 'retries': self.failures,
+                'failedTrees': failed}
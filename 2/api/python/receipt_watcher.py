@@ -0,0 +1,150 @@
+"""Seguimiento en segundo plano de las transacciones enviadas por la API."""
+import threading
+from collections import OrderedDict
+from time import monotonic, sleep
+
+PENDING = "pending"
+MINED = "mined"
+FAILED = "failed"
+DEFAULT_TIMEOUT = 300 # segundos sin recibo tras los cuales una transacción se da por fallida
+
+
+class ReceiptWatcher:
+    """Sigue los bloques nuevos y confirma las transacciones enviadas.
+
+    En lugar de consultar el recibo de cada transacción pendiente, en cada
+    vuelta se piden (en un lote) los bloques nuevos con los hashes de sus
+    transacciones, y sólo se piden los recibos de las transacciones propias
+    que aparecen en ellos. El costo depende de la cantidad de bloques nuevos
+    y no de la cantidad de transacciones en vuelo. `on_mined`, si se da,
+    se llama con el estado de cada transacción minada con éxito, y
+    `on_failed` con el de cada una minada con error.
+
+    Una transacción que pasa `timeout` segundos sin minarse (el nodo la
+    descartó, o quedó trabada por su nonce o su precio) se marca como
+    fallida, así deja de estar en vuelo; también se llama `on_failed`, y
+    antes `on_expired`, que permite volver a sincronizar los nonces.
+    """
+
+    def __init__(self, rpc, poll_interval=1, max_tracked=100000, timeout=DEFAULT_TIMEOUT,
+                 on_mined=None, on_failed=None, on_expired=None):
+        self.rpc = rpc
+        self.on_expired = on_expired
+        self.on_mined = on_mined
+        self.on_failed = on_failed
+        self.poll_interval = poll_interval
+        self.max_tracked = max_tracked
+        self.timeout = timeout
+        self.txs = OrderedDict()    # tx hash -> {'status', 'blockNumber', 'hash', ...}
+        self.in_flight = {}         # hash sellado -> tx hash, mientras esté pendiente
+        self.tracked_at = {}        # tx hash -> momento en que se registró, mientras esté pendiente
+        self.last_block = None
+        self.expired = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._loop, daemon=True).start()
+        return self
+
+    def track(self, tx_hash, **info):
+        """Registra una transacción; `info` se devuelve junto con su estado.
+
+        Conviene llamarlo antes de transmitirla (el hash se conoce al firmarla),
+        para que no pueda minarse en un bloque que el hilo ya haya revisado.
+        """
+        tx_hash = tx_hash.lower()
+        with self._lock:
+            self.txs[tx_hash] = {**info, 'transaction': tx_hash, 'status': PENDING, 'blockNumber': None}
+            self.tracked_at[tx_hash] = monotonic()
+            if 'hash' in info:
+                self.in_flight[info['hash'].lower()] = tx_hash
+            while len(self.txs) > self.max_tracked:
+                old_hash, old = next(iter(self.txs.items()))
+                if old['status'] == PENDING:
+                    break
+                del self.txs[old_hash]
+
+    def fail(self, tx_hash, message):
+        """Marca como fallida una transacción que el nodo no aceptó."""
+        with self._lock:
+            self._finish(tx_hash.lower(), FAILED, message=message)
+
+    def _finish(self, tx_hash, status, **fields):
+        """Cierra una transacción pendiente (con el lock tomado) y devuelve una copia de su estado."""
+        tx = self.txs[tx_hash]
+        tx.update(status=status, **fields)
+        self.tracked_at.pop(tx_hash, None)
+        if 'hash' in tx:
+            self.in_flight.pop(tx['hash'].lower(), None)
+        return dict(tx)
+
+    def status(self, tx_hash):
+        """Devuelve una copia del estado de una transacción seguida, o None."""
+        with self._lock:
+            tx = self.txs.get(tx_hash.lower())
+            return None if tx is None else dict(tx)
+
+    def pending_for(self, hash_value):
+        """Devuelve la transacción en vuelo que sella `hash_value`, o None."""
+        return self.in_flight.get(hash_value.lower())
+
+    def _loop(self):
+        while True:
+            try:
+                self._poll()
+            except Exception:
+                pass # el nodo no respondió: se reintenta en la vuelta siguiente
+            try:
+                self._expire()
+            except Exception:
+                pass # falló un callback; las transacciones ya quedaron como fallidas
+            sleep(self.poll_interval)
+
+    def _expire(self):
+        """Da por fallidas las transacciones que llevan más de `timeout` segundos sin minarse."""
+        limit = monotonic() - self.timeout
+        with self._lock:
+            stale = [h for h, at in self.tracked_at.items() if at < limit]
+            expired = [self._finish(h, FAILED, message=f"Sin recibo después de {self.timeout} segundos")
+                       for h in stale]
+            self.expired += len(expired)
+        if self.on_expired is not None:
+            for tx in expired:
+                self.on_expired(tx)
+        if self.on_failed is not None:
+            for tx in expired:
+                self.on_failed(tx)
+
+    def _poll(self):
+        head = int(self.rpc.batch([('eth_blockNumber', [])])[0], 16)
+        if self.last_block is None:
+            self.last_block = head - 1
+        if head <= self.last_block:
+            return
+        with self._lock:
+            waiting = {h for h, tx in self.txs.items() if tx['status'] == PENDING}
+        if not waiting:
+            self.last_block = head
+            return
+        numbers = range(self.last_block + 1, head + 1)
+        blocks = self.rpc.batch([('eth_getBlockByNumber', [hex(n), False]) for n in numbers])
+        found = [h for block in blocks if block for h in block['transactions'] if h.lower() in waiting]
+        receipts = self.rpc.batch([('eth_getTransactionReceipt', [h]) for h in found])
+        mined, failed = [], []
+        with self._lock:
+            for receipt in receipts:
+                if receipt is None:
+                    continue
+                tx_hash = receipt['transactionHash'].lower()
+                if self.txs[tx_hash]['status'] != PENDING:
+                    continue # se dio por vencida mientras se pedían los recibos
+                status = MINED if int(receipt['status'], 16) == 1 else FAILED
+                tx = self._finish(tx_hash, status, blockNumber=int(receipt['blockNumber'], 16))
+                (mined if status == MINED else failed).append(tx)
+        if self.on_mined is not None:
+            for tx in mined:
+                self.on_mined(tx)
+        if self.on_failed is not None:
+            for tx in failed:
+                self.on_failed(tx)
+        self.last_block = head
@@ -0,0 +1,70 @@
+"""Firma local de las transacciones de la API, sin consultar al nodo en cada pedido."""
+import threading
+from time import monotonic
+
+from eth_account import Account
+
+DEFAULT_GAS_PRICE_TTL = 15 # segundos
+DEFAULT_GAS = 100000 # si no se puede estimar
+GAS_MARGIN = 1.2
+
+
+class Signer:
+    """Firma transacciones de contrato con una clave privada.
+
+    La dirección se deriva una sola vez; el precio del gas se vuelve a pedir
+    cada `gas_price_ttl` segundos y el gas de cada función del contrato se
+    estima la primera vez que se la usa (con un margen). Los nonces se
+    reservan de un contador local, que se sincroniza con las transacciones
+    pendientes del nodo al empezar y cada vez que se llama a `resync`
+    (por ejemplo, cuando el nodo rechaza una transacción).
+    """
+
+    def __init__(self, w3, private_key, gas_price_ttl=DEFAULT_GAS_PRICE_TTL):
+        self.w3 = w3
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.chain_id = w3.eth.chain_id
+        self.gas_price_ttl = gas_price_ttl
+        self._gas_price = None
+        self._gas_price_at = None
+        self._gas = {}      # nombre de la función -> gas estimado
+        self._nonce = None
+        self._lock = threading.Lock()
+
+    def gas_price(self):
+        now = monotonic()
+        if self._gas_price is None or now - self._gas_price_at > self.gas_price_ttl:
+            self._gas_price = self.w3.eth.gas_price
+            self._gas_price_at = now
+        return self._gas_price
+
+    def gas(self, fn):
+        """Gas para la función `fn`, estimado una vez por función."""
+        gas = self._gas.get(fn.fn_name)
+        if gas is None:
+            try:
+                gas = self._gas[fn.fn_name] = int(fn.estimate_gas({'from': self.address}) * GAS_MARGIN)
+            except Exception:
+                return DEFAULT_GAS # la llamada revertiría: no se guarda la estimación
+        return gas
+
+    def next_nonce(self, count=1):
+        """Reserva `count` nonces consecutivos y devuelve el primero."""
+        with self._lock:
+            if self._nonce is None:
+                self._nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self._nonce
+            self._nonce += count
+            return nonce
+
+    def resync(self):
+        """Descarta el contador local; el próximo nonce se vuelve a pedir al nodo."""
+        with self._lock:
+            self._nonce = None
+
+    def sign(self, fn, nonce):
+        """Firma la transacción de `fn` con el nonce dado; no hace llamadas al nodo salvo la primera estimación de gas."""
+        tx = fn.build_transaction({'from': self.address, 'chainId': self.chain_id, 'nonce': nonce,
+                                   'gas': self.gas(fn), 'gasPrice': self.gas_price()})
+        return self.account.sign_transaction(tx)
@@ -0,0 +1,81 @@
+"""Caché de las consultas a `Stamper.stamped()`."""
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_NEGATIVE_TTL = 5 # segundos
+DEFAULT_CONFIRMATIONS = 12
+
+
+class StampCache:
+    """Caché LRU con vencimiento para `stamped(hash) -> (signer, blockNumber)`.
+
+    Un sellado con suficientes confirmaciones no cambia más, así que se
+    guarda sin vencimiento (sólo sale por tamaño). Un "no sellado" (o un
+    sellado demasiado reciente) vence a los `negative_ttl` segundos, y se
+    invalida cuando la propia API sella ese hash. `lookup` recibe una lista
+    de hashes y devuelve la lista de resultados, en el mismo orden; `head`
+    devuelve el último bloque conocido.
+    """
+
+    def __init__(self, lookup, head, max_entries=DEFAULT_MAX_ENTRIES,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, confirmations=DEFAULT_CONFIRMATIONS):
+        self.lookup = lookup
+        self.head = head
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.confirmations = confirmations
+        self.entries = OrderedDict() # hash -> ((signer, blockNumber), vencimiento o None)
+        self.hits = self.negative_hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, hash_value):
+        return self.get_many([hash_value])[0]
+
+    def get_many(self, hashes):
+        """Devuelve [(signer, blockNumber)] consultando al nodo sólo los hashes que no están en caché."""
+        keys = [h.lower() for h in hashes]
+        result = [None] * len(keys)
+        missing = []
+        now = monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self.entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self.entries.move_to_end(key)
+                    result[i] = entry[0]
+                    if entry[0][1] == 0:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                else:
+                    missing.append(i)
+            self.misses += len(missing)
+        if missing:
+            fetched = self.lookup([hashes[i] for i in missing])
+            final = self.head() - self.confirmations
+            expires = monotonic() + self.negative_ttl
+            with self._lock:
+                for i, value in zip(missing, fetched):
+                    value = tuple(value)
+                    result[i] = value
+                    self.entries[keys[i]] = (value, None if 0 < value[1] <= final else expires)
+                    self.entries.move_to_end(keys[i])
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def invalidate(self, hash_value):
+        """Descarta lo guardado para `hash_value` (por ejemplo, al sellarlo)."""
+        with self._lock:
+            self.entries.pop(hash_value.lower(), None)
+
+    def summary(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {'entries': len(self.entries), 'maxEntries': self.max_entries,
+                    'hits': self.hits, 'negativeHits': self.negative_hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'hitRate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else None}
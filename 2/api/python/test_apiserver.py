@@ -18,18 +18,28 @@ stamped_200_schema = {
     "required": ["signer", "blockNumber"]
 }
 
-stamp_201_schema = {
+stamp_202_schema = {
     "type": "object",
     "properties": {
         "transaction": {"type": "string"},
+        "status": {"type": "string"},
+    },
+    "required": ["transaction", "status"]
+}
+
+stamp_status_schema = {
+    "type": "object",
+    "properties": {
+        "transaction": {"type": "string"},
+        "status": {"enum": ["pending", "mined", "failed"]},
         "blockNumber": {
             "anyOf": [
                 {"type": "number"},
-                {"type": "string"}
+                {"type": "null"}
             ]
         },
     },
-    "required": ["transaction", "blockNumber"]
+    "required": ["transaction", "status", "blockNumber"]
 }
 
 stamp_403_schema = {
@@ -65,6 +75,28 @@ def stamped(h):
 
 
 stamp = f"{server}/stamp"
+stamp_batch = f"{server}/stamp/batch"
+
+
+stats = f"{server}/stats"
+
+
+def stamp_status(tx):
+    return f"{server}/stamp/status/{tx}"
+
+
+def wait_mined(tx, timeout=60):
+    """Consulta /stamp/status hasta que la transacción deja de estar pendiente."""
+    from time import sleep
+    for _ in range(timeout):
+        response = requests.get(stamp_status(tx))
+        assert (response.status_code == 200)
+        r = response.json()
+        validate(instance=r, schema=stamp_status_schema)
+        if r["status"] != "pending":
+            return r
+        sleep(1)
+    raise AssertionError(f"{tx} sigue pendiente")
 
 
 def random_hash():
@@ -135,9 +167,12 @@ def test_stamp():
     hash_value = random_hash()
     response = requests.post(stamp, json={"hash": hash_value})
     assert (application_json in response.headers['Content-type'])
-    assert (response.status_code == 201)
+    assert (response.status_code == 202)
     r = response.json()
-    validate(instance=r, schema=stamp_201_schema)
+    validate(instance=r, schema=stamp_202_schema)
+    assert (response.headers['Location'].endswith(r["transaction"]))
+    r = wait_mined(r["transaction"])
+    assert (r["status"] == "mined")
     block_number = r["blockNumber"]
     response = requests.get(stamped(hash_value))
     assert (application_json in response.headers['Content-type'])
@@ -155,6 +190,25 @@ def test_stamp():
     assert (r["signer"] == signer)
 
 
+def test_stamp_in_flight():
+    hash_value = random_hash()
+    response = requests.post(stamp, json={"hash": hash_value})
+    assert (response.status_code == 202)
+    tx = response.json()["transaction"]
+    response = requests.post(stamp, json={"hash": hash_value})
+    if response.status_code == 409: # todavía no se minó la primera
+        assert (response.json()["transaction"] == tx)
+    else:
+        assert (response.status_code == 403)
+    wait_mined(tx)
+
+
+def test_stamp_status_unknown():
+    response = requests.get(stamp_status(random_hash()))
+    assert (response.status_code == 404)
+    validate(instance=response.json(), schema=error_4XX_schema)
+
+
 def test_stamp_signed():
     from eth_account import Account
     from eth_account.messages import encode_defunct
@@ -166,9 +220,12 @@ def test_stamp_signed():
     response = requests.post(
         stamp, json={"hash": hash_value, "signature": signature})
     assert (application_json in response.headers['Content-type'])
-    assert (response.status_code == 201)
+    assert (response.status_code == 202)
     r = response.json()
-    validate(instance=r, schema=stamp_201_schema)
+    validate(instance=r, schema=stamp_202_schema)
+    assert (response.headers['Location'].endswith(r["transaction"]))
+    r = wait_mined(r["transaction"])
+    assert (r["status"] == "mined")
     block_number = r["blockNumber"]
     response = requests.get(stamped(hash_value))
     assert (application_json in response.headers['Content-type'])
@@ -196,3 +253,63 @@ def test_invalid_signature():
     assert (response.status_code == 400)
     r = response.json()
     validate(instance=r, schema=error_4XX_schema)
+
+
+def test_stamp_batch():
+    import json
+    hashes = [random_hash() for _ in range(5)]
+    response = requests.post(stamp_batch, json={"hashes": hashes + [hashes[0], "0x01"]})
+    assert (response.status_code == 200)
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert (len(lines) == 7)
+    by_status = {}
+    for r in lines:
+        by_status.setdefault(r["status"], []).append(r)
+    assert (len(by_status["stamped"]) == 5)
+    assert (len(by_status["duplicate"]) == 1)
+    assert (len(by_status["invalid"]) == 1)
+    for r in by_status["stamped"]:
+        response = requests.get(stamped(r["hash"]))
+        assert (response.status_code == 200)
+        assert (response.json()["blockNumber"] == r["blockNumber"])
+    response = requests.post(stamp_batch, json={"hashes": hashes})
+    assert (response.status_code == 200)
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert (all(r["status"] == "forbidden" for r in lines))
+
+
+def test_stamp_batch_invalid():
+    response = requests.post(stamp_batch, data={"hashes": random_hash()})
+    assert (response.status_code == 400)
+    response = requests.post(stamp_batch, json={"hashes": []})
+    assert (response.status_code == 400)
+    validate(instance=response.json(), schema=error_4XX_schema)
+
+
+def test_stats_cache():
+    def answered(r):
+        # cada consulta la responde el filtro de Bloom (descarte seguro) o la caché (acierto o fallo)
+        return r["bloom"]["definiteMisses"] + r["cache"]["negativeHits"] + r["cache"]["misses"]
+    hash_value = random_hash()
+    before = requests.get(stats).json()
+    for _ in range(3):
+        assert requests.get(stamped(hash_value)).status_code == 404
+    after = requests.get(stats).json()
+    assert answered(after) >= answered(before) + 3
+    assert after["cache"]["misses"] <= before["cache"]["misses"] + 1
+
+
+def test_stats_bloom():
+    r = requests.get(stats).json()["bloom"]
+    assert r["bits"] > 0 and r["hashes"] > 0
+    assert 0 <= r["falsePositiveRate"] <= 1
+
+
+def test_stamped_proof():
+    response = requests.get(f"{stamped('0x01')}/proof")
+    assert (response.status_code == 400)
+    validate(instance=response.json(), schema=error_4XX_schema)
+    response = requests.get(f"{stamped(random_hash())}/proof")
+    assert (application_json in response.headers['Content-type'])
+    assert (response.status_code == 404)
+    validate(instance=response.json(), schema=error_4XX_schema)
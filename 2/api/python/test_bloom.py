@@ -0,0 +1,64 @@
+"""Casos de prueba del filtro de Bloom de los hashes sellados (sin nodo)."""
+import os
+import sys
+from os import urandom
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from bloom import BloomFilter, StampedFilter, hash_bytes
+
+STAMPER = "0x00000000000000000000000000000000000000cc"
+
+
+def test_no_false_negatives() -> None:
+    """Prueba que todo elemento agregado esté en el filtro."""
+    bloom = BloomFilter(bits=1 << 16, hashes=7)
+    items = [urandom(32) for _ in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+
+
+def test_false_positive_rate() -> None:
+    """Prueba que la tasa de falsos positivos observada sea del orden de la estimada."""
+    bloom = BloomFilter(bits=1 << 16, hashes=7)
+    for _ in range(4000):
+        bloom.add(urandom(32))
+    expected = bloom.false_positive_rate()
+    observed = sum(urandom(32) in bloom for _ in range(20000)) / 20000
+    assert observed < 3 * expected + 0.001
+
+
+def test_estimated_items() -> None:
+    """Prueba que la estimación de elementos no cuente dos veces un elemento repetido."""
+    bloom = BloomFilter(bits=1 << 20, hashes=7)
+    items = [urandom(32) for _ in range(1000)]
+    for item in items + items:
+        bloom.add(item)
+    assert 950 <= bloom.estimated_items() <= 1050
+
+
+def test_hash_bytes() -> None:
+    assert hash_bytes("0xABcd") == hash_bytes("abcd") == bytes.fromhex("abcd")
+
+
+def test_stamped_filter_not_ready() -> None:
+    """Prueba que el filtro no descarte nada antes de terminar el primer recorrido."""
+    stamped = StampedFilter(None, STAMPER, 0, bits=1 << 12, hashes=3)
+    assert stamped.might_be_stamped(f"0x{urandom(32).hex()}")
+    stamped.ready = True
+    value = f"0x{urandom(32).hex()}"
+    stamped.add(value)
+    assert stamped.might_be_stamped(value)
+
+
+def test_stamped_filter_persistence(tmp_path) -> None:
+    """Prueba que el filtro guardado se retome, y se descarte si cambió su configuración."""
+    path = str(tmp_path / "bloom.bin")
+    value = f"0x{urandom(32).hex()}"
+    stamped = StampedFilter(None, STAMPER, 0, bits=1 << 12, hashes=3, path=path)
+    stamped.add(value)
+    stamped.next_block = 42
+    stamped._save()
+    loaded = StampedFilter(None, STAMPER, 0, bits=1 << 12, hashes=3, path=path)
+    assert loaded.next_block == 42 and hash_bytes(value) in loaded.filter
+    other = StampedFilter(None, STAMPER, 0, bits=1 << 13, hashes=3, path=path)
+    assert other.next_block == 0 and other.filter.ones == 0
@@ -0,0 +1,110 @@
+"""Casos de prueba de los árboles de Merkle y de su cola de anclaje (sin nodo)."""
+from hashlib import sha256
+from os import urandom
+
+import pytest
+
+from merkle import MerkleAnchor, MerkleTree, leaf_hash, node_hash, verify
+
+
+def random_values(n):
+    return [urandom(32) for _ in range(n)]
+
+
+def test_single_leaf() -> None:
+    """Prueba que la raíz de un árbol de una hoja sea el hash de esa hoja, con camino vacío."""
+    value = urandom(32)
+    tree = MerkleTree([value])
+    assert tree.root == sha256(b"\x00" + value).digest()
+    assert tree.proof(0) == []
+    assert verify(value, [], tree.root)
+
+
+def test_odd_leaf_promoted() -> None:
+    """Prueba que con una cantidad impar de nodos el último pase sin cambios al nivel siguiente."""
+    a, b, c = random_values(3)
+    tree = MerkleTree([a, b, c])
+    assert tree.root == node_hash(node_hash(leaf_hash(a), leaf_hash(b)), leaf_hash(c))
+    assert tree.proof(2) == [("left", node_hash(leaf_hash(a), leaf_hash(b)))]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 5, 7, 8, 33])
+def test_proofs(size) -> None:
+    """Prueba que el camino de cada hoja lleve a la raíz, y sólo desde esa hoja."""
+    values = random_values(size)
+    tree = MerkleTree(values)
+    for i, value in enumerate(values):
+        proof = tree.proof(i)
+        assert verify(value, proof, tree.root)
+        assert not verify(urandom(32), proof, tree.root)
+        if size > 1:
+            assert not verify(values[(i + 1) % size], proof, tree.root)
+
+
+def test_internal_node_is_not_a_leaf() -> None:
+    """Prueba que un nodo interno no pueda presentarse como hoja del árbol."""
+    a, b, c, d = random_values(4)
+    tree = MerkleTree([a, b, c, d])
+    internal = node_hash(leaf_hash(a), leaf_hash(b))
+    assert not verify(internal, [("right", node_hash(leaf_hash(c), leaf_hash(d)))], tree.root)
+
+
+def test_empty_tree() -> None:
+    with pytest.raises(ValueError):
+        MerkleTree([])
+
+
+def hex_hashes(n):
+    return [f"0x{urandom(32).hex()}" for _ in range(n)]
+
+
+def test_anchor_flush_and_proof(tmp_path) -> None:
+    """Prueba que la cola se selle como una sola raíz y que cada hash tenga su prueba."""
+    sent = []
+    anchor = MerkleAnchor(str(tmp_path / "merkle.db"), lambda root: sent.append(root) or f"0x{len(sent):064x}",
+                          lambda root: False, max_leaves=10)
+    hashes = hex_hashes(5)
+    anchor.add(hashes + hashes[:2]) # los repetidos se ignoran
+    assert anchor.locate(hashes) == ["queued"] * 5
+    assert anchor._flush() and not anchor._flush()
+    anchor._send()
+    assert len(sent) == 1
+    root = sent[0]
+    assert anchor.locate(hashes) == [root] * 5
+    for h in hashes:
+        proof = anchor.proof(h)
+        assert proof['root'] == root and proof['treeStatus'] == "pending"
+        path = [(p['position'], bytes.fromhex(p['hash'][2:])) for p in proof['proof']]
+        assert verify(bytes.fromhex(h[2:]), path, bytes.fromhex(root[2:]))
+    anchor.mined(root, proof['transaction'])
+    assert anchor.proof(hashes[0])['treeStatus'] == "anchored"
+    anchor.add(hashes[:1]) # ya está en un árbol
+    assert anchor.locate(hashes[:1]) == [root]
+
+
+def test_anchor_retry_limit(tmp_path) -> None:
+    """Prueba que una raíz cuyo sellado falla se reenvíe hasta `max_attempts` veces y quede fallida."""
+    sent = []
+    anchor = MerkleAnchor(str(tmp_path / "merkle.db"), lambda root: sent.append(root) or f"0x{len(sent):064x}",
+                          lambda root: False, max_attempts=2)
+    anchor.add(hex_hashes(3))
+    anchor._flush()
+    for _ in range(3):
+        anchor._send()
+        anchor.retry(sent[-1], f"0x{len(sent):064x}")
+    anchor._send()
+    assert len(sent) == 2
+    assert anchor.summary()['failedTrees'] == 1
+
+
+def test_anchor_already_stamped(tmp_path) -> None:
+    """Prueba que una raíz que ya está sellada en la cadena no se reenvíe."""
+    sent = []
+    anchor = MerkleAnchor(str(tmp_path / "merkle.db"), lambda root: sent.append(root) or f"0x{len(sent):064x}",
+                          lambda root: True)
+    hashes = hex_hashes(2)
+    anchor.add(hashes)
+    anchor._flush()
+    anchor._send()
+    assert sent == []
+    assert anchor.proof(hashes[0])['treeStatus'] == "anchored"
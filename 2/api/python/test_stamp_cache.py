@@ -0,0 +1,82 @@
+"""Casos de prueba de la caché de `stamped()` (sin nodo)."""
+from time import sleep
+
+from stamp_cache import StampCache
+
+SIGNER = "0x00000000000000000000000000000000000000aa"
+NOT_STAMPED = ("0x0000000000000000000000000000000000000000", 0)
+
+
+class Lookup:
+    """Simula `stamped_many`: devuelve los sellados dados y cuenta los hashes consultados."""
+
+    def __init__(self, stamped):
+        self.stamped = stamped
+        self.asked = []
+
+    def __call__(self, hashes):
+        self.asked.extend(hashes)
+        return [self.stamped.get(h.lower(), NOT_STAMPED) for h in hashes]
+
+
+def test_confirmed_stamp_is_kept() -> None:
+    """Prueba que un sellado confirmado se responda desde la caché, sin distinguir mayúsculas."""
+    lookup = Lookup({"0xab": (SIGNER, 10)})
+    cache = StampCache(lookup, lambda: 100, confirmations=12)
+    assert cache.get("0xAB") == (SIGNER, 10)
+    assert cache.get("0xab") == (SIGNER, 10)
+    assert lookup.asked == ["0xAB"]
+    assert cache.summary()['hits'] == 1 and cache.summary()['misses'] == 1
+
+
+def test_negative_expires() -> None:
+    """Prueba que un "no sellado" venza a los `negative_ttl` segundos."""
+    lookup = Lookup({})
+    cache = StampCache(lookup, lambda: 100, negative_ttl=0.05)
+    assert cache.get("0x01") == NOT_STAMPED
+    assert cache.get("0x01") == NOT_STAMPED
+    assert len(lookup.asked) == 1
+    sleep(0.1)
+    cache.get("0x01")
+    assert len(lookup.asked) == 2
+
+
+def test_recent_stamp_expires() -> None:
+    """Prueba que un sellado sin suficientes confirmaciones se trate como un "no sellado"."""
+    lookup = Lookup({"0x01": (SIGNER, 95)})
+    cache = StampCache(lookup, lambda: 100, negative_ttl=0, confirmations=12)
+    cache.get("0x01")
+    cache.get("0x01")
+    assert len(lookup.asked) == 2
+
+
+def test_get_many_asks_only_missing() -> None:
+    """Prueba que `get_many` consulte sólo los hashes que no están en caché, manteniendo el orden."""
+    lookup = Lookup({"0x01": (SIGNER, 1), "0x02": (SIGNER, 2)})
+    cache = StampCache(lookup, lambda: 100)
+    cache.get("0x02")
+    assert cache.get_many(["0x01", "0x02", "0x03"]) == [(SIGNER, 1), (SIGNER, 2), NOT_STAMPED]
+    assert lookup.asked == ["0x02", "0x01", "0x03"]
+
+
+def test_invalidate() -> None:
+    lookup = Lookup({})
+    cache = StampCache(lookup, lambda: 100)
+    cache.get("0x01")
+    lookup.stamped["0x01"] = (SIGNER, 50)
+    cache.invalidate("0x01")
+    assert cache.get("0x01") == (SIGNER, 50)
+
+
+def test_lru_eviction() -> None:
+    """Prueba que al superar `max_entries` salga el menos usado recientemente."""
+    lookup = Lookup({h: (SIGNER, 1) for h in ("0x01", "0x02", "0x03")})
+    cache = StampCache(lookup, lambda: 100, max_entries=2)
+    cache.get("0x01")
+    cache.get("0x02")
+    cache.get("0x01")
+    cache.get("0x03") # desaloja 0x02
+    assert cache.summary()['evictions'] == 1
+    lookup.asked.clear()
+    cache.get_many(["0x01", "0x03", "0x02"])
+    assert lookup.asked == ["0x02"]
@@ -0,0 +1,28 @@
+//SPDX-License-Identifier: MIT
+pragma solidity ^0.8.19;
+
+// Agrupa varias llamadas de lectura en una sola, para consultarlas con un único eth_call
+contract Multicall {
+    // Llamada a realizar: contrato destino y datos codificados (selector y argumentos)
+    struct Call {
+        address target;
+        bytes callData;
+    }
+
+    // Resultado de una llamada: si terminó bien y los datos que devolvió
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    // Ejecuta las llamadas en orden y devuelve el número de bloque y el resultado de cada una.
+    // Una llamada que revierte no revierte las demás: su resultado queda con success en false.
+    function tryAggregate(Call[] calldata calls) public view returns (uint256 blockNumber, Result[] memory results) {
+        blockNumber = block.number;
+        results = new Result[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            (bool success, bytes memory returnData) = calls[i].target.staticcall(calls[i].callData);
+            results[i] = Result(success, returnData);
+        }
+    }
+}
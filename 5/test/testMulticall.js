@@ -0,0 +1,32 @@
+const Factory = artifacts.require("CFPFactory");
+const Multicall = artifacts.require("Multicall");
+
+contract('Multicall', (accounts) => {
+    var factory;
+    var multicall;
+    before(async function () {
+        factory = await Factory.new();
+        multicall = await Multicall.new();
+    });
+    it("debe devolver el resultado de cada llamada", async () => {
+        const calls = [
+            { target: factory.address, callData: factory.contract.methods.owner().encodeABI() },
+            { target: factory.address, callData: factory.contract.methods.creatorsCount().encodeABI() },
+        ];
+        const result = await multicall.tryAggregate(calls);
+        assert.equal(2, result.results.length);
+        assert.isTrue(result.results[0].success);
+        assert.equal(accounts[0], web3.eth.abi.decodeParameter('address', result.results[0].returnData));
+        assert.equal(0, web3.eth.abi.decodeParameter('uint256', result.results[1].returnData));
+        assert.isAbove(Number(result.blockNumber), 0);
+    })
+    it("una llamada que revierte no debe revertir las demás", async () => {
+        const calls = [
+            { target: factory.address, callData: factory.contract.methods.creators(0).encodeABI() },
+            { target: factory.address, callData: factory.contract.methods.owner().encodeABI() },
+        ];
+        const result = await multicall.tryAggregate(calls);
+        assert.isFalse(result.results[0].success);
+        assert.isTrue(result.results[1].success);
+    })
+});
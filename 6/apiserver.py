@@ -1,30 +1,46 @@
 #!/usr/bin/env python3
-from flask import Flask, request, make_response, json, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, make_response, json, jsonify, stream_with_context
 from flask_cors import CORS
-import re
+import csv
+import io
 import json
+import os
 from os import urandom
 import sys 
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
 from getpass import getpass
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import provider, validators
+from common.recover import SignatureRecovery
+from common.rpc_batch import BatchClient
 import messages
+from call_index import CallIndex, deployment_block, DEFAULT_CFP_CACHE_SIZE
+from chain_store import ChainStore
+from tx_queue import TxQueue
+from multicall import Call, Multicall, load_address
 import argparse
 from eth_account.messages import encode_defunct, SignableMessage
 from eth_account import Account
 from dateutil.parser import parse
-from eth_utils import to_bytes, decode_hex, is_checksum_address
+from eth_utils import to_bytes, is_checksum_address
 import pytz
 from datetime import datetime
 from dateutil.parser import isoparse
-app = Flask(__name__)
-CORS(app)
+from types import SimpleNamespace
+from werkzeug.local import LocalProxy
+api = Blueprint("cfp", __name__)
+# contrato, cuenta, índice y cola de la aplicación en curso (ver create_app)
+state = LocalProxy(lambda: current_app.extensions["cfp"])
 
 ACCOUNT_PATH = "m/44'/60'/0'/0/0"
-hash_pattern = re.compile(r"0x[0-9a-fA-F]{64}")
-
-def is_valid_hash(h):
-    return re.match(hash_pattern, h)
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+MAX_PROPOSALS = 5000 # propuestas por pedido a /proposal-data/batch
+DEFAULT_PAGE = 100 # propuestas por página de /calls/<call_id>/proposals
+MAX_PAGE = 1000
+TX_TIMEOUT = 60 # segundos que se espera el recibo antes de responder 202 con el id de seguimiento
+HERE = os.path.dirname(os.path.abspath(__file__))
+FACTORY_JSON = os.path.join(HERE, "..", "5", "build", "contracts", "CFPFactory.json")
+CFP_JSON = os.path.join(HERE, "..", "5", "build", "contracts", "CFP.json")
+MULTICALL_JSON = os.path.join(HERE, "..", "5", "build", "contracts", "Multicall.json")
 
 def responses(body, code):
     response = jsonify(body)
@@ -32,24 +48,37 @@ def responses(body, code):
     response.headers["Content-Type"] = "application/json; charset=utf-8"
     return response
 
-def is_valid_callId(hex_str):
-    if len(hex_str) != 66: # longitud de 66 caracteres
-        return False
-    if not hex_str.startswith("0x"):
-        return False
-    hex_str = hex_str[2:] # quita los primeros dos caracteres "0x"
-    try:
-        int(hex_str, 16) # intenta convertir la cadena a un entero hexadecimal
-    except ValueError:
-        return False
-    return True
+def submit_transaction(fn, on_mined=None):
+    """Envía una transacción de la cuenta dueña a través de la cola.
+
+    Devuelve su id de seguimiento y si todavía está pendiente. En modo
+    asíncrono sólo se simula la llamada, para detectar los errores del
+    contrato, y se devuelve el id apenas encolada. En otro caso se espera el
+    recibo hasta `tx_timeout` segundos: si la transacción falló se levanta
+    una excepción con la causa, y si no llegó a minarse queda pendiente.
+    `on_mined` se pasa a la cola (ver `TxQueue.submit`).
+    """
+    if state.async_tx:
+        fn.call()
+        return state.tx_queue.submit(fn, on_mined), True
+    tx_id = state.tx_queue.submit(fn, on_mined)
+    tx = state.tx_queue.wait(tx_id, state.tx_timeout)
+    if tx['status'] == 'failed':
+        raise Exception(tx['error'])
+    return tx_id, tx['status'] != 'mined'
+
+def authorize(addr):
+    """Autoriza una cuenta; su registración se guarda recién cuando la transacción se mina."""
+    chain_store = state.chain_store
+    return submit_transaction(state.contract.functions.authorize(addr),
+                              on_mined=lambda tx: chain_store.set_registration(addr, "autorizado"))
 
 def sign(message: str, account: Account) -> str:
     """Firma un mensaje desde la cuenta especificada."""
     signable_message: SignableMessage = encode_defunct(hexstr=message)
     return account.sign_message(signable_message).signature.hex()
 
-@app.post("/create")
+@api.post("/create")
 def create():
     content_type = request.headers.get('Content-Type', '')
     if 'application/json' not in content_type:
@@ -58,7 +87,8 @@ def create():
     
     req = request.get_json()
     call_id = req.get("callId")
-    if is_valid_callId(call_id) is False:
+    call_id_bytes = validators.bytes32(call_id)
+    if call_id_bytes is None:
         j={'message': messages.INVALID_CALLID}
         return responses(j, 400)      
 
@@ -79,27 +109,21 @@ def create():
     closing_time = timestamp * (10 ** 18)
 
     signature = req.get("signature") #firma(direccion_contrato(bytes) + callId(bytes))       
-    if re.match("^0x[0-9a-fA-F]{64}$", signature) is False:
+    signature_ = validators.signature(signature)
+    if signature_ is None:
         j={'message': messages.INVALID_SIGNATURE}
         return responses(j, 400)
-    signature_ = signature
-    if signature.startswith("0x"):
-        signature_ = bytes.fromhex(signature[2:])
-
-    contract_address_bytes = to_bytes(hexstr=address_contract)
-    call_id_bytes = decode_hex(call_id)
-    message = encode_defunct(contract_address_bytes + call_id_bytes)
-    creator = None
-    try:
-        creator = Account.recover_message(message, signature=signature_)
-    except:
+
+    contract_address_bytes = to_bytes(hexstr=state.address_contract)
+    creator = state.recovery.recover(contract_address_bytes + call_id_bytes, signature_) # en el pool de procesos
+    if creator is None:
         j={'message': messages.INVALID_SIGNATURE}
         return responses(j, 400)       
 
     try:
-        contract.functions.createFor(call_id, closing_time, creator).transact()
-        j={'message': messages.OK}
-        return responses(j, 201)
+        tx_id, pending = submit_transaction(state.contract.functions.createFor(call_id, closing_time, creator))
+        j={'message': messages.OK, 'tx': tx_id}
+        return responses(j, 202 if pending else 201)
     except Exception as e:
         if 'El llamado ya existe' in str(e):
             j={'message': messages.ALREADY_CREATED}
@@ -114,7 +138,7 @@ def create():
             j={'message': messages.INTERNAL_ERROR}
             return responses(j, 500) 
 
-@app.post("/register")
+@api.post("/register")
 def register(): 
     content_type = request.headers.get('Content-Type', '')
     if 'application/json' not in content_type:
@@ -123,37 +147,30 @@ def register():
     
     req = request.get_json()
     addr = req.get("address")
-    if is_checksum_address(addr) is False:
+    if validators.address(addr) is None or not is_checksum_address(addr):
         j={'message': messages.INVALID_ADDRESS}
         return responses(j, 400) 
     
     signature = req.get("signature")      
-    if re.match("^0x[0-9a-fA-F]{64}$", signature) is False:
+    signature_ = validators.signature(signature)
+    if signature_ is None:
         j={'message': messages.INVALID_SIGNATURE}
         return responses(j, 400)
-    signature_ = signature
-    if signature.startswith("0x"):
-        signature_ = bytes.fromhex(signature[2:])
-    contract_address_bytes = to_bytes(hexstr=address_contract)
-    message = encode_defunct(contract_address_bytes)  
-    try:
-        singing_addr = Account.recover_message(message, signature=signature_)
-        #print(f"========address original====={addr}")
-        #print(f"========signing  address====={singing_addr}")
-    except:
-        j={'message': messages.INVALID_SIGNATURE}
-        return responses(j, 400) 
+    contract_address_bytes = to_bytes(hexstr=state.address_contract)
+    singing_addr = state.recovery.recover(contract_address_bytes, signature_) # None si la firma no es válida
     if addr != singing_addr:
         j={'message': messages.INVALID_SIGNATURE}
         return responses(j, 400) 
 
     try:
-        if contract.functions.isRegistered(addr).call():
+        # el contrato es la fuente de verdad: el dueño puede desautorizar una cuenta
+        # (unauthorize) sin pasar por esta API, así que la fila local no alcanza
+        if state.contract.functions.isRegistered(addr).call():
             j={'message': messages.ALREADY_AUTHORIZED}
             return responses(j, 403)    
-        tx_hash = contract.functions.authorize(addr).transact()
-        j={'message': messages.OK}
-        return responses(j, 200)
+        tx_id, pending = authorize(addr)
+        j={'message': messages.OK, 'tx': tx_id}
+        return responses(j, 202 if pending else 200)
     except Exception as e:
         if 'Ya se ha registrado' in str(e):
             j={'message': messages.ALREADY_AUTHORIZED}
@@ -162,7 +179,7 @@ def register():
             j={'message': messages.INTERNAL_ERROR}
             return responses(j, 500)
 
-@app.post("/register-proposal")
+@api.post("/register-proposal")
 def register_proposal():
     content_type = request.headers.get('Content-Type', '')
     if 'application/json' not in content_type:
@@ -171,18 +188,18 @@ def register_proposal():
     
     req = request.get_json()
     call_id = req.get("callId")
-    if is_valid_callId(call_id) is False:
+    if validators.bytes32(call_id) is None:
         j={'message': messages.INVALID_CALLID}
         return responses(j, 400) 
 
     proposal = req.get("proposal")
-    if is_valid_callId(proposal) is False:
+    if validators.bytes32(proposal) is None:
         j={'message': messages.INVALID_PROPOSAL}
         return responses(j, 400)
     try:
-        contract.functions.registerProposal(call_id, proposal).transact()
-        j={'message': messages.OK}
-        return responses(j, 201)
+        tx_id, pending = submit_transaction(state.contract.functions.registerProposal(call_id, proposal))
+        j={'message': messages.OK, 'tx': tx_id}
+        return responses(j, 202 if pending else 201)
     except Exception as e:
         if 'El llamado no existe' in str(e):
             j={'message': messages.CALLID_NOT_FOUND}
@@ -194,54 +211,57 @@ def register_proposal():
             j={'message': messages.INTERNAL_ERROR}
             return responses(j, 500)
 
-@app.get("/authorized/<address_value>")
+@api.get("/tx/<tx_id>")
+def tx_status(tx_id):
+    """estado de una transaccion enviada por la cola:
+    queued, sent, mined o failed"""
+    tx = state.tx_queue.status(tx_id)
+    if tx is None:
+        j={'message': messages.TX_NOT_FOUND}
+        return responses(j, 404)
+    return responses(tx, 200)
+
+@api.get("/authorized/<address_value>")
 def authorized(address_value):
-    if bool(re.match(r"^0x[0-9a-fA-F]{40}$", address_value)) is False:
+    if validators.address(address_value) is None:
         j={'message': messages.INVALID_ADDRESS}
         return responses(j, 400) 
     try:
-        autorizado = contract.functions.isAuthorized(address_value).call()
+        autorizado = state.contract.functions.isAuthorized(address_value).call()
         j={'authorized': autorizado}
         return responses(j, 200)
     except:
         j={'authorized': False}
         return responses(j, 200)      
 
-@app.get("/calls/<call_id>")
+@api.get("/calls/<call_id>")
 def calls(call_id):
-    if is_valid_callId(call_id) is False:
+    if validators.bytes32(call_id) is None:
         j={'message': messages.INVALID_CALLID}
         return responses(j, 400) 
     
     try:
-        call_for_proposals = contract.functions.calls(call_id).call()
-        creator = call_for_proposals[0]
-        if creator == '0x0000000000000000000000000000000000000000':
+        call_for_proposals = state.call_index.get(call_id)
+        if call_for_proposals is None:
             j={'message': messages.CALLID_NOT_FOUND} #no hay call_for_proposals para ese callId
             return responses(j, 404)
-        cfp = call_for_proposals[1]
-        j={'creator': creator, 'cfp': cfp}
+        j={'creator': call_for_proposals['creator'], 'cfp': call_for_proposals['cfp']}
         return responses(j, 200)
     except:
         j={'message': messages.INTERNAL_ERROR}
         return responses(j, 500)
 
-@app.get("/closing-time/<call_id>")
+@api.get("/closing-time/<call_id>")
 def closing_time(call_id):
-    if is_valid_callId(call_id) is False:
+    if validators.bytes32(call_id) is None:
         j={'message': messages.INVALID_CALLID}
         return responses(j, 400) 
 
     try:
-        call_for_proposals = contract.functions.calls(call_id).call()
-        creator = call_for_proposals[0]
-        if creator == '0x0000000000000000000000000000000000000000':
+        closing_time = state.call_index.closing_time(call_id)
+        if closing_time is None:
             j={'message': messages.CALLID_NOT_FOUND}
             return responses(j, 404)
-        cfp = call_for_proposals[1]
-        # Crea una instancia del contrato CFP utilizando la dirección
-        cfp_contract = web3.eth.contract(address=cfp, abi=cfp_abi)
-        closing_time = cfp_contract.functions.closingTime().call()
         timestamp = closing_time // (10 ** 18) #timestamp en segundos
         dt = datetime.fromtimestamp(timestamp, tz=pytz.timezone('Etc/GMT-3'))
         iso_string = dt.isoformat()
@@ -251,47 +271,107 @@ def closing_time(call_id):
         j={'message': messages.INTERNAL_ERROR}
         return responses(j, 500)
 
-@app.get("/contract-address")
+@api.get("/contract-address")
 def contract_address():
-    j={'address': (contract.address)}
+    j={'address': (state.contract.address)}
     return responses(j, 200)
 
-@app.get("/contract-owner")
+@api.get("/contract-owner")
 def contract_owner():
-    j={'address': contract.functions.owner().call()}
+    j={'address': state.contract.functions.owner().call()}
     return responses(j, 200)
 
-@app.get("/proposal-data/<call_id>/<proposal>")
+@api.get("/proposal-data/<call_id>/<proposal>")
 def proposal_data(call_id, proposal):
-    if is_valid_callId(call_id) is False:
+    if validators.bytes32(call_id) is None:
         j={'message': messages.INVALID_CALLID}
         return responses(j, 400) 
 
-    if is_valid_callId(proposal) is False:
+    if validators.bytes32(proposal) is None:
         j={'message': messages.INVALID_PROPOSAL}
         return responses(j, 400)
 
     cfp = None
     try:
-        call_for_proposals = contract.functions.calls(call_id).call()
-        cfp = call_for_proposals[1]
-        if call_for_proposals[0] == '0x0000000000000000000000000000000000000000':
+        # dirección y contrato del CFP, desde la caché del índice (sin llamar a calls())
+        call_for_proposals = state.call_index.cfp(call_id)
+        if call_for_proposals is None:
             j={'message': messages.CALLID_NOT_FOUND}
             return responses(j, 404)
+        cfp, cfp_contract = call_for_proposals[0], call_for_proposals[1]
     
-        # Crea una instancia del contrato CFP utilizando la dirección
-        cfp_contract = web3.eth.contract(address=cfp, abi=cfp_abi)
-        proposal_data = cfp_contract.functions.proposalData(proposal).call()
+        # Primero se busca en el almacenamiento local; si no está completa se consulta al CFP
+        proposal_data = state.chain_store.proposal(cfp, proposal.lower())
+        if proposal_data is None or proposal_data[2] is None:
+            proposal_data = cfp_contract.functions.proposalData(proposal).call()
+            if proposal_data[0] != '0x0000000000000000000000000000000000000000':
+                state.chain_store.set_proposal_timestamp(cfp, proposal.lower(), *proposal_data)
         sender = proposal_data[0]
         if sender == '0x0000000000000000000000000000000000000000':
             j={'message': messages.PROPOSAL_NOT_FOUND}
             return responses(j, 404)
-        block_number = proposal_data[1]
-        timestamp = proposal_data[2]
-        timestamp = timestamp // (10 ** 9) #timestamp en segundos
-        dt = datetime.fromtimestamp(timestamp, tz=pytz.timezone('Etc/GMT-3'))
-        iso_string = dt.isoformat()
-        j={'sender': sender, 'blockNumber': int(block_number), 'timestamp': iso_string}
+        return responses(proposal_json(*proposal_data), 200)
+    except:
+        j={'message': messages.INTERNAL_ERROR}
+        return responses(j, 500)
+
+def proposal_json(sender, block_number, timestamp):
+    timestamp = int(timestamp) // (10 ** 9) #timestamp en segundos
+    dt = datetime.fromtimestamp(timestamp, tz=pytz.timezone('Etc/GMT-3'))
+    return {'sender': sender, 'blockNumber': int(block_number), 'timestamp': dt.isoformat()}
+
+@api.post("/proposal-data/batch")
+def proposal_data_batch():
+    """datos de muchas propuestas de un mismo llamado: el CFP se resuelve
+    una sola vez, las propuestas indexadas salen de la base local y el
+    resto se lee del CFP con lecturas agregadas (ver multicall.py)"""
+    content_type = request.headers.get('Content-Type', '')
+    if 'application/json' not in content_type:
+        j={'message': messages.INVALID_MIMETYPE}
+        return responses(j, 400)
+
+    req = request.get_json(silent=True)
+    if not isinstance(req, dict): # JSON inválido, o una lista, cadena, etc.
+        j={'message': messages.INVALID_BODY}
+        return responses(j, 400)
+    call_id = req.get("callId")
+    if validators.bytes32(call_id) is None:
+        j={'message': messages.INVALID_CALLID}
+        return responses(j, 400)
+    proposals = req.get("proposals")
+    if not isinstance(proposals, list) or not 0 < len(proposals) <= MAX_PROPOSALS:
+        j={'message': messages.INVALID_PROPOSAL_LIST}
+        return responses(j, 400)
+
+    try:
+        call_for_proposals = state.call_index.cfp(call_id)
+        if call_for_proposals is None:
+            j={'message': messages.CALLID_NOT_FOUND}
+            return responses(j, 404)
+        cfp, cfp_contract = call_for_proposals[0], call_for_proposals[1]
+
+        decoded = validators.bytes32_many(proposals)
+        valid = sorted({p.lower() for p, b in zip(proposals, decoded) if b is not None})
+        found = {p: row for p, row in state.chain_store.proposals_many(cfp, valid).items() if row[2] is not None}
+        missing = [p for p in valid if p not in found]
+        if state.multicall is not None:
+            read = state.multicall.call(Call(cfp, cfp_contract, 'proposalData', (p,)) for p in missing)
+        else:
+            read = [cfp_contract.functions.proposalData(p).call() for p in missing]
+        fetched = [(p, *row) for p, row in zip(missing, read) if row is not None and row[0] != ZERO_ADDRESS]
+        if fetched:
+            state.chain_store.set_proposal_timestamps(cfp, fetched)
+        found.update((p, row) for p, *row in fetched)
+
+        results = []
+        for proposal, proposal_bytes in zip(proposals, decoded):
+            if proposal_bytes is None:
+                results.append({'proposal': proposal, 'message': messages.INVALID_PROPOSAL})
+            elif proposal.lower() in found:
+                results.append({'proposal': proposal, **proposal_json(*found[proposal.lower()])})
+            else:
+                results.append({'proposal': proposal, 'message': messages.PROPOSAL_NOT_FOUND})
+        j={'callId': call_id, 'cfp': cfp, 'proposals': results}
         return responses(j, 200)
     except:
         j={'message': messages.INTERNAL_ERROR}
@@ -300,15 +380,23 @@ def proposal_data(call_id, proposal):
 
 
 # ============ util endpoints ====================
-@app.get("/utils/random/hex")
+@api.get("/admin/stats")
+def admin_stats():
+    """estadisticas de la cache de contratos CFP, de la lectura de eventos,
+    de la recuperacion de firmas y de las llamadas al nodo"""
+    j={'cfpCache': state.call_index.cache_stats(), 'logs': state.call_index.logs.summary(),
+       'recovery': state.recovery.summary(), 'node': provider.stats.summary()}
+    return responses(j, 200)
+
+@api.get("/utils/random/hex")
 def random_hex():
     hexa = f"0x{urandom(32).hex()}"
     j={'random_hex': hexa}
     return responses(j, 200)
 
-@app.get("/utils/signature")
+@api.get("/utils/signature")
 def utils_signature_addr():
-    contract_address = contract.address
+    contract_address = state.contract.address
     account = Account().create()
     signature_register = sign(contract_address, account)
 
@@ -325,39 +413,124 @@ def utils_signature_addr():
     'signature_create': signature}
     return responses(j, 200)
 
-@app.get("/calls")
+def encode_cursor(row):
+    proposal, _, block_number, log_index = row[:4]
+    return f"{block_number}:{log_index}:{proposal}"
+
+def decode_cursor(cursor):
+    """clave (block_number, log_index, proposal) de un cursor, o None si es invalido"""
+    try:
+        block_number, log_index, proposal = cursor.split(":")
+        if validators.bytes32(proposal) is None:
+            return None
+        return int(block_number), int(log_index), proposal.lower()
+    except ValueError:
+        return None
+
+def proposal_row_json(row):
+    proposal, sender, block_number = row[:3]
+    return {'proposal': proposal, 'sender': sender, 'blockNumber': block_number}
+
+@api.get("/calls/<call_id>/proposals")
+def call_proposals(call_id):
+    """propuestas de un llamado en orden de registro, desde el indice local
+    de eventos ProposalRegistered; se pagina con ?cursor=&limit="""
+    if validators.bytes32(call_id) is None:
+        j={'message': messages.INVALID_CALLID}
+        return responses(j, 400)
+    after = None
+    if request.args.get("cursor"):
+        after = decode_cursor(request.args["cursor"])
+        if after is None:
+            j={'message': messages.INVALID_CURSOR}
+            return responses(j, 400)
+    limit = request.args.get("limit", str(DEFAULT_PAGE))
+    if not limit.isdigit() or not 0 < int(limit) <= MAX_PAGE:
+        j={'message': messages.INVALID_LIMIT}
+        return responses(j, 400)
+    try:
+        state.call_index.refresh() # a lo sumo una consulta al nodo por SYNC_INTERVAL, no una por página
+        call_for_proposals = state.call_index.get(call_id)
+        if call_for_proposals is None:
+            j={'message': messages.CALLID_NOT_FOUND}
+            return responses(j, 404)
+        rows = state.chain_store.proposals_page(call_for_proposals['cfp'], after, int(limit))
+        j={'callId': call_id, 'proposals': [proposal_row_json(row) for row in rows],
+           'next': encode_cursor(rows[-1]) if len(rows) == int(limit) else None}
+        return responses(j, 200)
+    except:
+        j={'message': messages.INTERNAL_ERROR}
+        return responses(j, 500)
+
+@api.get("/calls/<call_id>/proposals/export")
+def call_proposals_export(call_id):
+    """todas las propuestas de un llamado, en CSV (?format=csv) o un JSON por
+    linea; se leen de la base de a paginas mientras se envian, asi que la
+    memoria no depende de la cantidad de propuestas"""
+    if validators.bytes32(call_id) is None:
+        j={'message': messages.INVALID_CALLID}
+        return responses(j, 400)
+    export_format = request.args.get("format", "jsonl")
+    if export_format not in ("csv", "jsonl"):
+        j={'message': messages.INVALID_FORMAT}
+        return responses(j, 400)
+    try:
+        state.call_index.refresh() # a lo sumo una consulta al nodo por SYNC_INTERVAL, no una por página
+        call_for_proposals = state.call_index.get(call_id)
+    except:
+        j={'message': messages.INTERNAL_ERROR}
+        return responses(j, 500)
+    if call_for_proposals is None:
+        j={'message': messages.CALLID_NOT_FOUND}
+        return responses(j, 404)
+    rows = state.chain_store.iter_proposals(call_for_proposals['cfp'])
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["proposal", "sender", "blockNumber"])
+        for row in rows:
+            writer.writerow(row[:3])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_jsonl():
+        for row in rows:
+            yield json.dumps(proposal_row_json(row)) + "\n"
+
+    if export_format == "csv":
+        return Response(stream_with_context(generate_csv()), mimetype="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename={call_id}.csv"})
+    return Response(stream_with_context(generate_jsonl()), mimetype="application/x-ndjson")
+
+@api.get("/calls")
 def util_calls_nuevo():
-    creators = []
-    creator_length = contract.functions.creatorsCount().call()
-    for i in range(creator_length):
-        creators.append(contract.functions.creatorsList(i).call())
-    
-    call = []
-    for addr in creators:
-        # cantidad de llamados creados por addr
-        call_length = contract.functions.createdByCount(addr).call()
-        for i in range(call_length):
-            call.append(contract.functions.createdBy(addr, i).call().hex())
-
-    j={'calls': call}
+    """lista los callId desde el indice local, que solo
+    recorre los bloques nuevos desde la ultima consulta"""
+    state.call_index.sync()
+    j={'calls': state.call_index.call_ids()}
     return responses(j, 200)
 
-@app.get("/register/list")
+@api.get("/register/list")
 def util_register_list():
     """lista las registraciones en estado PENDIENTE"""
-    register_list = contract.functions.getAllPending().call()
+    register_list = state.contract.functions.getAllPending().call()
 
     j={'registers': register_list}
     return responses(j, 200)
 
-@app.post("/utils/register/account")
+@api.post("/utils/register/account")
 def util_register():
     """registra una cuenta, pero queda en estado 
     PENDIENTE hasta que el duenio lo autorize"""
     req = request.get_json()
     addr = req.get("account")
     try:
-        contract.functions.register().transact({'from': addr})
+        # no se guarda la registración: la transacción puede revertir o no minarse,
+        # y /register la confirma con isRegistered
+        state.contract.functions.register().transact({'from': addr})
     except Exception as e:
         j={'message': messages.INTERNAL_ERROR}
         return responses(j, 500)
@@ -365,16 +538,16 @@ def util_register():
     j={'message': messages.OK}
     return responses(j, 200)
 
-@app.post("/register/auth")
+@api.post("/register/auth")
 def util_authorize():
     """quita una cuenta de la lista de PENDIENTES
     y la AUTORIZA a crear llamados"""
     req = request.get_json()
     addr = req.get("account")
     try:    
-        tx_hash = contract.functions.authorize(addr).transact()
-        j={'message': messages.OK}
-        return responses(j, 200)
+        tx_id, pending = authorize(addr)
+        j={'message': messages.OK, 'tx': tx_id}
+        return responses(j, 202 if pending else 200)
     except Exception as e:
         if 'Ya se ha registrado' in str(e):
             j={'message': messages.ALREADY_AUTHORIZED}
@@ -384,17 +557,78 @@ def util_authorize():
             return responses(j, 500)
 #==========================================================
 
+def create_app(mnemonic, uri="http://localhost:7545", db_path="chain.db", async_tx=False,
+               pool_size=provider.DEFAULT_POOL_SIZE, timeout=provider.DEFAULT_TIMEOUT,
+               recover_workers=None, cfp_cache_size=DEFAULT_CFP_CACHE_SIZE, tx_timeout=TX_TIMEOUT,
+               factory_json=FACTORY_JSON, cfp_json=CFP_JSON, multicall_json=MULTICALL_JSON):
+    """Crea la aplicación: conecta con el nodo, carga los contratos y arranca el índice y la cola.
+
+    Cada proceso del servidor llama a esta función. Los procesos comparten
+    el archivo SQLite `db_path`: el índice de llamados, el próximo nonce de
+    la cuenta dueña y el estado de las transacciones enviadas.
+    """
+    # conexion compartida: sesion HTTP con pool de conexiones keep-alive y reintentos
+    web3 = provider.connect(uri, pool_size=pool_size, timeout=timeout)
+
+    # Establecer el proveedor de cuentas con la mnemónica especificada
+    web3.eth.account.enable_unaudited_hdwallet_features()
+    account = web3.eth.account.from_mnemonic(mnemonic, account_path=ACCOUNT_PATH) #account_path="m/44'/60'/0'/0/0"
+    web3.eth.default_account = account.address
+
+    with open(factory_json) as f:
+        config = json.load(f)
+        address_contract = config["networks"]["5777"]["address"]
+        contract = web3.eth.contract(abi = config['abi'], address = address_contract)
+        factory_block = deployment_block(web3, config["networks"]["5777"])
+
+    with open(cfp_json) as f:
+        cfp_abi = json.load(f)['abi']
+
+    # lecturas agregadas: con el contrato Multicall si esta desplegado, si no con lotes JSON-RPC
+    multicall_address = load_address(multicall_json)
+    multicall = None
+    if multicall_address is not None or not provider.is_websocket(uri):
+        multicall = Multicall(web3, address=multicall_address, rpc=BatchClient(uri, timeout=timeout))
+
+    # indice de llamados a partir de los eventos CFPCreated, persistido en SQLite
+    # se retoma desde el ultimo bloque guardado en lugar del bloque 0
+    chain_store = ChainStore(db_path)
+    chain_store.bind(address_contract, web3.eth.block_number)
+    call_index = CallIndex(web3, contract, cfp_abi, from_block=factory_block, store=chain_store,
+                           cfp_cache_size=cfp_cache_size, multicall=multicall)
+    call_index.sync()
+
+    app = Flask(__name__)
+    CORS(app)
+    app.extensions["cfp"] = SimpleNamespace(
+        web3=web3, account=account, contract=contract, address_contract=address_contract,
+        cfp_abi=cfp_abi, chain_store=chain_store, call_index=call_index, async_tx=async_tx, tx_timeout=tx_timeout,
+        multicall=multicall,
+        # las transacciones de la cuenta duenia se firman localmente y se envian en orden;
+        # el nonce se reserva en la base compartida, asi que varios procesos pueden enviar
+        tx_queue=TxQueue(web3, account, store=chain_store),
+        # la recuperación de firmas usa CPU: se hace en otros procesos, no en los hilos de Flask
+        recovery=SignatureRecovery(recover_workers).start())
+    app.register_blueprint(api)
+    return app
+
+
 if __name__ == '__main__':
-    import argparse
-    
     ganache_url = "http://localhost:7545"
     mnemonic_path = None
-    abi_path = "../5/build/contracts/CFPFactory.json"
-    abi_cfp = "../5/build/contracts/CFP.json"
+    db_path = "chain.db"
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--uri", "-u", help=f"URI para la conexión con Ganache",default=ganache_url)
     parser.add_argument("--mnemonic", "-m", help=f"URI del archivo Mnemonic",default=mnemonic_path)
+    parser.add_argument("--db", help=f"Archivo SQLite con los datos indexados de la cadena",default=db_path)
+    parser.add_argument("--pool-size", help="Conexiones HTTP simultáneas con el nodo", type=int, default=provider.DEFAULT_POOL_SIZE)
+    parser.add_argument("--timeout", help="Segundos de espera de cada llamada al nodo", type=float, default=provider.DEFAULT_TIMEOUT)
+    parser.add_argument("--recover-workers", help="Procesos para recuperar los firmantes (por omisión, uno por núcleo)", type=int, default=None)
+    parser.add_argument("--cfp-cache-size", help="Llamados cuyos contratos CFP se mantienen en memoria", type=int, default=DEFAULT_CFP_CACHE_SIZE)
+    parser.add_argument("--async-tx", help="Responde 202 con un id de seguimiento sin esperar a que se minen las transacciones", action="store_true")
+    parser.add_argument("--tx-timeout", help="Segundos que se espera que se mine una transacción antes de responder 202", type=float, default=TX_TIMEOUT)
+    parser.add_argument("--debug", help="Modo de depuración de Flask (sin recarga automática)", action="store_true")
     args = parser.parse_args()
 
     if(args.mnemonic is None):
@@ -403,42 +637,24 @@ if __name__ == '__main__':
         mnemonic_path = args.mnemonic
         with open(mnemonic_path) as f: # Leer la mnemónica del archivo
             mnemonic = f.read().strip() 
-    if(args.uri is not None):
-        ganache_url = args.uri
 
-    address_contract = None
-    contract = None
-    cfp_abi = None
-    account = None
     try:
-        ganache_provider = Web3.HTTPProvider(ganache_url)
-        web3 = Web3(ganache_provider)
-
-        # Establecer el proveedor de cuentas con la mnemónica especificada
-        from web3.middleware import geth_poa_middleware
-        web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-        web3.eth.account.enable_unaudited_hdwallet_features()
-        account = web3.eth.account.from_mnemonic(mnemonic, account_path=ACCOUNT_PATH) #account_path="m/44'/60'/0'/0/0"
-        web3.eth.default_account = account.address
-
-        with open(abi_path) as f:
-            config = json.load(f)
-            address_contract = config["networks"]["5777"]["address"]
-            contract = web3.eth.contract(abi = config['abi'], address = address_contract)
-
-        with open(abi_cfp) as f:
-            config = json.load(f)
-            cfp_abi = config['abi']
-
-        print("Conectado a Ganache con dirección:", account.address)
-    except:
+        app = create_app(mnemonic, uri=args.uri, db_path=args.db, async_tx=args.async_tx,
+                         pool_size=args.pool_size, timeout=args.timeout, recover_workers=args.recover_workers,
+                         cfp_cache_size=args.cfp_cache_size, tx_timeout=args.tx_timeout)
+        print("Conectado a Ganache con dirección:", app.extensions["cfp"].account.address)
+    except Exception:
         print("Ocurrió un error conectandose con Ganache")
- 
-    app.run(debug=True)
+        sys.exit(1)
+
+    # un solo proceso; para varios, ver wsgi.py. Sin el recargador de Werkzeug: volvería a
+    # crear la aplicación en otro proceso, con otra cola de transacciones y otro índice
+    app.run(debug=args.debug, use_reloader=False, threaded=True)
 
 
 """
 ========== utils ==========
 truffle migrate --network ganache
 python3 apiserver.py --mnemonic mnemonic
-"""
\ No newline at end of file
+gunicorn --workers 4 --bind :5000 wsgi:app
+"""
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Variante asíncrona (aiohttp + AsyncWeb3) de los endpoints de lectura de la API de llamados.
+
+Responde las mismas rutas de consulta que apiserver.py con los mismos
+cuerpos, pero sin bloquear un hilo por pedido: las lecturas al nodo de todos
+los pedidos en curso se hacen concurrentemente, y las que son independientes
+dentro de un mismo pedido (por ejemplo, cada `createdBy(creador, i)` al
+listar los llamados) se lanzan juntas. Un semáforo acota la cantidad de
+llamadas simultáneas al nodo.
+
+    python3 async_apiserver.py --uri http://localhost:7545 --port 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+
+import pytz
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, web
+from web3 import AsyncWeb3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import provider, validators
+import messages
+from multicall import Call, Multicall, decode, load_address
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FACTORY_JSON = os.path.join(HERE, "..", "5", "build", "contracts", "CFPFactory.json")
+CFP_JSON = os.path.join(HERE, "..", "5", "build", "contracts", "CFP.json")
+MULTICALL_JSON = os.path.join(HERE, "..", "5", "build", "contracts", "Multicall.json")
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+DEFAULT_CONCURRENCY = 64 # llamadas simultáneas al nodo
+TIMEZONE = pytz.timezone('Etc/GMT-3')
+
+
+def responses(body, code):
+    return web.json_response(body, status=code, content_type="application/json",
+                             dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+
+class RevertedRead(Exception):
+    """Una lectura agregada revirtió y el resultado quedaría incompleto."""
+
+
+class Reader:
+    """Lecturas de la factoría y de sus CFP sobre AsyncWeb3, acotadas por un semáforo.
+
+    Si hay un contrato Multicall desplegado (`multicall`), las lecturas de
+    cada nivel de `call_ids` se agrupan en un eth_call por cada
+    `multicall.chunk` llamadas.
+    """
+
+    def __init__(self, w3, factory, cfp_abi, concurrency=DEFAULT_CONCURRENCY, multicall=None):
+        self.w3 = w3
+        self.factory = factory
+        self.cfp_abi = cfp_abi
+        self.multicall = multicall
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cfps = {}  # dirección -> contrato CFP, para no reconstruirlo en cada pedido
+
+    async def call(self, fn):
+        async with self.semaphore:
+            return await fn.call()
+
+    async def gather(self, fns):
+        return await asyncio.gather(*(self.call(fn) for fn in fns))
+
+    async def read(self, calls):
+        """Resultado de cada `multicall.Call` (None si revirtió), con el Multicall o con una llamada por cada una."""
+        calls = list(calls)
+        if self.multicall is None:
+            return await self.gather(getattr(c.contract.functions, c.fn_name)(*c.args) for c in calls)
+        size = self.multicall.chunk
+
+        async def aggregate(group):
+            async with self.semaphore:
+                return self.multicall.parse(await self.w3.eth.call(self.multicall.request(group)))
+
+        groups = await asyncio.gather(*(aggregate(calls[i:i + size]) for i in range(0, len(calls), size)))
+        raw = [data for group in groups for data in group]
+        return [None if data is None else decode(self.w3.codec, call, data) for call, data in zip(calls, raw)]
+
+    def cfp(self, address):
+        contract = self.cfps.get(address)
+        if contract is None:
+            contract = self.cfps[address] = self.w3.eth.contract(address=address, abi=self.cfp_abi)
+        return contract
+
+    async def read_all(self, calls):
+        """Como `read`, pero levanta `RevertedRead` si alguna lectura revirtió, en lugar de devolver None."""
+        calls = list(calls)
+        results = await self.read(calls)
+        reverted = [call for call, result in zip(calls, results) if result is None]
+        if reverted:
+            raise RevertedRead(f"revirtieron {len(reverted)} lecturas, p.ej. {reverted[0].fn_name}{tuple(reverted[0].args)}")
+        return results
+
+    async def call_ids(self, creator=None):
+        """callIds de todos los llamados (o de los de `creator`), con las lecturas de cada nivel en paralelo."""
+        factory = self.factory
+        if creator is None:
+            count = await self.call(factory.functions.creatorsCount())
+            creators = await self.read_all(Call(factory.address, factory, 'creators', (i,)) for i in range(count))
+        else:
+            creators = [creator]
+        counts = await self.read_all(Call(factory.address, factory, 'createdByCount', (c,)) for c in creators)
+        ids = await self.read_all(Call(factory.address, factory, 'createdBy', (c, i))
+                              for c, n in zip(creators, counts) for i in range(n))
+        return [f"0x{bytes(call_id).hex()}" for call_id in ids]
+
+
+async def calls(request):
+    call_id = validators.bytes32(request.match_info['call_id'])
+    if call_id is None:
+        return responses({'message': messages.INVALID_CALLID}, 400)
+    try:
+        creator, cfp = await reader.call(reader.factory.functions.calls(call_id))
+        if creator == ZERO_ADDRESS:
+            return responses({'message': messages.CALLID_NOT_FOUND}, 404)
+        return responses({'creator': creator, 'cfp': cfp}, 200)
+    except Exception:
+        return responses({'message': messages.INTERNAL_ERROR}, 500)
+
+
+async def closing_time(request):
+    call_id = validators.bytes32(request.match_info['call_id'])
+    if call_id is None:
+        return responses({'message': messages.INVALID_CALLID}, 400)
+    try:
+        creator, cfp = await reader.call(reader.factory.functions.calls(call_id))
+        if creator == ZERO_ADDRESS:
+            return responses({'message': messages.CALLID_NOT_FOUND}, 404)
+        closing = await reader.call(reader.cfp(cfp).functions.closingTime())
+        dt = datetime.fromtimestamp(closing // (10 ** 18), tz=TIMEZONE) #timestamp en segundos
+        return responses({'closingTime': dt.isoformat()}, 200)
+    except Exception:
+        return responses({'message': messages.INTERNAL_ERROR}, 500)
+
+
+async def proposal_data(request):
+    call_id = validators.bytes32(request.match_info['call_id'])
+    if call_id is None:
+        return responses({'message': messages.INVALID_CALLID}, 400)
+    proposal = validators.bytes32(request.match_info['proposal'])
+    if proposal is None:
+        return responses({'message': messages.INVALID_PROPOSAL}, 400)
+    try:
+        creator, cfp = await reader.call(reader.factory.functions.calls(call_id))
+        if creator == ZERO_ADDRESS:
+            return responses({'message': messages.CALLID_NOT_FOUND}, 404)
+        sender, block_number, timestamp = await reader.call(reader.cfp(cfp).functions.proposalData(proposal))
+        if sender == ZERO_ADDRESS:
+            return responses({'message': messages.PROPOSAL_NOT_FOUND}, 404)
+        dt = datetime.fromtimestamp(int(timestamp) // (10 ** 9), tz=TIMEZONE) #timestamp en segundos
+        return responses({'sender': sender, 'blockNumber': int(block_number), 'timestamp': dt.isoformat()}, 200)
+    except Exception:
+        return responses({'message': messages.INTERNAL_ERROR}, 500)
+
+
+async def all_calls(request):
+    """Lista los callIds; con ?creator=<dirección>, sólo los de ese creador."""
+    creator = request.query.get('creator')
+    if creator is not None and validators.address(creator) is None:
+        return responses({'message': messages.INVALID_ADDRESS}, 400)
+    try:
+        creator = None if creator is None else AsyncWeb3.to_checksum_address(creator)
+        return responses({'calls': await reader.call_ids(creator)}, 200)
+    except Exception:
+        return responses({'message': messages.INTERNAL_ERROR}, 500)
+
+
+async def authorized(request):
+    address = request.match_info['address_value']
+    if validators.address(address) is None:
+        return responses({'message': messages.INVALID_ADDRESS}, 400)
+    try:
+        authorized = await reader.call(reader.factory.functions.isAuthorized(AsyncWeb3.to_checksum_address(address)))
+        return responses({'authorized': authorized}, 200)
+    except Exception:
+        return responses({'authorized': False}, 200)
+
+
+async def contract_address(request):
+    return responses({'address': reader.factory.address}, 200)
+
+
+async def contract_owner(request):
+    return responses({'address': await reader.call(reader.factory.functions.owner())}, 200)
+
+
+async def connect(uri, pool_size, timeout):
+    """Crea la instancia de AsyncWeb3 con una sesión HTTP de `pool_size` conexiones."""
+    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(uri, request_kwargs={'timeout': ClientTimeout(total=timeout)}))
+    session = ClientSession(connector=TCPConnector(limit=pool_size))
+    await w3.provider.cache_async_session(session)
+    return w3, session
+
+
+def make_app(uri, concurrency=DEFAULT_CONCURRENCY, pool_size=DEFAULT_CONCURRENCY,
+             timeout=provider.DEFAULT_TIMEOUT, factory_json=FACTORY_JSON, cfp_json=CFP_JSON,
+             multicall_json=MULTICALL_JSON):
+    async def startup(app):
+        global reader
+        w3, session = await connect(uri, pool_size, timeout)
+        app['session'] = session
+        with open(factory_json) as f:
+            config = json.load(f)
+            factory = w3.eth.contract(abi=config['abi'], address=config["networks"]["5777"]["address"])
+        with open(cfp_json) as f:
+            cfp_abi = json.load(f)['abi']
+        multicall_address = load_address(multicall_json)
+        multicall = Multicall(w3, address=multicall_address) if multicall_address is not None else None
+        reader = Reader(w3, factory, cfp_abi, concurrency, multicall)
+
+    async def cleanup(app):
+        await app['session'].close()
+
+    app = web.Application()
+    app.on_startup.append(startup)
+    app.on_cleanup.append(cleanup)
+    app.router.add_get("/calls", all_calls)
+    app.router.add_get("/calls/{call_id}", calls)
+    app.router.add_get("/closing-time/{call_id}", closing_time)
+    app.router.add_get("/proposal-data/{call_id}/{proposal}", proposal_data)
+    app.router.add_get("/authorized/{address_value}", authorized)
+    app.router.add_get("/contract-address", contract_address)
+    app.router.add_get("/contract-owner", contract_owner)
+    return app
+
+
+reader = None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", "-u", help="URI HTTP del nodo", default="http://localhost:7545")
+    parser.add_argument("--port", "-p", help="Puerto del servidor", type=int, default=5000)
+    parser.add_argument("--concurrency", help="Llamadas simultáneas al nodo", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--pool-size", help="Conexiones HTTP simultáneas con el nodo", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--timeout", help="Segundos de espera de cada llamada al nodo", type=float, default=provider.DEFAULT_TIMEOUT)
+    args = parser.parse_args()
+    web.run_app(make_app(args.uri, args.concurrency, args.pool_size, args.timeout), port=args.port)
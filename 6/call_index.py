@@ -0,0 +1,235 @@
+"""Índice local de llamados, alimentado por los eventos `CFPCreated` de la factoría."""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from web3 import Web3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.logs import LogFetcher
+from multicall import Call
+
+DEFAULT_CFP_CACHE_SIZE = 1024
+CHECKPOINT_BLOCKS = 100000 # bloques entre checkpoints al sincronizar
+SYNC_INTERVAL = 1.0 # segundos durante los que `refresh` reutiliza la última sincronización
+
+
+def hex32(value) -> str:
+    """Normaliza un bytes32 (bytes o string hexadecimal) a '0x...' en minúsculas."""
+    if isinstance(value, str):
+        return value.lower()
+    return f"0x{bytes(value).hex()}"
+
+
+def deployment_block(web3, network) -> int:
+    """Devuelve el bloque en que se desplegó un contrato según su artefacto de truffle."""
+    tx_hash = network.get("transactionHash")
+    if tx_hash is None:
+        return 0
+    return web3.eth.get_transaction_receipt(tx_hash).blockNumber
+
+
+class CallIndex:
+    """Mantiene en memoria callId -> (creador, cfp) y creador -> [callIds].
+
+    El índice se actualiza leyendo los eventos `CFPCreated` a partir del último
+    bloque indexado (el checkpoint), de modo que cada sincronización sólo recorre
+    los bloques nuevos. Las consultas se responden sin acceder al nodo.
+
+    Si se indica un `store` (ver `chain_store.ChainStore`), los llamados y los
+    eventos `ProposalRegistered` de sus CFP se persisten junto con el checkpoint,
+    y al iniciar se retoma desde el último bloque guardado.
+
+    Los objetos `Contract` de los CFP consultados se guardan en una caché LRU
+    de `cfp_cache_size` llamados (ver `cfp`), para no reconstruirlos a partir
+    del ABI en cada pedido.
+
+    Con un `multicall` (ver `multicall.Multicall`), los tiempos de cierre de
+    los llamados nuevos se leen todos juntos al sincronizar, en lugar de uno
+    por uno en la primera consulta de cada llamado.
+
+    Los eventos se piden con un `common.logs.LogFetcher`, que ajusta solo el
+    largo de los tramos de bloques a los límites del nodo.
+    """
+
+    def __init__(self, web3, contract, cfp_abi, from_block=0, store=None, cfp_cache_size=DEFAULT_CFP_CACHE_SIZE,
+                 multicall=None):
+        self.web3 = web3
+        self.contract = contract
+        self.cfp_abi = cfp_abi
+        self.store = store
+        self.multicall = multicall
+        self.cfp_cache_size = cfp_cache_size
+        self._cfp_cache = OrderedDict() # callId -> [cfp, Contract, closingTime]
+        self._cfp_class = web3.eth.contract(abi=cfp_abi) # el ABI se procesa una sola vez
+        self.cfp_hits = self.cfp_misses = 0
+        self.last_block = from_block - 1
+        self.synced_at = None   # momento (monotonic) de la última sincronización completa
+        self.calls = {}         # callId -> {'creator', 'cfp', 'closingTime'}
+        self.created_by = {}    # creador -> [callId, ...] en orden de creación
+        self.order = []         # callIds en orden de creación
+        self.cfps = set()       # direcciones de las instancias CFP conocidas
+        self.logs = LogFetcher(web3)
+        self._created_event = contract.events.CFPCreated()
+        self._created_topic = Web3.keccak(text="CFPCreated(address,bytes32,address)").hex()
+        self._proposal_event = web3.eth.contract(abi=cfp_abi).events.ProposalRegistered()
+        self._proposal_topic = Web3.keccak(text="ProposalRegistered(bytes32,address,uint256)").hex()
+        self._lock = threading.Lock()
+        if store is not None:
+            self._load()
+
+    def _load(self):
+        """Recupera los llamados y el checkpoint del almacenamiento persistente."""
+        last_block = self.store.last_block()
+        if last_block is None:
+            return
+        for call_id, creator, cfp, closing_time in self.store.calls():
+            self._add(call_id, creator, cfp)
+            if closing_time is not None:
+                self.calls[call_id]['closingTime'] = int(closing_time)
+        self.last_block = max(self.last_block, last_block)
+        missing = [call_id for call_id, entry in self.calls.items() if entry['closingTime'] is None]
+        if self.multicall is not None and missing:
+            self._closing_times(missing)
+
+    def sync(self) -> int:
+        """Indexa los eventos ocurridos desde el checkpoint. Devuelve cuántos llamados se agregaron.
+
+        Los bloques se recorren de a `CHECKPOINT_BLOCKS`, y cada tramo se guarda
+        con su checkpoint, así que una indexación larga se retoma donde quedó.
+        """
+        started = monotonic()
+        latest = self.web3.eth.block_number
+        new_calls = []
+        with self._lock:
+            while self.last_block < latest:
+                from_block = self.last_block + 1
+                to_block = min(latest, from_block + CHECKPOINT_BLOCKS - 1)
+                new_calls.extend(self._sync_range(from_block, to_block))
+                self.last_block = to_block
+        self.synced_at = started
+        if self.multicall is not None and new_calls:
+            self._closing_times([call[0] for call in new_calls])
+        return len(new_calls)
+
+    def refresh(self, max_age=SYNC_INTERVAL) -> int:
+        """Como `sync`, pero no consulta al nodo si la última sincronización tiene menos de `max_age` segundos.
+
+        Para los pedidos que se repiten seguido (p.ej. las páginas de un mismo
+        listado), que así no pagan una consulta al nodo cada uno.
+        """
+        if self.synced_at is not None and monotonic() - self.synced_at < max_age:
+            return 0
+        return self.sync()
+
+    def _sync_range(self, from_block, to_block):
+        logs = self.logs.logs(from_block, to_block, address=self.contract.address, topics=[self._created_topic])
+        new_calls = []
+        for log in logs:
+            event = self._created_event.process_log(log)
+            args = event['args']
+            call_id = hex32(args['callId'])
+            if self._add(call_id, args['creator'], args['cfp']):
+                new_calls.append((call_id, args['creator'], args['cfp'], event['blockNumber']))
+        if self.store is not None:
+            proposals = self._proposals(from_block, to_block)
+            self.store.save(new_calls, proposals, to_block)
+        return new_calls
+
+    def _closing_times(self, call_ids):
+        """Lee con el multicall los tiempos de cierre de los llamados; si falla, quedan para la primera consulta."""
+        try:
+            values = self.multicall.call(Call(self.calls[call_id]['cfp'], self._cfp_class, 'closingTime')
+                                         for call_id in call_ids)
+        except Exception:
+            return
+        fetched = [(call_id, value) for call_id, value in zip(call_ids, values) if value is not None]
+        for call_id, value in fetched:
+            self.calls[call_id]['closingTime'] = value
+        if self.store is not None:
+            self.store.set_closing_times(fetched)
+
+    def _proposals(self, from_block, to_block):
+        """Obtiene los eventos `ProposalRegistered` emitidos por los CFP de la factoría."""
+        if not self.cfps:
+            return []
+        # el nodo filtra por contrato
+        logs = self.logs.logs(from_block, to_block, address=sorted(self.cfps), topics=[self._proposal_topic])
+        proposals = []
+        for log in logs:
+            args = self._proposal_event.process_log(log)['args']
+            proposals.append((log['address'], hex32(args['proposal']), args['sender'],
+                              log['blockNumber'], log['logIndex']))
+        return proposals
+
+    def _add(self, call_id, creator, cfp) -> bool:
+        if call_id in self.calls:
+            return False
+        self.calls[call_id] = {'creator': creator, 'cfp': cfp, 'closingTime': None}
+        self.created_by.setdefault(creator, []).append(call_id)
+        self.order.append(call_id)
+        self.cfps.add(cfp)
+        return True
+
+    def get(self, call_id):
+        """Devuelve los datos del llamado, o None si no existe.
+
+        Si el llamado no está en el índice se sincroniza una vez antes de
+        responder, para contemplar los creados desde la última consulta.
+        """
+        call_id = hex32(call_id)
+        entry = self.calls.get(call_id)
+        if entry is None and self.sync() > 0:
+            entry = self.calls.get(call_id)
+        return entry
+
+    def cfp(self, call_id):
+        """Devuelve [dirección del CFP, Contract, tiempo de cierre o None] del llamado, o None si no existe.
+
+        Un acierto no consulta al nodo ni construye el contrato: la dirección
+        del CFP y su tiempo de cierre no cambian una vez creado el llamado.
+        """
+        call_id = hex32(call_id)
+        with self._lock:
+            cached = self._cfp_cache.get(call_id)
+            if cached is not None:
+                self._cfp_cache.move_to_end(call_id)
+                self.cfp_hits += 1
+                return cached
+            self.cfp_misses += 1
+        entry = self.get(call_id)
+        if entry is None:
+            return None
+        cached = [entry['cfp'], self._cfp_class(address=entry['cfp']), entry['closingTime']]
+        with self._lock:
+            self._cfp_cache[call_id] = cached
+            while len(self._cfp_cache) > self.cfp_cache_size:
+                self._cfp_cache.popitem(last=False)
+        return cached
+
+    def closing_time(self, call_id):
+        """Devuelve el tiempo de cierre del llamado, consultándolo al CFP sólo la primera vez."""
+        cached = self.cfp(call_id)
+        if cached is None:
+            return None
+        if cached[2] is None:
+            cached[2] = cached[1].functions.closingTime().call()
+            self.calls[hex32(call_id)]['closingTime'] = cached[2]
+            if self.store is not None:
+                self.store.set_closing_time(hex32(call_id), cached[2])
+        return cached[2]
+
+    def cache_stats(self):
+        with self._lock:
+            lookups = self.cfp_hits + self.cfp_misses
+            return {'entries': len(self._cfp_cache), 'maxEntries': self.cfp_cache_size,
+                    'hits': self.cfp_hits, 'misses': self.cfp_misses,
+                    'hitRate': round(self.cfp_hits / lookups, 4) if lookups else None}
+
+    def call_ids(self, creator=None):
+        """Lista los callIds en orden de creación, opcionalmente de un solo creador."""
+        if creator is None:
+            return list(self.order)
+        return list(self.created_by.get(creator, []))
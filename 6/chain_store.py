@@ -0,0 +1,273 @@
+"""Almacenamiento persistente (SQLite) de los datos indexados de la cadena."""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+BUSY_TIMEOUT = 30 # segundos de espera si otro proceso tiene la base bloqueada
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS calls (
+    call_id TEXT PRIMARY KEY,
+    creator TEXT NOT NULL,
+    cfp TEXT NOT NULL,
+    closing_time TEXT,
+    block_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_cfp ON calls (cfp);
+CREATE TABLE IF NOT EXISTS proposals (
+    cfp TEXT NOT NULL,
+    proposal TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    timestamp TEXT,
+    PRIMARY KEY (cfp, proposal)
+);
+CREATE INDEX IF NOT EXISTS proposals_order ON proposals (cfp, block_number, log_index);
+CREATE TABLE IF NOT EXISTS registrations (
+    address TEXT PRIMARY KEY,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS txs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    tx_hash TEXT,
+    block_number INTEGER,
+    error TEXT,
+    updated REAL NOT NULL
+);
+"""
+
+# en un archivo aparte (ver `nonce_path`): su bloqueo de escritura no detiene al índice
+NONCE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nonces (
+    address TEXT PRIMARY KEY,
+    nonce INTEGER NOT NULL
+);
+"""
+
+
+def nonce_path(path):
+    """Archivo de los nonces que acompaña a la base `path` (chain.db -> chain.nonces.db)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.nonces{ext or '.db'}"
+
+
+class NonceLease:
+    """Nonce reservado para una transacción; `resync` lo vuelve a pedir al nodo."""
+
+    def __init__(self, value, fetch):
+        self.value = value
+        self._fetch = fetch
+
+    def resync(self):
+        self.value = self._fetch()
+        return self.value
+
+
+class ChainStore:
+    """Guarda llamados, instancias CFP, eventos `ProposalRegistered`,
+    estado de las registraciones y el último bloque indexado.
+
+    Usa SQLite en modo WAL: los eventos de un rango de bloques y el nuevo
+    checkpoint se escriben en una única transacción, de modo que ante una
+    caída se retoma desde el último rango completo.
+
+    Varios procesos del servidor pueden compartir el mismo archivo: además
+    del índice, guarda el estado de las transacciones enviadas, para que
+    cualquier proceso pueda responder por ellas. El próximo nonce de la
+    cuenta dueña (ver `nonce`) se guarda en otro archivo, `nonce_path(path)`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # los nonces van en otro archivo: su transacción se mantiene abierta mientras se
+        # transmite, y en la misma base bloquearía las escrituras del índice de todos los procesos
+        self.nonce_conn = sqlite3.connect(nonce_path(path), timeout=BUSY_TIMEOUT, isolation_level=None,
+                                          check_same_thread=False)
+        self.nonce_conn.execute("PRAGMA journal_mode=WAL")
+        self.nonce_conn.executescript(NONCE_SCHEMA)
+        self._nonce_lock = threading.Lock()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def bind(self, factory_address, latest_block):
+        """Asocia el almacenamiento a una factoría.
+
+        Si los datos guardados corresponden a otra factoría, o a una cadena
+        más larga que la actual (p.ej. Ganache reiniciado), se descartan.
+        """
+        with self._lock, self.conn:
+            last = self._meta("last_block")
+            if self._meta("factory") != factory_address or (last is not None and int(last) > latest_block):
+                for table in ("meta", "calls", "proposals", "registrations", "txs"):
+                    self.conn.execute(f"DELETE FROM {table}")
+                self.conn.execute("INSERT INTO meta VALUES ('factory', ?)", (factory_address,))
+                with self._nonce_lock:
+                    self.nonce_conn.execute("DELETE FROM nonces")
+
+    def last_block(self):
+        """Devuelve el último bloque indexado, o None si no se indexó ninguno."""
+        with self._lock:
+            value = self._meta("last_block")
+        return None if value is None else int(value)
+
+    def save(self, calls, proposals, last_block):
+        """Guarda atómicamente los llamados y propuestas de un rango y su checkpoint.
+
+        :param calls: tuplas (call_id, creator, cfp, block_number)
+        :param proposals: tuplas (cfp, proposal, sender, block_number, log_index)
+        """
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO calls (call_id, creator, cfp, block_number) VALUES (?, ?, ?, ?)",
+                calls)
+            self.conn.executemany(
+                "INSERT INTO proposals (cfp, proposal, sender, block_number, log_index) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (cfp, proposal) DO UPDATE SET log_index = excluded.log_index",
+                proposals)
+            # con varios procesos indexando, el checkpoint guardado nunca retrocede
+            self.conn.execute(
+                "INSERT INTO meta VALUES ('last_block', ?) ON CONFLICT (key) "
+                "DO UPDATE SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))",
+                (str(last_block),))
+
+    def calls(self):
+        """Devuelve los llamados guardados en orden de creación."""
+        return self._query(
+            "SELECT call_id, creator, cfp, closing_time FROM calls ORDER BY block_number, rowid")
+
+    def set_closing_time(self, call_id, closing_time):
+        self.set_closing_times([(call_id, closing_time)])
+
+    def set_closing_times(self, closing_times):
+        """Guarda los tiempos de cierre de varios llamados, dados como pares (call_id, closing_time)."""
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE calls SET closing_time = ? WHERE call_id = ?",
+                                  [(str(closing_time), call_id) for call_id, closing_time in closing_times])
+
+    def proposal(self, cfp, proposal):
+        """Devuelve (sender, block_number, timestamp) de una propuesta, o None."""
+        rows = self._query(
+            "SELECT sender, block_number, timestamp FROM proposals WHERE cfp = ? AND proposal = ?",
+            (cfp, proposal))
+        return rows[0] if rows else None
+
+    def proposals_page(self, cfp, after=None, limit=100):
+        """Devuelve hasta `limit` propuestas de `cfp` en orden de registro, como tuplas
+        (proposal, sender, block_number, log_index, timestamp), a partir de la clave
+        (block_number, log_index, proposal) `after` exclusive."""
+        if after is None:
+            return self._query(
+                "SELECT proposal, sender, block_number, log_index, timestamp FROM proposals "
+                "WHERE cfp = ? ORDER BY block_number, log_index, proposal LIMIT ?",
+                (cfp, limit))
+        return self._query(
+            "SELECT proposal, sender, block_number, log_index, timestamp FROM proposals "
+            "WHERE cfp = ? AND (block_number, log_index, proposal) > (?, ?, ?) "
+            "ORDER BY block_number, log_index, proposal LIMIT ?",
+            (cfp, *after, limit))
+
+    def iter_proposals(self, cfp, page=1000):
+        """Recorre todas las propuestas de `cfp` de a `page` filas, sin cargarlas todas en memoria."""
+        after = None
+        while True:
+            rows = self.proposals_page(cfp, after, page)
+            yield from rows
+            if len(rows) < page:
+                return
+            after = (rows[-1][2], rows[-1][3], rows[-1][0])
+
+    def proposals_many(self, cfp, proposals):
+        """Devuelve {propuesta: (sender, block_number, timestamp)} de las propuestas de `cfp` que están guardadas."""
+        found = {}
+        for i in range(0, len(proposals), 500):
+            chunk = proposals[i:i + 500]
+            rows = self._query(
+                "SELECT proposal, sender, block_number, timestamp FROM proposals "
+                f"WHERE cfp = ? AND proposal IN ({','.join('?' * len(chunk))})",
+                (cfp, *chunk))
+            found.update((row[0], row[1:]) for row in rows)
+        return found
+
+    def set_proposal_timestamp(self, cfp, proposal, sender, block_number, timestamp):
+        """Registra el timestamp de una propuesta, agregándola si todavía no se indexó su evento."""
+        self.set_proposal_timestamps(cfp, [(proposal, sender, block_number, timestamp)])
+
+    def set_proposal_timestamps(self, cfp, proposals):
+        """Como `set_proposal_timestamp`, para tuplas (proposal, sender, block_number, timestamp)."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO proposals (cfp, proposal, sender, block_number, log_index, timestamp) "
+                "VALUES (?, ?, ?, ?, -1, ?) "
+                "ON CONFLICT (cfp, proposal) DO UPDATE SET timestamp = excluded.timestamp",
+                [(cfp, proposal, sender, block_number, str(timestamp))
+                 for proposal, sender, block_number, timestamp in proposals])
+
+    def registration(self, address):
+        """Devuelve el estado de registración conocido de una cuenta, o None."""
+        rows = self._query("SELECT status FROM registrations WHERE address = ?", (address,))
+        return rows[0][0] if rows else None
+
+    def set_registration(self, address, status):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO registrations VALUES (?, ?)", (address, status))
+
+    @contextmanager
+    def nonce(self, address, fetch):
+        """Reserva el próximo nonce de `address` con exclusión entre procesos.
+
+        Mientras dura el bloque ningún otro proceso puede reservar, así que
+        la transacción debe firmarse y transmitirse dentro de él (y armarse
+        antes, para que el bloqueo sea lo más corto posible). Si el
+        bloque termina sin error se guarda el nonce siguiente; si no, la
+        reserva se descarta. `fetch()` devuelve la cuenta de transacciones
+        pendientes del nodo, que se usa la primera vez y al resincronizar.
+        """
+        with self._nonce_lock:
+            self.nonce_conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.nonce_conn.execute("SELECT nonce FROM nonces WHERE address = ?", (address,)).fetchone()
+                lease = NonceLease(row[0] if row is not None else fetch(), fetch)
+                yield lease
+                self.nonce_conn.execute("INSERT OR REPLACE INTO nonces VALUES (?, ?)", (address, lease.value + 1))
+                self.nonce_conn.execute("COMMIT")
+            except BaseException:
+                self.nonce_conn.execute("ROLLBACK")
+                raise
+
+    def reset_nonce(self, address):
+        """Descarta el nonce guardado de `address`; la próxima reserva lo vuelve a pedir al nodo."""
+        with self._nonce_lock:
+            self.nonce_conn.execute("DELETE FROM nonces WHERE address = ?", (address,))
+
+    def set_tx(self, tx_id, status, tx_hash=None, block_number=None, error=None):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?, ?)",
+                              (tx_id, status, tx_hash, block_number, error, time.time()))
+
+    def tx(self, tx_id):
+        """Devuelve el estado guardado de una transacción (como `TxQueue.status`), o None."""
+        rows = self._query("SELECT status, tx_hash, block_number, error FROM txs WHERE id = ?", (tx_id,))
+        if not rows:
+            return None
+        status, tx_hash, block_number, error = rows[0]
+        return {'id': tx_id, 'status': status, 'transaction': tx_hash, 'blockNumber': block_number, 'error': error}
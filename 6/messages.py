@@ -2,8 +2,13 @@
 INVALID_ADDRESS = "Dirección inválida"
 INVALID_SIGNATURE = "Firma inválida"
 INVALID_MIMETYPE = "Tipo MIME inválido"
+INVALID_BODY = "El cuerpo debe ser un objeto JSON"
 INVALID_CALLID = "Identificador de llamado incorrecto"
 INVALID_PROPOSAL = "Formato de propuesta incorrecto"
+INVALID_PROPOSAL_LIST = "Lista de propuestas incorrecta"
+INVALID_CURSOR = "Cursor incorrecto"
+INVALID_LIMIT = "Límite incorrecto"
+INVALID_FORMAT = "Formato de exportación incorrecto"
 INVALID_TIME_FORMAT = "Formato de tiempo incorrecto"
 INVALID_CLOSING_TIME = "Tiempo de cierre inválido"
 ALREADY_AUTHORIZED = "Ya está autorizado"
@@ -11,6 +16,7 @@ ALREADY_CREATED = "El llamado ya existe"
 ALREADY_REGISTERED = "La propuesta ya ha sido registrada"
 CALLID_NOT_FOUND = "El llamado no existe"
 PROPOSAL_NOT_FOUND = "La propuesta no existe"
+TX_NOT_FOUND = "La transacción no existe"
 UNAUTHORIZED = "No autorizado"
 INTERNAL_ERROR = "Error interno"
 OK = "OK"
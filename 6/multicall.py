@@ -0,0 +1,97 @@
+"""Lecturas agregadas: muchas llamadas `view` a la factoría y a los CFP con un único eth_call."""
+import json
+from collections import namedtuple
+
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+from eth_utils.abi import collapse_if_tuple
+
+DEFAULT_CHUNK = 500 # llamadas por eth_call; acota el gas de la lectura
+TRY_AGGREGATE = function_signature_to_4byte_selector("tryAggregate((address,bytes)[])")
+
+# `contract` es un contrato (o la clase que devuelve web3.eth.contract(abi=...)) que aporta el ABI
+Call = namedtuple("Call", "target contract fn_name args", defaults=((),))
+
+
+def output_types(contract, fn_name):
+    for entry in contract.abi:
+        if entry.get('type') == 'function' and entry['name'] == fn_name:
+            return [collapse_if_tuple(o) for o in entry['outputs']]
+    raise ValueError(f"{fn_name} no está en el ABI")
+
+
+def encode(call):
+    return call.contract.encodeABI(fn_name=call.fn_name, args=list(call.args))
+
+
+def decode(codec, call, data):
+    """Decodifica el resultado de una llamada: un valor si devuelve uno solo, una tupla si devuelve varios.
+
+    Como `ContractFunction.call`, devuelve las direcciones con checksum.
+    """
+    types = output_types(call.contract, call.fn_name)
+    values = [to_checksum_address(v) if t == 'address' else v for t, v in zip(types, codec.decode(types, data))]
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+class Multicall:
+    """Ejecuta muchas lecturas juntas y devuelve cada resultado decodificado.
+
+    Si hay un contrato `Multicall` desplegado (`address`), cada grupo de
+    `chunk` llamadas se resuelve con un único eth_call a `tryAggregate`;
+    si no, se envían en un lote JSON-RPC de eth_call con `rpc` (un
+    `common.rpc_batch.BatchClient`). En ambos casos una llamada que revierte
+    devuelve None sin afectar a las demás.
+    """
+
+    def __init__(self, web3, address=None, rpc=None, chunk=DEFAULT_CHUNK):
+        if address is None and rpc is None:
+            raise ValueError("se necesita la dirección del contrato Multicall o un BatchClient")
+        self.web3 = web3
+        self.address = address
+        self.rpc = rpc
+        self.chunk = chunk
+
+    def call(self, calls, block='latest'):
+        """Devuelve el resultado de cada `Call` (ver `decode`), o None si revirtió."""
+        calls = list(calls)
+        results = []
+        for i in range(0, len(calls), self.chunk):
+            chunk = calls[i:i + self.chunk]
+            if self.address is not None:
+                raw = self._aggregate(chunk, block)
+            else:
+                raw = self._batch(chunk, block)
+            for call, data in zip(chunk, raw):
+                try:
+                    results.append(None if data is None else decode(self.web3.codec, call, data))
+                except Exception:
+                    results.append(None) # p.ej. el destino no es un contrato y no devolvió datos
+        return results
+
+    def request(self, calls):
+        """Datos del eth_call a `tryAggregate` para un grupo de llamadas."""
+        data = self.web3.codec.encode(['(address,bytes)[]'],
+                                      [[(call.target, bytes.fromhex(encode(call)[2:])) for call in calls]])
+        return {'to': self.address, 'data': f"0x{(TRY_AGGREGATE + data).hex()}"}
+
+    def parse(self, data):
+        """Datos devueltos por cada llamada del grupo, o None si revirtió."""
+        _, results = self.web3.codec.decode(['uint256', '(bool,bytes)[]'], bytes(data))
+        return [returned if success else None for success, returned in results]
+
+    def _aggregate(self, calls, block):
+        return self.parse(self.web3.eth.call(self.request(calls), block))
+
+    def _batch(self, calls, block):
+        raw = self.rpc.batch([('eth_call', [{'to': call.target, 'data': encode(call)}, block]) for call in calls],
+                             raise_errors=False)
+        return [None if isinstance(data, Exception) else bytes.fromhex(data[2:]) for data in raw]
+
+
+def load_address(path, network_id="5777"):
+    """Dirección del contrato Multicall según su artefacto de truffle, o None si no está desplegado."""
+    try:
+        with open(path) as f:
+            return json.load(f)["networks"][network_id]["address"]
+    except (OSError, KeyError, ValueError):
+        return None
@@ -1,7 +1,9 @@
 """Casos de prueba para el servidor de APIs."""
+import json
 from datetime import datetime
 from os import urandom
 from random import randrange
+from time import sleep
 from typing import Optional, Union
 
 import requests
@@ -50,6 +52,16 @@ def single_field_schema(field, field_type="string"):
     }
 
 
+tx_schema = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "status": {"enum": ["queued", "sent", "mined", "failed"]},
+    },
+    "required": ["id", "status", "transaction", "blockNumber", "error"]
+}
+
+
 message_schema = single_field_schema("message")
 authorized_schema = single_field_schema("authorized", "boolean")
 closing_time_schema = single_field_schema("closingTime")
@@ -428,6 +440,23 @@ def test_created_closing_time() -> None:
         assert response.json()["message"].startswith(messages.INVALID_CALLID)
 
 
+def test_admin_stats() -> None:
+    """Prueba que las consultas repetidas de un llamado se respondan desde la caché de contratos CFP."""
+    assert len(calls) > 0
+    call_id = next(iter(calls))
+    requests.get(url("closing-time", call_id), timeout=3)
+    before = requests.get(url("admin/stats"), timeout=3).json()["cfpCache"]
+    response = requests.get(url("closing-time", call_id), timeout=3)
+    assert response.status_code == 200
+    response = requests.get(url("admin/stats"), timeout=3)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 200
+    after = response.json()["cfpCache"]
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+    assert 0 < after["entries"] <= after["maxEntries"]
+
+
 def test_contract_address() -> None:
     """Prueba que devuelva la dirección del contrato."""
     get_contract_address()
@@ -540,4 +569,99 @@ def test_proposal_data_invalid_input() -> None:
     assert APPLICATION_JSON in response.headers['Content-type']
     validate(instance=response.json(), schema=message_schema)
     assert response.status_code == 404
-    assert response.json()["message"].startswith(messages.CALLID_NOT_FOUND)
\ No newline at end of file
+    assert response.json()["message"].startswith(messages.CALLID_NOT_FOUND)
+
+
+def test_proposal_data_batch() -> None:
+    """Prueba la consulta de muchas propuestas de un llamado en un solo pedido."""
+    assert len(calls) > 0
+    call_id = next(iter(calls))
+    proposal = random_hash()
+    response = post_register_proposal(call_id, proposal)
+    assert response.status_code in (201, 202)
+    if response.status_code == 202:
+        # la transaccion se mina en segundo plano
+        for _ in range(30):
+            if get_proposal_data(call_id, proposal).status_code == 200:
+                break
+            sleep(0.5)
+    unknown = random_hash()
+    response = requests.post(url("proposal-data/batch"),
+                             json={"callId": call_id, "proposals": [proposal, unknown, "0x00"]}, timeout=10)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 200
+    results = response.json()["proposals"]
+    assert [r["proposal"] for r in results] == [proposal, unknown, "0x00"]
+    assert results[0] == {"proposal": proposal, **get_proposal_data(call_id, proposal).json()}
+    assert results[1]["message"] == messages.PROPOSAL_NOT_FOUND
+    assert results[2]["message"] == messages.INVALID_PROPOSAL
+    response = requests.post(url("proposal-data/batch"), json={"callId": random_hash(), "proposals": [proposal]}, timeout=3)
+    assert response.status_code == 404
+    assert response.json()["message"] == messages.CALLID_NOT_FOUND
+    response = requests.post(url("proposal-data/batch"), json={"callId": call_id, "proposals": []}, timeout=3)
+    assert response.status_code == 400
+    assert response.json()["message"] == messages.INVALID_PROPOSAL_LIST
+    for body in ([], "x", 1):
+        response = requests.post(url("proposal-data/batch"), json=body, timeout=3)
+        assert response.status_code == 400
+        assert response.json()["message"] == messages.INVALID_BODY
+
+
+def test_call_proposals() -> None:
+    """Prueba el listado paginado y la exportación de las propuestas de un llamado."""
+    assert len(calls) > 0
+    call_id = next(iter(calls))
+    proposal = random_hash()
+    assert post_register_proposal(call_id, proposal).status_code in (201, 202)
+    listed = []
+    for _ in range(30):
+        listed, cursor = [], None
+        while True:
+            params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+            response = requests.get(url("calls", f"{call_id}/proposals"), params=params, timeout=3)
+            assert APPLICATION_JSON in response.headers['Content-type']
+            assert response.status_code == 200
+            assert len(response.json()["proposals"]) <= 1
+            listed += [p["proposal"] for p in response.json()["proposals"]]
+            cursor = response.json()["next"]
+            if cursor is None:
+                break
+        if proposal in listed:
+            break
+        sleep(0.5) # la transaccion se mina en segundo plano
+    assert proposal in listed
+    assert len(listed) == len(set(listed))
+    response = requests.get(url("calls", f"{call_id}/proposals/export"), timeout=3)
+    assert response.status_code == 200
+    exported = [json.loads(line)["proposal"] for line in response.text.splitlines()]
+    assert exported[:len(listed)] == listed
+    response = requests.get(url("calls", f"{call_id}/proposals/export"), params={"format": "csv"}, timeout=3)
+    assert response.status_code == 200
+    assert response.text.splitlines()[0] == "proposal,sender,blockNumber"
+    response = requests.get(url("calls", f"{call_id}/proposals"), params={"cursor": "x"}, timeout=3)
+    assert response.status_code == 400
+    assert response.json()["message"] == messages.INVALID_CURSOR
+    response = requests.get(url("calls", f"{call_id}/proposals"), params={"limit": 0}, timeout=3)
+    assert response.status_code == 400
+    assert response.json()["message"] == messages.INVALID_LIMIT
+    response = requests.get(url("calls", f"{random_hash()}/proposals"), timeout=3)
+    assert response.status_code == 404
+
+
+def test_tx_status() -> None:
+    """Prueba que el id de seguimiento de una transacción informe su estado."""
+    assert len(calls) > 0
+    call_id = next(iter(calls))
+    response = post_register_proposal(call_id, random_hash())
+    assert response.status_code in (201, 202)
+    tx_id = response.json()["tx"]
+    response = requests.get(url("tx", tx_id), timeout=3)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 200
+    validate(instance=response.json(), schema=tx_schema)
+    assert response.json()["id"] == tx_id
+    response = requests.get(url("tx", random_hex(16)[2:]), timeout=3)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 404
+    validate(instance=response.json(), schema=message_schema)
+    assert response.json()["message"] == messages.TX_NOT_FOUND
@@ -0,0 +1,200 @@
+"""Cola de envío de transacciones firmadas localmente desde la cuenta dueña."""
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import monotonic
+from uuid import uuid4
+
+from web3.exceptions import TransactionNotFound
+
+from chain_store import NonceLease
+
+QUEUED = "queued"
+SENT = "sent"
+MINED = "mined"
+FAILED = "failed"
+DEFAULT_TIMEOUT = 300 # segundos sin recibo tras los cuales una transacción enviada se da por fallida
+
+
+class TxQueue:
+    """Serializa las transacciones de una cuenta y sigue sus recibos en segundo plano.
+
+    Un único hilo asigna los nonces localmente, firma y transmite las
+    transacciones en orden de llegada; otro hilo consulta los recibos de las
+    transacciones enviadas. Cada transacción se identifica con un id de
+    seguimiento que se devuelve apenas se encola.
+
+    Con un `store` (ver `chain_store.ChainStore`) el nonce se reserva en el
+    almacenamiento compartido y el estado de cada transacción se guarda ahí,
+    de modo que varios procesos pueden enviar desde la misma cuenta y
+    consultar las transacciones de los demás.
+
+    Una transacción enviada que pasa `timeout` segundos sin recibo (el nodo
+    la descartó, o quedó trabada) se marca como fallida, y el próximo nonce
+    se vuelve a pedir al nodo para no dejar un hueco que retenga las
+    siguientes.
+    """
+
+    def __init__(self, web3, account, store=None, poll_interval=0.5, max_tracked=100000,
+                 timeout=DEFAULT_TIMEOUT):
+        self.web3 = web3
+        self.account = account
+        self.store = store
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_tracked = max_tracked
+        self._queue = queue.Queue()
+        self._txs = OrderedDict()   # id -> estado de la transacción
+        self._done = {}             # id -> threading.Event, para quien espera el resultado
+        self._sent = {}             # hash -> (id, momento del envío), transacciones sin recibo
+        self._on_mined = {}         # id -> función a llamar con el estado cuando se mine
+        self._nonce = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event() # se envió una transacción: se buscan recibos sin esperar
+        threading.Thread(target=self._send_loop, daemon=True).start()
+        threading.Thread(target=self._receipt_loop, daemon=True).start()
+
+    def submit(self, fn, on_mined=None) -> str:
+        """Encola la transacción de una función de contrato y devuelve su id de seguimiento.
+
+        Si se da `on_mined`, se la llama con el estado de la transacción
+        cuando se mina sin revertir (desde el hilo de los recibos).
+        """
+        tx_id = uuid4().hex
+        with self._lock:
+            self._txs[tx_id] = {'id': tx_id, 'status': QUEUED, 'transaction': None,
+                                'blockNumber': None, 'error': None}
+            self._done[tx_id] = threading.Event()
+            if on_mined is not None:
+                self._on_mined[tx_id] = on_mined
+            self._prune()
+        if self.store is not None:
+            self.store.set_tx(tx_id, QUEUED)
+        self._queue.put((tx_id, fn))
+        return tx_id
+
+    def status(self, tx_id):
+        """Devuelve una copia del estado de la transacción, o None si no se conoce."""
+        with self._lock:
+            tx = self._txs.get(tx_id)
+            if tx is not None:
+                return dict(tx)
+        # pudo haberla encolado otro proceso
+        return self.store.tx(tx_id) if self.store is not None else None
+
+    def wait(self, tx_id, timeout=None):
+        """Espera a que la transacción se mine o falle y devuelve su estado."""
+        done = self._done.get(tx_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.status(tx_id)
+
+    def _prune(self):
+        while len(self._txs) > self.max_tracked:
+            tx_id, tx = next(iter(self._txs.items()))
+            if tx['status'] not in (MINED, FAILED):
+                break
+            del self._txs[tx_id]
+            self._done.pop(tx_id, None)
+
+    def _update(self, tx_id, **fields):
+        with self._lock:
+            tx = self._txs[tx_id]
+            tx.update(fields)
+            tx = dict(tx)
+        if self.store is not None:
+            self.store.set_tx(tx_id, tx['status'], tx['transaction'], tx['blockNumber'], tx['error'])
+        if fields.get('status') in (MINED, FAILED):
+            with self._lock:
+                on_mined = self._on_mined.pop(tx_id, None)
+            if on_mined is not None and tx['status'] == MINED:
+                try:
+                    on_mined(tx)
+                except Exception:
+                    pass # no debe detener el seguimiento de las demás transacciones
+            self._done[tx_id].set()
+
+    def _pending_count(self):
+        return self.web3.eth.get_transaction_count(self.account.address, 'pending')
+
+    @contextmanager
+    def _lease(self):
+        """Reserva el próximo nonce: en el almacenamiento compartido si lo hay, si no localmente."""
+        if self.store is not None:
+            with self.store.nonce(self.account.address, self._pending_count) as lease:
+                yield lease
+            return
+        lease = NonceLease(self._nonce if self._nonce is not None else self._pending_count(), self._pending_count)
+        yield lease
+        self._nonce = lease.value + 1
+
+    def _send_loop(self):
+        while True:
+            tx_id, fn = self._queue.get()
+            try:
+                self._send(tx_id, fn)
+            except Exception as e:
+                self._update(tx_id, status=FAILED, error=str(e))
+
+    def _send(self, tx_id, fn):
+        # build_transaction estima el gas, por lo que un revert se detecta aquí sin
+        # consumir el nonce; se hace antes de reservarlo para no retener a los demás procesos
+        tx = fn.build_transaction({'from': self.account.address})
+        with self._lease() as lease:
+            tx['nonce'] = lease.value
+            try:
+                tx_hash = self._broadcast(tx)
+            except ValueError as e:
+                if 'nonce' not in str(e).lower():
+                    raise
+                # el nonce reservado quedó desfasado respecto del nodo: se resincroniza y se reintenta
+                tx['nonce'] = lease.resync()
+                tx_hash = self._broadcast(tx)
+        with self._lock:
+            self._sent[tx_hash] = (tx_id, monotonic())
+        self._update(tx_id, status=SENT, transaction=tx_hash)
+        self._wake.set()
+
+    def _broadcast(self, tx) -> str:
+        signed = self.account.sign_transaction(tx)
+        return self.web3.eth.send_raw_transaction(signed.rawTransaction).hex()
+
+    def _receipt_loop(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                pending = list(self._sent.items())
+            for tx_hash, (tx_id, _) in pending:
+                try:
+                    receipt = self.web3.eth.get_transaction_receipt(tx_hash)
+                except TransactionNotFound:
+                    continue
+                except Exception:
+                    break
+                with self._lock:
+                    del self._sent[tx_hash]
+                if receipt.status == 1:
+                    self._update(tx_id, status=MINED, blockNumber=receipt.blockNumber)
+                else:
+                    self._update(tx_id, status=FAILED, blockNumber=receipt.blockNumber,
+                                 error="La transacción fue revertida")
+            self._expire()
+
+    def _expire(self):
+        """Da por fallidas las transacciones enviadas hace más de `timeout` segundos y sin recibo."""
+        limit = monotonic() - self.timeout
+        with self._lock:
+            stale = [(tx_hash, tx_id) for tx_hash, (tx_id, sent_at) in self._sent.items() if sent_at < limit]
+            for tx_hash, _ in stale:
+                del self._sent[tx_hash]
+        if not stale:
+            return
+        for _, tx_id in stale:
+            self._update(tx_id, status=FAILED, error=f"Sin recibo después de {self.timeout} segundos")
+        # su nonce quedaría sin usar: el próximo se pide al nodo (cuenta de transacciones pendientes)
+        if self.store is not None:
+            self.store.reset_nonce(self.account.address)
+        else:
+            self._nonce = None
@@ -0,0 +1,37 @@
+"""Punto de entrada WSGI de la API de llamados, para servirla con varios procesos:
+
+    CFP_MNEMONIC=mnemonic gunicorn --workers 4 --threads 8 --bind :5000 wsgi:app
+
+Cada proceso crea su propia aplicación (no usar --preload: los hilos de la
+cola y del índice no sobreviven a un fork) y todos comparten el archivo
+SQLite indicado en CFP_DB. La configuración se toma de variables de entorno:
+
+    CFP_MNEMONIC         archivo con la frase mnemónica (obligatoria)
+    CFP_URI              URI del nodo (http://localhost:7545)
+    CFP_DB               archivo SQLite compartido (chain.db)
+    CFP_ASYNC_TX         "1" para responder 202 sin esperar las transacciones
+    CFP_POOL_SIZE        conexiones HTTP simultáneas con el nodo, por proceso
+    CFP_TIMEOUT          segundos de espera de cada llamada al nodo
+    CFP_RECOVER_WORKERS  procesos para recuperar firmantes, por proceso
+    CFP_CACHE_SIZE       llamados cuyos contratos CFP se mantienen en memoria
+    CFP_TX_TIMEOUT       segundos que se espera cada transacción antes de responder 202
+"""
+import os
+
+from apiserver import create_app, TX_TIMEOUT
+from call_index import DEFAULT_CFP_CACHE_SIZE
+from common import provider
+
+with open(os.environ["CFP_MNEMONIC"]) as f:
+    mnemonic = f.read().strip()
+
+app = create_app(
+    mnemonic,
+    uri=os.environ.get("CFP_URI", "http://localhost:7545"),
+    db_path=os.environ.get("CFP_DB", "chain.db"),
+    async_tx=os.environ.get("CFP_ASYNC_TX") == "1",
+    pool_size=int(os.environ.get("CFP_POOL_SIZE", provider.DEFAULT_POOL_SIZE)),
+    timeout=float(os.environ.get("CFP_TIMEOUT", provider.DEFAULT_TIMEOUT)),
+    recover_workers=int(os.environ["CFP_RECOVER_WORKERS"]) if "CFP_RECOVER_WORKERS" in os.environ else None,
+    cfp_cache_size=int(os.environ.get("CFP_CACHE_SIZE", DEFAULT_CFP_CACHE_SIZE)),
+    tx_timeout=float(os.environ.get("CFP_TX_TIMEOUT", TX_TIMEOUT)))
@@ -0,0 +1 @@
+"""Módulos compartidos por las herramientas y los servidores de API en Python."""
@@ -0,0 +1,43 @@
+"""Micro-benchmark de los validadores: python -m common.bench_validators [cantidad]"""
+import re
+import sys
+from os import urandom
+from timeit import timeit
+
+from common import validators
+
+
+def old_is_valid_call_id(hex_str):
+    """La validación anterior de la API de llamados, para comparar."""
+    if len(hex_str) != 66:
+        return False
+    if not hex_str.startswith("0x"):
+        return False
+    try:
+        int(hex_str[2:], 16)
+    except ValueError:
+        return False
+    return True
+
+
+def old_is_valid_hash(h):
+    """La validación anterior del Stamper (compila el patrón en cada llamada vía la caché de re)."""
+    return re.match(r"^0x[0-9a-fA-F]{64}$", h)
+
+
+def main(count=10000, repeat=5):
+    values = [f"0x{urandom(32).hex()}" for _ in range(count)]
+    cases = {
+        "int(x, 16) + bytes.fromhex": lambda: [old_is_valid_call_id(v) and bytes.fromhex(v[2:]) for v in values],
+        "re.match + bytes.fromhex": lambda: [old_is_valid_hash(v) and bytes.fromhex(v[2:]) for v in values],
+        "validators.bytes32": lambda: [validators.bytes32(v) for v in values],
+        "validators.bytes32_many": lambda: validators.bytes32_many(values),
+    }
+    print(f"{count} valores de 32 bytes, mejor de {repeat} vueltas")
+    for name, case in cases.items():
+        best = min(timeit(case, number=1) for _ in range(repeat))
+        print(f"{name:30} {best * 1e3:8.2f} ms  {best / count * 1e9:8.0f} ns/valor")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,99 @@
+"""Recorrido paralelo de rangos de bloques mediante pedidos JSON-RPC por lotes."""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from web3 import Web3
+
+
+@lru_cache(maxsize=1 << 16)
+def checksum(address):
+    """Convierte una dirección a su forma con checksum (memorizando las frecuentes)."""
+    return None if address is None else Web3.to_checksum_address(address)
+
+
+def normalize_block(raw):
+    """Convierte un bloque JSON-RPC (valores hexadecimales) a un diccionario de Python.
+
+    Sólo se conservan los campos que usan las herramientas: número, hash,
+    hash del padre y, de cada transacción, hash, origen, destino y valor.
+    """
+    return {
+        'number': int(raw['number'], 16),
+        'hash': raw['hash'],
+        'parentHash': raw['parentHash'],
+        'transactions': [{
+            'hash': tx['hash'],
+            'from': checksum(tx['from']),
+            'to': checksum(tx['to']),
+            'value': int(tx['value'], 16),
+        } for tx in raw['transactions']],
+    }
+
+
+class BlockScanner:
+    """Obtiene bloques con sus transacciones completas usando lotes y varios hilos.
+
+    Cada lote pide `batch_size` bloques con `eth_getBlockByNumber(n, true)` en
+    un único mensaje, y hasta `workers` lotes se procesan en paralelo. Los
+    bloques se devuelven en orden, y se mantiene acotada la cantidad de lotes
+    pendientes para que la memoria no crezca con el largo del rango.
+
+    Si se indica una caché (ver `block_cache.BlockCache` en 1/), sólo se piden
+    al nodo los bloques que no estén en ella, y se guardan los que tengan al
+    menos `confirmations` bloques encima, que ya no deberían reorganizarse.
+    `normalize` convierte cada bloque recibido; la caché espera el formato
+    de `normalize_block`.
+    """
+
+    def __init__(self, client, workers=8, batch_size=50, cache=None, confirmations=12,
+                 normalize=normalize_block):
+        self.client = client
+        self.normalize = normalize
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cache = cache
+        self.confirmations = confirmations
+        self._head = None
+
+    def fetch(self, first, last):
+        """Obtiene los bloques first..last (incluidos), pidiendo en un solo lote los que no estén en la caché."""
+        cached = self.cache.get_range(first, last) if self.cache is not None else {}
+        missing = [n for n in range(first, last + 1) if n not in cached]
+        if not missing:
+            return [cached[n] for n in range(first, last + 1)]
+        calls = [('eth_getBlockByNumber', [hex(n), True]) for n in missing]
+        fetched = [self.normalize(raw) for raw in self.client.batch(calls) if raw is not None]
+        if self.cache is not None:
+            safe = self._safe_block(missing[-1])
+            self.cache.put([b for b in fetched if b['number'] <= safe])
+        blocks = {**cached, **{b['number']: b for b in fetched}}
+        return [blocks[n] for n in sorted(blocks)]
+
+    def _safe_block(self, number):
+        """Último bloque con suficientes confirmaciones; sólo consulta al nodo si hace falta."""
+        if self._head is None or number > self._head - self.confirmations:
+            self._head = int(self.client.batch([('eth_blockNumber', [])])[0], 16)
+        return self._head - self.confirmations
+
+    def blocks(self, first, last, skip_empty=True):
+        """Genera los bloques first..last (incluidos) en orden.
+
+        Si `skip_empty` es verdadero se omiten los bloques sin transacciones.
+        """
+        ranges = ((start, min(start + self.batch_size - 1, last))
+                  for start in range(first, last + 1, self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for start, end in ranges:
+                pending.append(executor.submit(self.fetch, start, end))
+                if len(pending) >= 2 * self.workers:
+                    yield from self._ready(pending.popleft(), skip_empty)
+            while pending:
+                yield from self._ready(pending.popleft(), skip_empty)
+
+    @staticmethod
+    def _ready(future, skip_empty):
+        for block in future.result():
+            if block['transactions'] or not skip_empty:
+                yield block
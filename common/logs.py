@@ -0,0 +1,91 @@
+"""Obtención de eventos (eth_getLogs) en tramos de bloques que se adaptan a los límites del nodo."""
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+DEFAULT_CHUNK = 2000 # bloques del primer tramo
+MIN_CHUNK = 1
+MAX_CHUNK = 100000
+DEFAULT_WORKERS = 4
+FAST = 1.0 # segundos; un tramo que responde antes se agranda
+# fragmentos de los mensajes con que los nodos rechazan un rango demasiado grande
+TOO_MANY = ("more than", "too many", "limit exceeded", "exceeds", "too large", "block range", "response size", "timeout")
+
+
+def is_too_many(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in TOO_MANY)
+
+
+class LogFetcher:
+    """Genera en orden los eventos de un rango de bloques, pidiéndolos por tramos.
+
+    Si el nodo rechaza un tramo por la cantidad de resultados o por el
+    largo del rango, se parte a la mitad (las veces que haga falta) y los
+    tramos siguientes se piden con ese tamaño; si un tramo responde en
+    menos de `fast` segundos, los siguientes se piden un 25% más largos.
+    Hasta `workers` tramos consecutivos se piden en paralelo, y como sólo se
+    adelantan `2 * workers` tramos la memoria no crece con el largo del rango.
+    """
+
+    def __init__(self, web3, workers=DEFAULT_WORKERS, chunk=DEFAULT_CHUNK, min_chunk=MIN_CHUNK,
+                 max_chunk=MAX_CHUNK, fast=FAST):
+        self.web3 = web3
+        self.workers = workers
+        self.chunk = chunk
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.fast = fast
+        self.count = self.requests = self.splits = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def logs(self, first, last, address=None, topics=None):
+        """Genera los eventos de los bloques first..last (incluidos) en orden de bloque y de índice."""
+        criteria = {}
+        if address is not None:
+            criteria['address'] = address
+        if topics is not None:
+            criteria['topics'] = topics
+        start = perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pending = deque()
+                block = first
+                while block <= last or pending:
+                    while block <= last and len(pending) < 2 * self.workers:
+                        end = min(last, block + self.chunk - 1)
+                        pending.append(executor.submit(self._fetch, criteria, block, end))
+                        block = end + 1
+                    for log in pending.popleft().result():
+                        self.count += 1
+                        yield log
+        finally:
+            with self._lock:
+                self.seconds += perf_counter() - start
+
+    def _fetch(self, criteria, first, last):
+        started = perf_counter()
+        try:
+            with self._lock:
+                self.requests += 1
+            logs = self.web3.eth.get_logs({**criteria, 'fromBlock': first, 'toBlock': last})
+        except Exception as e:
+            if first == last or not is_too_many(e):
+                raise
+            middle = (first + last) // 2
+            with self._lock:
+                self.splits += 1
+                self.chunk = max(self.min_chunk, min(self.chunk, (last - first + 1) // 2))
+            return self._fetch(criteria, first, middle) + self._fetch(criteria, middle + 1, last)
+        if perf_counter() - started < self.fast:
+            with self._lock:
+                self.chunk = min(self.max_chunk, max(self.chunk, (last - first + 1) * 5 // 4 + 1))
+        return list(logs)
+
+    def summary(self):
+        with self._lock:
+            return {'logs': self.count, 'requests': self.requests, 'splits': self.splits, 'chunk': self.chunk,
+                    'seconds': round(self.seconds, 3),
+                    'logsPerSecond': round(self.count / self.seconds, 1) if self.seconds else None}
@@ -0,0 +1,124 @@
+"""Conexión compartida con el nodo: elige IPC, HTTP o WebSocket según la URI.
+
+Sobre HTTP se usa una única `requests.Session` por URI, con un pool de
+conexiones keep-alive de tamaño configurable y reintentos con espera
+exponencial ante errores de conexión. Sobre IPC web3 ya mantiene un socket
+persistente. Todas las conexiones registran el tiempo de cada llamada.
+"""
+import os
+import threading
+from sys import exit, stderr
+from time import perf_counter
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from web3 import Web3
+from web3.middleware import geth_poa_middleware
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30 # segundos
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.2 # segundos, se duplica en cada reintento
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def is_http(uri):
+    return uri.startswith(("http://", "https://"))
+
+
+def is_websocket(uri):
+    return uri.startswith(("ws://", "wss://"))
+
+
+def get_session(uri, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Devuelve la sesión HTTP compartida para una URI, creándola la primera vez.
+
+    Sólo se reintentan los errores de conexión y las respuestas 502/503/504,
+    en los que el nodo no llegó a procesar el pedido; nunca los errores de
+    lectura, para no reenviar una transacción que pudo haberse aceptado.
+    """
+    with _sessions_lock:
+        session = _sessions.get(uri)
+        if session is None:
+            retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                          status_forcelist=(502, 503, 504), allowed_methods=None,
+                          backoff_factor=backoff)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[uri] = session
+        return session
+
+
+class CallStats:
+    """Cantidad, tiempo total y tiempo máximo de las llamadas al nodo, por método."""
+
+    def __init__(self):
+        self.methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, elapsed):
+        with self._lock:
+            entry = self.methods.setdefault(method, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def middleware(self, make_request, w3):
+        """Middleware de web3 que registra la duración de cada llamada."""
+        def timed(method, params):
+            start = perf_counter()
+            try:
+                return make_request(method, params)
+            finally:
+                self.record(method, perf_counter() - start)
+        return timed
+
+    def summary(self):
+        """Devuelve {método: {'calls', 'total', 'avg', 'max'}} con los tiempos en segundos."""
+        with self._lock:
+            return {method: {'calls': calls, 'total': round(total, 6),
+                             'avg': round(total / calls, 6), 'max': round(longest, 6)}
+                    for method, (calls, total, longest) in self.methods.items()}
+
+
+stats = CallStats()
+
+
+def make_provider(uri, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                  retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Crea el proveedor de web3 que corresponde a la URI."""
+    if is_http(uri):
+        return Web3.HTTPProvider(uri, request_kwargs={'timeout': timeout},
+                                 session=get_session(uri, pool_size, retries, backoff))
+    if is_websocket(uri):
+        return Web3.WebsocketProvider(uri, websocket_timeout=timeout)
+    return Web3.IPCProvider(os.path.expanduser(uri), timeout=timeout)
+
+
+def connect(uri, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+            retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, poa=True):
+    """Conecta con el nodo y devuelve la instancia de Web3.
+
+    Levanta `ConnectionError` si el nodo no responde.
+    """
+    w3 = Web3(make_provider(uri, pool_size, timeout, retries, backoff))
+    if poa:
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    w3.middleware_onion.add(stats.middleware, "timing")
+    if not w3.is_connected():
+        raise ConnectionError(f"No se pudo conectar con el nodo en '{uri}'")
+    return w3
+
+
+def connect_to_node(uri, **options):
+    """Como `connect`, pero termina el programa si el nodo no responde (para las herramientas de línea de comandos)."""
+    try:
+        return connect(uri, **options)
+    except ConnectionError:
+        print("Falla al contactar el nodo", file=stderr)
+        exit(1)
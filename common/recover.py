@@ -0,0 +1,80 @@
+"""Recuperación de firmantes (ECDSA secp256k1) en un pool de procesos, con memoria de los resultados."""
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+DEFAULT_CACHE_SIZE = 65536
+CHUNK_SIZE = 64 # pares por tarea al recuperar lotes grandes
+
+
+def recover_signer(message, signature):
+    """Dirección que firmó `message` (bytes, con el prefijo de EIP-191) con `signature` (65 bytes), o None."""
+    try:
+        return Account.recover_message(encode_defunct(primitive=message), signature=signature)
+    except Exception:
+        return None
+
+
+def _recover_pair(pair):
+    return recover_signer(*pair)
+
+
+class SignatureRecovery:
+    """Recupera firmantes en `workers` procesos, para no ocupar los hilos del servidor.
+
+    Los resultados se memorizan por (mensaje, firma) en una caché LRU de
+    `cache_size` entradas, así que los reintentos de un cliente no repiten
+    el cálculo. Los procesos se crean con "spawn", que es seguro aunque el
+    servidor ya tenga otros hilos en marcha.
+    """
+
+    def __init__(self, workers=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (mensaje, firma) -> dirección o None
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                         mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self):
+        """Levanta los procesos de antemano, para que el primer pedido no pague su arranque."""
+        list(self._pool.map(_recover_pair, [(b"", bytes(65))] * self.workers))
+        return self
+
+    def recover(self, message, signature):
+        return self.recover_many([(message, signature)])[0]
+
+    def recover_many(self, pairs):
+        """Devuelve el firmante (o None) de cada par (mensaje, firma); los que no están en caché se recuperan en paralelo."""
+        pairs = [(bytes(m), bytes(s)) for m, s in pairs]
+        result = [None] * len(pairs)
+        missing = []
+        with self._lock:
+            for i, pair in enumerate(pairs):
+                if pair in self.cache:
+                    self.cache.move_to_end(pair)
+                    result[i] = self.cache[pair]
+                    self.hits += 1
+                else:
+                    missing.append(i)
+            self.misses += len(missing)
+        if missing:
+            todo = [pairs[i] for i in missing]
+            chunksize = max(1, min(CHUNK_SIZE, len(todo) // self.workers))
+            recovered = list(self._pool.map(_recover_pair, todo, chunksize=chunksize))
+            with self._lock:
+                for i, signer in zip(missing, recovered):
+                    result[i] = self.cache[pairs[i]] = signer
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return result
+
+    def summary(self):
+        with self._lock:
+            return {'workers': self.workers, 'entries': len(self.cache), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,101 @@
+"""Pedidos JSON-RPC por lotes (batch) contra un nodo, vía HTTP o IPC."""
+import json
+import os
+import socket
+import threading
+from time import perf_counter
+
+from common.provider import DEFAULT_TIMEOUT, get_session, is_http, is_websocket, stats
+
+
+class RPCError(Exception):
+    """Error devuelto por el nodo para uno de los pedidos del lote."""
+
+
+class BatchClient:
+    """Envía varios pedidos JSON-RPC en un único mensaje.
+
+    web3.py no expone pedidos por lotes, por lo que se arma el mensaje a mano.
+    Sobre HTTP se reutiliza la sesión compartida de `common.provider`
+    (conexiones keep-alive y reintentos); sobre IPC se mantiene un socket
+    por hilo, de modo que varios hilos pueden usar el cliente a la vez.
+    Una URI WebSocket se rechaza (no se la confunde con la ruta de un socket).
+    """
+
+    def __init__(self, uri, timeout=DEFAULT_TIMEOUT):
+        if is_websocket(uri):
+            raise ValueError(f"BatchClient no admite WebSocket ({uri}): usar una URI IPC o HTTP")
+        self.uri = uri
+        self.timeout = timeout
+        self._http = is_http(uri)
+        if self._http:
+            self._session = get_session(uri)
+        else:
+            self._path = os.path.expanduser(uri)
+        self._local = threading.local()
+
+    def batch(self, calls, raise_errors=True):
+        """Ejecuta una lista de pedidos (método, parámetros) y devuelve sus resultados en orden.
+
+        Si `raise_errors` es falso, los pedidos fallidos se devuelven como
+        instancias de `RPCError` en lugar de levantar la excepción.
+        """
+        if not calls:
+            return []
+        payload = [{'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+                   for i, (method, params) in enumerate(calls)]
+        start = perf_counter()
+        try:
+            responses = self._send(payload)
+        finally:
+            stats.record("batch", perf_counter() - start)
+        if isinstance(responses, dict):
+            # el nodo rechazó el lote completo
+            raise RPCError(responses.get('error', {}).get('message', responses))
+        results = [None] * len(calls)
+        for response in responses:
+            if 'error' in response:
+                error = RPCError(response['error'].get('message', response['error']))
+                if raise_errors:
+                    raise error
+                results[response['id']] = error
+            else:
+                results[response['id']] = response['result']
+        return results
+
+    def _send(self, payload):
+        if self._http:
+            response = self._session.post(self.uri, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        return self._send_ipc(json.dumps(payload).encode())
+
+    def _socket(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self._path)
+            self._local.sock = sock
+        return sock
+
+    def _send_ipc(self, data):
+        sock = self._socket()
+        try:
+            sock.sendall(data)
+            buffer = b""
+            while True:
+                chunk = sock.recv(1 << 16)
+                if not chunk:
+                    raise ConnectionError("El nodo cerró la conexión IPC")
+                buffer += chunk
+                # la respuesta termina cuando el JSON acumulado está completo
+                if buffer.rstrip().endswith((b"]", b"}")):
+                    try:
+                        return json.loads(buffer)
+                    except ValueError:
+                        continue
+        except Exception:
+            sock.close()
+            self._local.sock = None
+            raise
@@ -0,0 +1,75 @@
+"""Casos de prueba de la obtención de eventos por tramos adaptables (sin nodo)."""
+from types import SimpleNamespace
+
+import pytest
+
+from common.logs import LogFetcher, is_too_many
+
+
+class FakeEth:
+    """Simula eth_getLogs con un evento por bloque y un límite de resultados por pedido."""
+
+    def __init__(self, limit=None, error="query returned more than 10000 results"):
+        self.limit = limit
+        self.error = error
+        self.ranges = []
+
+    def get_logs(self, criteria):
+        first, last = criteria['fromBlock'], criteria['toBlock']
+        self.ranges.append((first, last))
+        if self.limit is not None and last - first + 1 > self.limit:
+            raise ValueError({'code': -32005, 'message': self.error})
+        return [{'blockNumber': n, 'address': criteria.get('address')} for n in range(first, last + 1)]
+
+
+def fetcher(eth, **kwargs):
+    return LogFetcher(SimpleNamespace(eth=eth), **kwargs)
+
+
+def test_is_too_many() -> None:
+    assert is_too_many(ValueError("query returned more than 10000 results"))
+    assert is_too_many(Exception("Block range is too large"))
+    assert not is_too_many(ValueError("execution reverted"))
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_logs_in_order(workers) -> None:
+    """Prueba que se devuelvan todos los eventos del rango, en orden y sin repetir."""
+    eth = FakeEth()
+    logs = fetcher(eth, workers=workers, chunk=7).logs(3, 100, address="0xcf")
+    assert [log['blockNumber'] for log in logs] == list(range(3, 101))
+    assert all(first <= last for first, last in eth.ranges)
+
+
+def test_split_on_too_many() -> None:
+    """Prueba que un tramo rechazado se parta y que los siguientes se pidan más cortos."""
+    eth = FakeEth(limit=10)
+    log_fetcher = fetcher(eth, workers=1, chunk=64, fast=0)
+    assert [log['blockNumber'] for log in log_fetcher.logs(0, 199)] == list(range(200))
+    summary = log_fetcher.summary()
+    assert summary['logs'] == 200 and summary['splits'] > 0
+    assert summary['chunk'] <= 10
+    # una vez ajustado el tamaño, los tramos ya no se rechazan
+    assert all(last - first + 1 <= 10 for first, last in eth.ranges[-5:])
+
+
+def test_grow_when_fast() -> None:
+    """Prueba que los tramos que responden rápido hagan crecer los siguientes, hasta `max_chunk`."""
+    log_fetcher = fetcher(FakeEth(), workers=1, chunk=10, max_chunk=50, fast=60)
+    assert len(list(log_fetcher.logs(0, 999))) == 1000
+    assert log_fetcher.chunk == 50
+
+
+def test_other_errors_raise() -> None:
+    """Prueba que un error que no es por el tamaño del rango no se reintente."""
+    log_fetcher = fetcher(FakeEth(limit=0, error="execution reverted"), workers=1, chunk=8)
+    with pytest.raises(ValueError):
+        list(log_fetcher.logs(0, 20))
+    assert log_fetcher.splits == 0
+
+
+def test_single_block_too_many_raises() -> None:
+    """Prueba que si el nodo rechaza un único bloque se levante el error en lugar de partir más."""
+    eth = FakeEth(limit=0)
+    with pytest.raises(ValueError):
+        list(fetcher(eth, workers=1, chunk=4).logs(0, 3))
@@ -0,0 +1,46 @@
+"""Casos de prueba de los validadores hexadecimales."""
+from os import urandom
+
+import pytest
+
+from common import validators
+
+
+@pytest.mark.parametrize("validate, size", [
+    (validators.bytes32, 32), (validators.address, 20), (validators.signature, 65)])
+def test_valid(validate, size) -> None:
+    """Prueba que un valor válido se devuelva decodificado, con dígitos en minúscula o mayúscula."""
+    data = urandom(size)
+    assert validate(f"0x{data.hex()}") == data
+    assert validate(f"0x{data.hex().upper()}") == data
+
+
+@pytest.mark.parametrize("validate, size", [
+    (validators.bytes32, 32), (validators.address, 20), (validators.signature, 65)])
+def test_invalid(validate, size) -> None:
+    """Prueba que se rechacen valores sin prefijo, de otro largo, con dígitos no hexadecimales o de otro tipo."""
+    digits = urandom(size).hex()
+    for value in [digits, f"0X{digits}", f"0x{digits[:-1]}", f"0x{digits}0", f"0x{digits[:-1]}g",
+                  f"0x{digits}\n", f" 0x{digits}", "0x", "", None, 12, bytes(size)]:
+        assert validate(value) is None
+
+
+def test_many_valid() -> None:
+    """Prueba que la validación de una lista decodifique cada valor en su orden."""
+    data = [urandom(32) for _ in range(100)]
+    assert validators.bytes32_many([f"0x{d.hex()}" for d in data]) == data
+    addresses = [urandom(20) for _ in range(10)]
+    assert validators.address_many([f"0x{a.hex()}" for a in addresses]) == addresses
+    signatures = [urandom(65) for _ in range(3)]
+    assert validators.signature_many([f"0x{s.hex()}" for s in signatures]) == signatures
+    assert validators.bytes32_many([]) == []
+
+
+def test_many_marks_invalid() -> None:
+    """Prueba que en una lista con valores inválidos sólo esos sean None."""
+    data = [urandom(32) for _ in range(4)]
+    values = [f"0x{d.hex()}" for d in data]
+    values[1] = f"0x{'z' * 64}"
+    values[3] = values[3][2:] + "00" # mismo largo, sin prefijo
+    assert validators.bytes32_many(values) == [data[0], None, data[2], None]
+    assert validators.address_many(["0x12", None]) == [None, None]
@@ -0,0 +1,66 @@
+"""Validación de los valores hexadecimales que reciben las APIs.
+
+Cada validador comprueba el formato completo con una expresión regular
+precompilada y devuelve los bytes decodificados, o None si el valor no es
+válido, para que quien lo llama no tenga que volver a decodificarlo.
+Todos exigen el prefijo "0x".
+"""
+import re
+
+BYTES32 = re.compile(r"0x[0-9a-fA-F]{64}")
+ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}")
+SIGNATURE = re.compile(r"0x[0-9a-fA-F]{130}") # r, s (32 bytes c/u) y v
+HEX_DIGITS = re.compile(r"[0-9a-fA-F]*")
+
+
+def _decode(pattern, value):
+    if isinstance(value, str) and pattern.fullmatch(value):
+        return bytes.fromhex(value[2:])
+    return None
+
+
+def bytes32(value):
+    """Un valor de 32 bytes (hash, callId, propuesta)."""
+    return _decode(BYTES32, value)
+
+
+def address(value):
+    """Una dirección de 20 bytes; no verifica el checksum de EIP-55."""
+    return _decode(ADDRESS, value)
+
+
+def signature(value):
+    """Una firma de 65 bytes."""
+    return _decode(SIGNATURE, value)
+
+
+def _decode_many(pattern, size, values):
+    """Valida y decodifica una lista de valores del mismo tamaño.
+
+    Si todos son cadenas del largo esperado con prefijo "0x" (el caso
+    normal), se validan con una sola búsqueda sobre la concatenación y se
+    decodifican con un único `bytes.fromhex`; si alguno falla, se valida
+    cada uno por separado para saber cuál.
+    """
+    length = 2 + 2 * size
+    if all(isinstance(v, str) and len(v) == length and v.startswith("0x") for v in values):
+        digits = "".join(v[2:] for v in values)
+        if HEX_DIGITS.fullmatch(digits):
+            data = bytes.fromhex(digits)
+            return [data[i:i + size] for i in range(0, len(data), size)]
+    return [_decode(pattern, v) for v in values]
+
+
+def bytes32_many(values):
+    """Como `bytes32`, para una lista; devuelve una lista con None en los valores inválidos."""
+    return _decode_many(BYTES32, 32, values)
+
+
+def address_many(values):
+    """Como `address`, para una lista."""
+    return _decode_many(ADDRESS, 20, values)
+
+
+def signature_many(values):
+    """Como `signature`, para una lista."""
+    return _decode_many(SIGNATURE, 65, values)